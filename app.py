@@ -1,34 +1,58 @@
 from flask import Flask, jsonify, request
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 from flask_cors import CORS
-from flask_marshmallow import Marshmallow
 import os
 from dotenv import load_dotenv
+from config import config
+from utils import instrumentation, migrations, profiling
+from utils.cache import Cache, register_invalidation
+from utils.hashing import HashingBusy, PasswordHasher
+from utils.jobs import JobQueue
+from utils.json_provider import FastJSONProvider
+from utils.routing import RoutingSession, init_replicas
 
 # Load environment variables
 load_dotenv()
 
 # Initialize extensions
-db = SQLAlchemy()
-migrate = Migrate()
-ma = Marshmallow()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+cache = Cache()
+hasher = PasswordHasher()
+jobs = JobQueue()
 
-def create_app(config_name=None):
-    """Application factory pattern"""
+def create_app(config_name=None, overrides=None):
+    """Application factory pattern
+    
+    ``overrides`` is an optional mapping applied on top of the selected
+    configuration class, mainly for tests.
+    """
     app = Flask(__name__)
     
-    # Configuration
-    app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
-    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///app.db')
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Configuration: 'development', 'production', 'testing' or 'default'
+    config_name = config_name or os.getenv('FLASK_ENV') or 'default'
+    config_class = config[config_name]
+    app.config.from_object(config_class)
+    app.config.update(overrides or {})
+    config_class.init_app(app)
+    
+    # JSON serialization (orjson/msgspec when installed, stdlib otherwise)
+    app.json = FastJSONProvider(app, app.config.get('JSON_BACKEND', 'auto'))
     
     # Initialize extensions with app
     db.init_app(app)
-    migrate.init_app(app, db)
-    ma.init_app(app)
+    init_replicas(app, db)
+    migrations.init_app(app, db)
+    cache.init_app(app)
+    hasher.init_app(app)
+    jobs.init_app(app)
+    register_invalidation(db.session)
+    instrumentation.init_app(app)
+    profiling.init_app(app)
     CORS(app)
     
+    # Register background tasks
+    import tasks.cache  # noqa: F401 -- defining the tasks registers them with jobs
+    
     # Import and register blueprints
     from routes.main import main_bp
     from routes.api import api_bp
@@ -46,14 +70,35 @@ def create_app(config_name=None):
         db.session.rollback()
         return jsonify({'error': 'Internal server error'}), 500
     
+    @app.errorhandler(HashingBusy)
+    def hashing_busy(error):
+        db.session.rollback()
+        return jsonify({'error': 'Server busy, please retry'}), 429, {'Retry-After': '1'}
+    
     @app.errorhandler(400)
     def bad_request(error):
         return jsonify({'error': 'Bad request'}), 400
     
     return app
 
-# Create the Flask app instance for Gunicorn
-app = create_app()
+def __getattr__(name):
+    """Module attributes created on first access instead of at import
+    
+    ``app`` is the default Flask app instance (for ``gunicorn app:app`` and
+    ``flask run``), so importing models or ``create_app`` does not build one.
+    ``ma`` imports Flask-Marshmallow only once a schema needs it.
+    """
+    if name == 'app':
+        globals()['app'] = create_app()
+        return globals()['app']
+    if name == 'ma':
+        from flask_marshmallow import Marshmallow
+        ma = globals()['ma'] = Marshmallow()
+        # What Marshmallow.init_app does; db.session is shared by every app
+        ma.SQLAlchemySchema.OPTIONS_CLASS.session = db.session
+        ma.SQLAlchemyAutoSchema.OPTIONS_CLASS.session = db.session
+        return ma
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000) 
\ No newline at end of file
+    create_app().run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,59 @@
+"""
+ASGI entry point
+
+Serves the hot API handlers from routes/async_api.py on an async engine and
+falls back to the Flask (WSGI) app for every other route, so both modes
+share models, configuration and extensions::
+
+    uvicorn asgi:app --workers 4
+"""
+from contextlib import asynccontextmanager
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.routing import Mount, Route
+
+from app import create_app, db
+from routes.async_api import routes
+from utils.async_db import AsyncDatabase
+
+
+def create_asgi_app(config_name=None, overrides=None):
+    """Starlette app wrapping a Flask app created with the same arguments"""
+    flask_app = create_app(config_name, overrides)
+    database = AsyncDatabase(flask_app, db)
+    
+    @asynccontextmanager
+    async def lifespan(asgi_app):
+        yield
+        await database.dispose()
+    
+    # Same CORS policy as flask-cors on the Flask app; preflight requests
+    # match no async route and fall through to it
+    cors = Middleware(
+        CORSMiddleware,
+        allow_origins=flask_app.config['CORS_ORIGINS'],
+        allow_methods=['GET', 'HEAD', 'POST', 'OPTIONS', 'PUT', 'PATCH', 'DELETE'],
+        allow_headers=['*']
+    )
+    async_routes = [
+        Route(route.path, route.endpoint, methods=route.methods, name=route.name, middleware=[cors])
+        for route in routes
+    ]
+    asgi_app = Starlette(
+        routes=async_routes + [Mount('/', app=WSGIMiddleware(flask_app))],
+        lifespan=lifespan
+    )
+    asgi_app.state.flask_app = flask_app
+    asgi_app.state.database = database
+    return asgi_app
+
+
+def __getattr__(name):
+    """Create the default ASGI app (``uvicorn asgi:app``) on first access"""
+    if name == 'app':
+        globals()['app'] = create_asgi_app()
+        return globals()['app']
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+Load-test the API against a seeded SQLite database
+
+Seeds a database file with users and posts (reused across runs when the
+counts match), then sends concurrent requests to each endpoint through the
+Flask test client and/or a real gunicorn server, and reports throughput and
+p50/p95/p99 latency per endpoint as JSON so runs can be compared across
+commits.
+
+    python -m benchmarks.api_load --users 10000 --posts 100000 --output bench.json
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORDS = (
+    'flask', 'python', 'database', 'cache', 'index', 'query', 'deploy', 'worker',
+    'latency', 'cursor', 'search', 'replica', 'profile', 'stream', 'thread', 'pool'
+)
+
+ENDPOINTS = (
+    'list_posts', 'list_posts_filtered', 'list_users', 'get_post', 'get_user',
+    'user_stats', 'search_posts', 'create_post', 'rename_user'
+)
+
+
+def app_settings(database):
+    """Configuration shared by the in-process app and the gunicorn workers"""
+    return {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.abspath(database)}',
+        'CACHE_BACKEND': 'lru',
+        'JOBS_BACKEND': 'thread',
+        'PROFILER_ENABLED': False
+    }
+
+
+def make_app(database):
+    from app import create_app
+    return create_app('production', app_settings(database))
+
+
+def seed(database, users, posts, chunk_size=5000):
+    """Fill ``database`` with ``users`` users and ``posts`` posts unless it already matches"""
+    from app import db, hasher
+    from models.post import Post
+    from models.user import User
+    from services.post_counts import recompute
+    
+    app = make_app(database)
+    with app.app_context():
+        db.create_all()
+        if User.query.count() == users and Post.query.count() == posts:
+            return app
+        db.drop_all()
+        db.create_all()
+        
+        # One hash for every seeded user; hashing 10k passwords is not what is measured
+        password_hash = hasher.hash('password123')
+        start = datetime(2024, 1, 1)
+        rng = random.Random(42)
+        
+        for low in range(0, users, chunk_size):
+            db.session.execute(db.insert(User), [
+                {
+                    'username': f'user{i}',
+                    'email': f'user{i}@example.com',
+                    'password_hash': password_hash,
+                    'is_active': True,
+                    'is_admin': False,
+                    'created_at': start + timedelta(minutes=i),
+                    'updated_at': start + timedelta(minutes=i)
+                }
+                for i in range(low, min(low + chunk_size, users))
+            ])
+        for low in range(0, posts, chunk_size):
+            db.session.execute(db.insert(Post), [
+                {
+                    'title': ' '.join(rng.choices(WORDS, k=4)).capitalize(),
+                    'content': ' '.join(rng.choices(WORDS, k=60)),
+                    'slug': f'post-{i}',
+                    'author_id': rng.randint(1, users),
+                    'is_published': rng.random() < 0.7,
+                    'created_at': start + timedelta(seconds=30 * i),
+                    'updated_at': start + timedelta(seconds=30 * i)
+                }
+                for i in range(low, min(low + chunk_size, posts))
+            ])
+        recompute(0, users)
+        db.session.commit()
+    return app
+
+
+def make_request(endpoint, rng, users, posts):
+    """Return ``(method, path, body)`` for one request to ``endpoint``"""
+    if endpoint == 'list_posts':
+        return 'GET', '/api/posts?limit=20', None
+    if endpoint == 'list_posts_filtered':
+        return 'GET', f'/api/posts?limit=20&is_published=true&author_id={rng.randint(1, users)}', None
+    if endpoint == 'list_users':
+        return 'GET', '/api/users?limit=20', None
+    if endpoint == 'get_post':
+        return 'GET', f'/api/posts/{rng.randint(1, posts)}', None
+    if endpoint == 'get_user':
+        return 'GET', f'/api/users/{rng.randint(1, users)}', None
+    if endpoint == 'user_stats':
+        return 'GET', f'/api/users/{rng.randint(1, users)}/stats', None
+    if endpoint == 'search_posts':
+        return 'GET', f'/api/posts/search?q={"+".join(rng.sample(WORDS, 2))}&limit=20', None
+    if endpoint == 'create_post':
+        return 'POST', '/api/posts', {
+            'title': 'Benchmark post',
+            'content': ' '.join(rng.choices(WORDS, k=60)),
+            'slug': f'bench-{os.getpid()}-{threading.get_ident()}-{rng.getrandbits(64):x}',
+            'author_id': rng.randint(1, users)
+        }
+    if endpoint == 'rename_user':
+        return 'PUT', f'/api/users/{rng.randint(1, users)}', {
+            'username': f'bench-{os.getpid()}-{threading.get_ident()}-{rng.getrandbits(64):x}'
+        }
+    raise ValueError(f'Unknown endpoint: {endpoint}')
+
+
+class ClientDriver:
+    """Send requests through the Flask test client (no HTTP server)"""
+    
+    name = 'test-client'
+    
+    def __init__(self, app):
+        self.app = app
+    
+    def session(self):
+        client = self.app.test_client()
+        
+        def send(method, path, body):
+            return client.open(path, method=method, json=body).status_code
+        return send
+    
+    def close(self):
+        pass
+
+
+class ServerDriver:
+    """Send requests over HTTP keep-alive connections to a server subprocess
+    
+    Subclasses return the server's command line from ``command(port)``.
+    """
+    
+    name = 'server'
+    
+    def __init__(self, database):
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            self.port = probe.getsockname()[1]
+        
+        env = dict(os.environ, FLASK_ENV='production', LOG_LEVEL='WARNING')
+        env.update({key: str(value) for key, value in app_settings(database).items()
+                    if key != 'SQLALCHEMY_DATABASE_URI'})
+        env['DATABASE_URL'] = app_settings(database)['SQLALCHEMY_DATABASE_URI']
+        self.process = subprocess.Popen(self.command(self.port), cwd=ROOT, env=env)
+        self._wait_until_ready()
+    
+    def command(self, port):
+        raise NotImplementedError
+    
+    def _wait_until_ready(self, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f'{self.name} exited during startup')
+            try:
+                connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=1)
+                connection.request('GET', '/health/live')
+                if connection.getresponse().status == 200:
+                    return
+            except OSError:
+                time.sleep(0.1)
+        self.close()
+        raise RuntimeError(f'{self.name} did not become ready')
+    
+    def session(self):
+        connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=30)
+        
+        def send(method, path, body):
+            headers = {}
+            payload = None
+            if body is not None:
+                payload = json.dumps(body)
+                headers['Content-Type'] = 'application/json'
+            connection.request(method, path, body=payload, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            return response.status
+        return send
+    
+    def close(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+class GunicornDriver(ServerDriver):
+    """gunicorn with the project's gunicorn.conf.py, serving ``target``"""
+    
+    name = 'gunicorn'
+    
+    def __init__(self, database, workers=2, threads=4, worker_class='gthread', target='app:app'):
+        self.workers = workers
+        self.threads = threads
+        self.worker_class = worker_class
+        self.target = target
+        super().__init__(database)
+    
+    def command(self, port):
+        # No worker recycling, so restarts do not show up as latency spikes
+        return [
+            sys.executable, '-m', 'gunicorn', '--config', os.path.join(ROOT, 'gunicorn.conf.py'),
+            '--bind', f'127.0.0.1:{port}', '--workers', str(self.workers),
+            '--worker-class', self.worker_class, '--threads', str(self.threads),
+            '--max-requests', '0', '--log-level', 'warning', self.target
+        ]
+
+
+def percentile(sorted_samples, fraction):
+    """Nearest-rank percentile of already sorted samples"""
+    index = max(int(round(fraction * len(sorted_samples) + 0.5)) - 1, 0)
+    return sorted_samples[min(index, len(sorted_samples) - 1)]
+
+
+def measure(driver, endpoint, requests, concurrency, users, posts, seed_value=0):
+    """Send ``requests`` requests to ``endpoint`` from ``concurrency`` threads"""
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    per_thread = [requests // concurrency + (1 if i < requests % concurrency else 0)
+                  for i in range(concurrency)]
+    
+    def worker(index, count):
+        rng = random.Random(seed_value * 1000 + index)
+        send = driver.session()
+        local, failed = [], 0
+        for _ in range(count):
+            method, path, body = make_request(endpoint, rng, users, posts)
+            started = time.perf_counter()
+            try:
+                status = send(method, path, body)
+            except (OSError, http.client.HTTPException):
+                status = None
+            local.append((time.perf_counter() - started) * 1000)
+            if status is None or status >= 400:
+                failed += 1
+        with lock:
+            latencies.extend(local)
+            errors.append(failed)
+    
+    threads = [threading.Thread(target=worker, args=(i, count)) for i, count in enumerate(per_thread) if count]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': sum(errors),
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+        'mean_ms': round(statistics.fmean(latencies), 3),
+        'p50_ms': round(percentile(latencies, 0.50), 3),
+        'p95_ms': round(percentile(latencies, 0.95), 3),
+        'p99_ms': round(percentile(latencies, 0.99), 3),
+        'max_ms': round(latencies[-1], 3)
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(database, users=10000, posts=100000, requests=500, concurrency=8,
+        drivers=('test-client', 'gunicorn'), endpoints=ENDPOINTS, workers=2, threads=4, warmup=20):
+    """Seed, run every endpoint on every driver and return the report"""
+    started = time.perf_counter()
+    app = seed(database, users, posts)
+    report = {
+        'revision': git_revision(),
+        'timestamp': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        'dataset': {'users': users, 'posts': posts, 'seed_seconds': round(time.perf_counter() - started, 2)},
+        'requests_per_endpoint': requests,
+        'concurrency': concurrency,
+        'results': {}
+    }
+    
+    for name in drivers:
+        if name == 'test-client':
+            driver = ClientDriver(app)
+        elif name == 'gunicorn':
+            driver = GunicornDriver(database, workers, threads)
+            report['gunicorn'] = {'workers': workers, 'threads': threads}
+        else:
+            raise ValueError(f'Unknown driver: {name}')
+        try:
+            results = report['results'][driver.name] = {}
+            for endpoint in endpoints:
+                if warmup:
+                    measure(driver, endpoint, warmup, 1, users, posts, seed_value=-1)
+                results[endpoint] = measure(driver, endpoint, requests, concurrency, users, posts)
+        finally:
+            driver.close()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--database', default=os.path.join(tempfile.gettempdir(), 'flask-boilerplate-bench.db'),
+                        help='SQLite file to seed (reused when the dataset size matches)')
+    parser.add_argument('--users', type=int, default=10000, help='Number of seeded users')
+    parser.add_argument('--posts', type=int, default=100000, help='Number of seeded posts')
+    parser.add_argument('--requests', type=int, default=500, help='Requests per endpoint and driver')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent client threads')
+    parser.add_argument('--driver', action='append', choices=('test-client', 'gunicorn'),
+                        help='Driver to run (repeatable; default: both)')
+    parser.add_argument('--endpoint', action='append', choices=ENDPOINTS,
+                        help='Endpoint to run (repeatable; default: all)')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=4, help='gunicorn threads per worker')
+    parser.add_argument('--output', help='Also write the JSON report to this file')
+    args = parser.parse_args()
+    
+    report = run(
+        args.database, args.users, args.posts, args.requests, args.concurrency,
+        tuple(args.driver or ('test-client', 'gunicorn')), tuple(args.endpoint or ENDPOINTS),
+        args.workers, args.threads
+    )
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as handle:
+            handle.write(output + '\n')
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
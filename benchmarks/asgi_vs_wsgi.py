@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Compare the WSGI and ASGI serving modes under concurrent load
+
+Runs the same endpoints against gunicorn with sync workers, gunicorn with
+gthread workers (``app:app``), gunicorn with uvicorn workers and plain
+uvicorn (``asgi:app``), with the same number of worker processes, and
+reports throughput and latency percentiles per mode and endpoint as JSON.
+The gunicorn modes use gunicorn.conf.py (preloaded app, per-worker pools). Reuses the dataset, request mix and
+measurement of benchmarks/api_load.py.
+
+    python -m benchmarks.asgi_vs_wsgi --concurrency 64 --output asgi-vs-wsgi.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks.api_load import GunicornDriver, ServerDriver, git_revision, measure, seed
+
+# Endpoints that wait on the database or the cache rather than on the CPU
+ENDPOINTS = ('list_posts', 'list_posts_filtered', 'get_post', 'user_stats', 'search_posts', 'create_post')
+
+MODES = ('gunicorn-sync', 'gunicorn-gthread', 'gunicorn-uvicorn', 'uvicorn')
+
+
+class UvicornDriver(ServerDriver):
+    """uvicorn serving the ASGI app (``asgi:app``)"""
+    
+    name = 'uvicorn'
+    
+    def __init__(self, database, workers=2):
+        self.workers = workers
+        super().__init__(database)
+    
+    def command(self, port):
+        return [
+            sys.executable, '-m', 'uvicorn', '--host', '127.0.0.1', '--port', str(port),
+            '--workers', str(self.workers), '--log-level', 'warning', '--no-access-log', 'asgi:app'
+        ]
+
+
+def start(mode, database, workers, threads):
+    if mode == 'gunicorn-sync':
+        # gunicorn silently switches sync workers to gthread when threads > 1
+        return GunicornDriver(database, workers, 1, 'sync')
+    if mode == 'gunicorn-gthread':
+        return GunicornDriver(database, workers, threads, 'gthread')
+    if mode == 'gunicorn-uvicorn':
+        return GunicornDriver(database, workers, 1, 'uvicorn.workers.UvicornWorker', 'asgi:app')
+    if mode == 'uvicorn':
+        return UvicornDriver(database, workers)
+    raise ValueError(f'Unknown mode: {mode}')
+
+
+def run(database, users=10000, posts=100000, requests=1000, concurrency=64,
+        modes=MODES, endpoints=ENDPOINTS, workers=2, threads=8, warmup=20):
+    """Seed, run every endpoint in every serving mode and return the report"""
+    seed(database, users, posts)
+    report = {
+        'revision': git_revision(),
+        'timestamp': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        'dataset': {'users': users, 'posts': posts},
+        'requests_per_endpoint': requests,
+        'concurrency': concurrency,
+        'workers': workers,
+        'threads': threads,
+        'results': {}
+    }
+    
+    for mode in modes:
+        started = time.perf_counter()
+        driver = start(mode, database, workers, threads)
+        try:
+            results = report['results'][mode] = {}
+            for endpoint in endpoints:
+                if warmup:
+                    measure(driver, endpoint, warmup, 1, users, posts, seed_value=-1)
+                results[endpoint] = measure(driver, endpoint, requests, concurrency, users, posts)
+        finally:
+            driver.close()
+        results['elapsed_seconds'] = round(time.perf_counter() - started, 2)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--database', default=os.path.join(tempfile.gettempdir(), 'flask-boilerplate-bench.db'),
+                        help='SQLite file to seed (reused when the dataset size matches)')
+    parser.add_argument('--users', type=int, default=10000, help='Number of seeded users')
+    parser.add_argument('--posts', type=int, default=100000, help='Number of seeded posts')
+    parser.add_argument('--requests', type=int, default=1000, help='Requests per endpoint and mode')
+    parser.add_argument('--concurrency', type=int, default=64, help='Concurrent client connections')
+    parser.add_argument('--mode', action='append', choices=MODES, help='Serving mode (repeatable; default: all)')
+    parser.add_argument('--endpoint', action='append', choices=ENDPOINTS,
+                        help='Endpoint to run (repeatable; default: all)')
+    parser.add_argument('--workers', type=int, default=2, help='Worker processes per mode')
+    parser.add_argument('--threads', type=int, default=8, help='Threads per gthread worker')
+    parser.add_argument('--output', help='Also write the JSON report to this file')
+    args = parser.parse_args()
+    
+    report = run(
+        args.database, args.users, args.posts, args.requests, args.concurrency,
+        tuple(args.mode or MODES), tuple(args.endpoint or ENDPOINTS), args.workers, args.threads
+    )
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as handle:
+            handle.write(output + '\n')
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark JSON serialization of a large post list
+
+Compares Flask's default provider fed with pre-formatted ``isoformat()``
+strings (the old ``to_dict`` path) against FastJSONProvider with each
+available backend fed native datetimes.
+
+    python -m benchmarks.json_serialization --rows 10000
+"""
+import argparse
+import json
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from utils.json_provider import FastJSONProvider, msgspec, orjson
+
+
+def make_rows(count):
+    """Build ``count`` dictionaries shaped like ``Post.to_dict()``"""
+    start = datetime(2024, 1, 1)
+    return [
+        {
+            'id': i,
+            'title': f'Post number {i}',
+            'content': 'Lorem ipsum dolor sit amet, consectetur adipiscing elit. ' * 8,
+            'slug': f'post-number-{i}',
+            'is_published': i % 2 == 0,
+            'author_id': i % 100,
+            'author': f'user{i % 100}',
+            'created_at': start + timedelta(seconds=i),
+            'updated_at': start + timedelta(seconds=i, microseconds=i)
+        }
+        for i in range(count)
+    ]
+
+
+def time_call(func, repeat):
+    """Return the median wall time of ``func`` in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def run(rows=10000, repeat=5):
+    """Run the benchmark and return results keyed by serializer name"""
+    app = Flask(__name__)
+    native = make_rows(rows)
+    
+    def legacy():
+        # Old path: isoformat() per datetime per row, then stdlib json
+        formatted = [
+            dict(row, created_at=row['created_at'].isoformat(),
+                 updated_at=row['updated_at'].isoformat())
+            for row in native
+        ]
+        return DefaultJSONProvider(app).dumps({'posts': formatted}, separators=(',', ':'))
+    
+    results = {'flask-default (isoformat)': time_call(legacy, repeat)}
+    
+    backends = ['stdlib']
+    if orjson is not None:
+        backends.append('orjson')
+    if msgspec is not None:
+        backends.append('msgspec')
+    for backend in backends:
+        provider = FastJSONProvider(app, backend)
+        results[f'fast-{backend}'] = time_call(lambda: provider.dumps_bytes({'posts': native}), repeat)
+    
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000, help='Number of posts to serialize')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per serializer (median is reported)')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+    
+    results = run(args.rows, args.repeat)
+    baseline = results['flask-default (isoformat)']
+    
+    if args.json:
+        print(json.dumps({'rows': args.rows, 'median_ms': results}, indent=2))
+        return
+    
+    print(f'Serializing {args.rows} posts (median of {args.repeat} runs)')
+    print('-' * 56)
+    for name, elapsed in results.items():
+        print(f'{name:<28} {elapsed:>9.2f} ms  {baseline / elapsed:>6.1f}x')
+
+
+if __name__ == '__main__':
+    main()
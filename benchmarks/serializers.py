@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark the ways of serializing a page of posts
+
+Compares three paths over the same rows of a seeded SQLite database:
+
+    schema    ORM objects dumped by the precompiled ``PostSchema(many=True)``
+    to_dict   ORM objects converted with ``Post.to_dict()``
+    rows      column tuples zipped with their names (schemas/rows.py)
+
+Each path is timed twice: serializing rows that were already fetched, and
+end to end (query, serialize and JSON-encode), which is what a list request
+pays. The list endpoints use the fastest end-to-end path.
+
+    python -m benchmarks.serializers --rows 1000
+"""
+import argparse
+import json
+import os
+import tempfile
+
+from benchmarks.api_load import seed
+from benchmarks.json_serialization import time_call
+
+
+def run(database, rows=1000, repeat=5):
+    """Seed, time every path and return median milliseconds keyed by phase and path"""
+    app = seed(database, max(rows // 10, 1), rows)
+    
+    from app import db
+    from models.post import Post
+    from schemas.post import PostSchema
+    from schemas.rows import post_rows
+    
+    posts_schema = PostSchema(many=True)
+    
+    with app.app_context():
+        def fetch_objects():
+            return Post.query.options(Post.author_loader()).order_by(Post.id.desc()).limit(rows).all()
+        
+        def fetch_rows():
+            query, serialize = post_rows.query()
+            return query.order_by(Post.id.desc()).limit(rows).all(), serialize
+        
+        objects = fetch_objects()
+        tuples, serialize = fetch_rows()
+        # Outputs must match, or the comparison is meaningless
+        assert [post.to_dict() for post in objects] == [serialize(row) for row in tuples]
+        
+        serialize_only = {
+            'schema': time_call(lambda: posts_schema.dump(objects), repeat),
+            'to_dict': time_call(lambda: [post.to_dict() for post in objects], repeat),
+            'rows': time_call(lambda: [serialize(row) for row in tuples], repeat)
+        }
+        
+        def end_to_end(build):
+            def request():
+                app.json.dumps({'posts': build()})
+                # A request starts with an empty identity map
+                db.session.expunge_all()
+            return time_call(request, repeat)
+        
+        def rows_path():
+            page, serialize_row = fetch_rows()
+            return [serialize_row(row) for row in page]
+        
+        full = {
+            'schema': end_to_end(lambda: posts_schema.dump(fetch_objects())),
+            'to_dict': end_to_end(lambda: [post.to_dict() for post in fetch_objects()]),
+            'rows': end_to_end(rows_path)
+        }
+    return {'serialize': serialize_only, 'query+serialize+json': full}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--database', default=os.path.join(tempfile.gettempdir(), 'flask-boilerplate-serializers.db'),
+                        help='SQLite file to seed (reused when the dataset size matches)')
+    parser.add_argument('--rows', type=int, default=1000, help='Number of posts per page')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per path (median is reported)')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+    
+    results = run(args.database, args.rows, args.repeat)
+    
+    if args.json:
+        print(json.dumps({'rows': args.rows, 'median_ms': results}, indent=2))
+        return
+    
+    print(f'Serializing {args.rows} posts (median of {args.repeat} runs, speedup vs schema)')
+    for phase, timings in results.items():
+        print()
+        print(phase)
+        print('-' * 40)
+        for name, elapsed in timings.items():
+            print(f'{name:<12} {elapsed:>9.2f} ms  {timings["schema"] / elapsed:>6.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,6 @@
 import os
 from dotenv import load_dotenv
+from utils.pool import build_engine_options
 
 load_dotenv()
 
@@ -9,6 +10,20 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///app.db')
     
+    # Async engine of the ASGI entry point (asgi.py); defaults to DATABASE_URL with an asyncio driver
+    SQLALCHEMY_ASYNC_DATABASE_URI = os.getenv('ASYNC_DATABASE_URL')
+    
+    # Optional read replicas for read-only handlers (comma separated URLs)
+    SQLALCHEMY_REPLICA_URIS = [uri for uri in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if uri]
+    
+    # Connection pool (turned into SQLALCHEMY_ENGINE_OPTIONS by init_app)
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+    DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', '30'))
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+    DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+    DB_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', '0'))
+    
     # CORS settings
     CORS_ORIGINS = os.getenv('CORS_ORIGINS', 'http://localhost:3000,http://localhost:8080').split(',')
     
@@ -16,8 +31,70 @@ class Config:
     APP_NAME = os.getenv('APP_NAME', 'Flask Boilerplate')
     APP_VERSION = os.getenv('APP_VERSION', '1.0.0')
     
+    # Pagination
+    API_DEFAULT_PAGE_SIZE = int(os.getenv('API_DEFAULT_PAGE_SIZE', '20'))
+    API_MAX_PAGE_SIZE = int(os.getenv('API_MAX_PAGE_SIZE', '100'))
+    API_TOTAL_COUNT_TTL = int(os.getenv('API_TOTAL_COUNT_TTL', '30'))
+    API_STREAM_BATCH_SIZE = int(os.getenv('API_STREAM_BATCH_SIZE', '500'))
+    
+    # Bulk endpoints
+    BULK_MAX_ITEMS = int(os.getenv('BULK_MAX_ITEMS', '10000'))
+    BULK_CHUNK_SIZE = int(os.getenv('BULK_CHUNK_SIZE', '1000'))
+    
+    # Cache: lru (in-process), redis, fake (tests) or null. lru is only safe
+    # with a single process: invalidations never reach other workers' copies
+    CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'lru')
+    CACHE_DEFAULT_TTL = int(os.getenv('CACHE_DEFAULT_TTL', '60'))
+    CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', '10000'))
+    CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    CACHE_KEY_PREFIX = os.getenv('CACHE_KEY_PREFIX', 'cache:')
+    
+    # Password hashing (werkzeug method string, hashed in a process pool)
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt')
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', '2'))
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', '16'))
+    PASSWORD_HASH_TIMEOUT = int(os.getenv('PASSWORD_HASH_TIMEOUT', '30'))
+    
+    # JSON serialization backend: auto, orjson, msgspec or stdlib
+    JSON_BACKEND = os.getenv('JSON_BACKEND', 'auto')
+    
+    # Request/SQL instrumentation and the /metrics endpoint
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    
+    # Background jobs: 'thread' (in-process), 'redis' (manage.py run-worker) or 'eager'
+    JOBS_BACKEND = os.getenv('JOBS_BACKEND', 'thread')
+    JOBS_WORKERS = int(os.getenv('JOBS_WORKERS', '2'))
+    JOBS_REDIS_URL = os.getenv('JOBS_REDIS_URL', 'redis://localhost:6379/0')
+    JOBS_KEY_PREFIX = os.getenv('JOBS_KEY_PREFIX', 'jobs:')
+    JOBS_MAX_RETRIES = int(os.getenv('JOBS_MAX_RETRIES', '3'))
+    JOBS_RETRY_BACKOFF = float(os.getenv('JOBS_RETRY_BACKOFF', '1'))
+    JOBS_DEAD_LETTER_MAX = int(os.getenv('JOBS_DEAD_LETTER_MAX', '1000'))
+    
+    # Readiness probe: per-check timeout and result cache window (seconds)
+    HEALTH_CHECK_TIMEOUT = float(os.getenv('HEALTH_CHECK_TIMEOUT', '2'))
+    HEALTH_CACHE_TTL = float(os.getenv('HEALTH_CACHE_TTL', '2'))
+    
+    # Opt-in per-request profiling (X-Profile: cprofile|sample)
+    PROFILER_ENABLED = os.getenv('PROFILER_ENABLED', 'false').lower() == 'true'
+    PROFILER_ALLOWED_IPS = os.getenv('PROFILER_ALLOWED_IPS', '127.0.0.1').split(',')
+    PROFILER_DIR = os.getenv('PROFILER_DIR', 'profiles')
+    PROFILER_SAMPLE_INTERVAL = float(os.getenv('PROFILER_SAMPLE_INTERVAL', '0.001'))
+    
     # Logging
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    
+    @classmethod
+    def init_app(cls, app):
+        """Derive settings that depend on the final configuration"""
+        app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', build_engine_options(
+            app.config.get('SQLALCHEMY_DATABASE_URI'),
+            pool_size=app.config['DB_POOL_SIZE'],
+            max_overflow=app.config['DB_MAX_OVERFLOW'],
+            pool_timeout=app.config['DB_POOL_TIMEOUT'],
+            pool_recycle=app.config['DB_POOL_RECYCLE'],
+            pool_pre_ping=app.config['DB_POOL_PRE_PING'],
+            statement_timeout_ms=app.config['DB_STATEMENT_TIMEOUT_MS']
+        ))
 
 class DevelopmentConfig(Config):
     """Development configuration"""
@@ -31,15 +108,33 @@ class ProductionConfig(Config):
     
     # Override with production settings
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL')
-    if not SQLALCHEMY_DATABASE_URI:
-        raise ValueError("DATABASE_URL environment variable is required for production")
+    
+    # Sized for 4 gunicorn workers against PostgreSQL's default 100 connections
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '10'))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '5'))
+    DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', '10'))
+    DB_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', '30000'))
+    
+    # Production runs several workers, so share redis or cache nothing
+    CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'redis' if os.getenv('CACHE_REDIS_URL') else 'null')
+    
+    @classmethod
+    def init_app(cls, app):
+        if not app.config.get('SQLALCHEMY_DATABASE_URI'):
+            raise ValueError("DATABASE_URL environment variable is required for production")
+        super().init_app(app)
 
 class TestingConfig(Config):
     """Testing configuration"""
     TESTING = True
     DEBUG = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    SQLALCHEMY_REPLICA_URIS = []
     WTF_CSRF_ENABLED = False
+    CACHE_BACKEND = 'fake'
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'
+    PASSWORD_HASH_WORKERS = 0
+    JOBS_BACKEND = 'eager'
 
 # Configuration dictionary
 config = {
@@ -0,0 +1,89 @@
+"""
+Gunicorn configuration
+
+    gunicorn --config gunicorn.conf.py app:app
+
+Every setting can be overridden from the environment (or on the command
+line, which takes precedence over this file):
+
+    GUNICORN_BIND            address to listen on (default 0.0.0.0:5000)
+    GUNICORN_WORKER_CLASS    sync, gthread (default) or uvicorn.workers.UvicornWorker for asgi:app
+    WEB_CONCURRENCY          worker processes (default derived from the CPU count)
+    GUNICORN_THREADS         threads per gthread worker (default 4)
+    GUNICORN_PRELOAD         load the app once in the master before forking (default true)
+    GUNICORN_MAX_REQUESTS    recycle a worker after this many requests (default 1000, 0 disables)
+    GUNICORN_MAX_REQUESTS_JITTER  random extra requests so workers do not recycle together
+    GUNICORN_TIMEOUT         seconds before a silent worker is killed and restarted (default 30)
+    GUNICORN_ACCESS_LOG      access log file, '-' for stdout (default off)
+"""
+import os
+
+
+def _env_bool(name, default):
+    return os.getenv(name, str(default)).lower() in ('1', 'true', 'yes')
+
+
+def cpu_count():
+    """CPUs this process may run on (respects container CPU sets)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # pragma: no cover - not available on macOS
+        return os.cpu_count() or 1
+
+
+def default_workers(worker_class, cpus):
+    """Worker processes for ``worker_class`` on ``cpus`` CPUs
+    
+    Sync workers handle one request at a time, so the classic 2 * CPUs + 1
+    keeps the CPUs busy while some workers wait on I/O. Threaded and async
+    workers overlap I/O themselves; one process per CPU plus one is enough.
+    """
+    if worker_class == 'sync':
+        return 2 * cpus + 1
+    return cpus + 1
+
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.getenv('WEB_CONCURRENCY', '0')) or default_workers(worker_class, cpu_count())
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+
+# Each thread may hold one connection; size the per-worker pool to match
+# unless it was configured explicitly (config.py reads it when the app loads)
+if worker_class == 'gthread':
+    os.environ.setdefault('DB_POOL_SIZE', str(threads))
+
+# Import and initialise the app once in the master; workers share its memory
+# pages copy-on-write and start serving immediately. post_fork drops the
+# inherited connection pools so no socket is ever shared between processes.
+preload_app = _env_bool('GUNICORN_PRELOAD', True)
+
+# Bound slow memory growth by recycling workers; the jitter spreads restarts
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '1000'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', str(max_requests // 10)))
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '30'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+
+# Worker heartbeats on tmpfs; a disk-backed /tmp can stall them under load
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+loglevel = os.getenv('LOG_LEVEL', 'info').lower()
+accesslog = os.getenv('GUNICORN_ACCESS_LOG') or None
+
+
+def post_fork(server, worker):
+    """Give each worker its own database connections"""
+    if not server.cfg.preload_app:
+        return
+    from app import db
+    from utils.pool import dispose_pools
+    
+    application = server.app.wsgi()
+    # asgi:app wraps the Flask app and adds an async engine
+    state = getattr(application, 'state', None)
+    if state is not None and hasattr(state, 'flask_app'):
+        state.database.dispose_after_fork()
+        application = state.flask_app
+    dispose_pools(application, db)
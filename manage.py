@@ -4,84 +4,83 @@ Management script for Flask application
 """
 import os
 import sys
+import click
+from flask import current_app
 from flask.cli import FlaskGroup
 from app import create_app, db
 from models.user import User
 from models.post import Post
+from utils.routing import replica_reads
 
-app = create_app()
+# Commands run inside an app context created once by FlaskGroup
 cli = FlaskGroup(create_app=create_app)
 
 @cli.command("init-db")
 def init_db():
     """Initialize the database."""
-    with app.app_context():
-        db.create_all()
-        print("Database initialized!")
+    db.create_all()
+    print("Database initialized!")
 
 @cli.command("create-admin")
 def create_admin():
     """Create an admin user."""
-    with app.app_context():
-        username = input("Enter admin username: ")
-        email = input("Enter admin email: ")
-        password = input("Enter admin password: ")
-        
-        # Check if user already exists
-        if User.query.filter_by(username=username).first():
-            print("User already exists!")
-            return
-        
-        admin = User(
-            username=username,
-            email=email,
-            password=password
-        )
-        admin.is_admin = True
-        
-        db.session.add(admin)
-        db.session.commit()
-        print(f"Admin user '{username}' created successfully!")
+    username = input("Enter admin username: ")
+    email = input("Enter admin email: ")
+    password = input("Enter admin password: ")
+    
+    # Check if user already exists
+    if User.query.filter_by(username=username).first():
+        print("User already exists!")
+        return
+    
+    admin = User(
+        username=username,
+        email=email,
+        password=password
+    )
+    admin.is_admin = True
+    
+    db.session.add(admin)
+    db.session.commit()
+    print(f"Admin user '{username}' created successfully!")
 
 @cli.command("create-user")
 def create_user():
     """Create a regular user."""
-    with app.app_context():
-        username = input("Enter username: ")
-        email = input("Enter email: ")
-        password = input("Enter password: ")
-        first_name = input("Enter first name (optional): ")
-        last_name = input("Enter last name (optional): ")
-        
-        # Check if user already exists
-        if User.query.filter_by(username=username).first():
-            print("User already exists!")
-            return
-        
-        user = User(
-            username=username,
-            email=email,
-            password=password,
-            first_name=first_name if first_name else None,
-            last_name=last_name if last_name else None
-        )
-        
-        db.session.add(user)
-        db.session.commit()
-        print(f"User '{username}' created successfully!")
+    username = input("Enter username: ")
+    email = input("Enter email: ")
+    password = input("Enter password: ")
+    first_name = input("Enter first name (optional): ")
+    last_name = input("Enter last name (optional): ")
+    
+    # Check if user already exists
+    if User.query.filter_by(username=username).first():
+        print("User already exists!")
+        return
+    
+    user = User(
+        username=username,
+        email=email,
+        password=password,
+        first_name=first_name if first_name else None,
+        last_name=last_name if last_name else None
+    )
+    
+    db.session.add(user)
+    db.session.commit()
+    print(f"User '{username}' created successfully!")
 
 @cli.command("list-users")
 def list_users():
     """List all users."""
-    with app.app_context():
-        users = User.query.all()
-        if not users:
+    with replica_reads(db.session):
+        if not db.session.query(User.query.exists()).scalar():
             print("No users found.")
             return
         
         print("\nUsers:")
         print("-" * 50)
-        for user in users:
+        for user in User.query.order_by(User.id).yield_per(500):
             print(f"ID: {user.id}")
             print(f"Username: {user.username}")
             print(f"Email: {user.email}")
@@ -92,15 +91,14 @@ def list_users():
 @cli.command("list-posts")
 def list_posts():
     """List all posts."""
-    with app.app_context():
-        posts = Post.query.all()
-        if not posts:
+    with replica_reads(db.session):
+        if not db.session.query(Post.query.exists()).scalar():
             print("No posts found.")
             return
         
         print("\nPosts:")
         print("-" * 50)
-        for post in posts:
+        for post in Post.query.options(Post.author_loader('selectin')).order_by(Post.id).yield_per(500):
             print(f"ID: {post.id}")
             print(f"Title: {post.title}")
             print(f"Slug: {post.slug}")
@@ -108,12 +106,128 @@ def list_posts():
             print(f"Published: {post.is_published}")
             print("-" * 50)
 
+@cli.command("backfill-user-stats")
+@click.option("--batch-size", default=1000, show_default=True, help="Users recounted per transaction.")
+def backfill_user_stats(batch_size):
+    """Recount the post counters of every user."""
+    from services.post_counts import recompute
+    high = db.session.query(db.func.max(User.id)).scalar() or 0
+    updated = 0
+    for low in range(0, high, batch_size):
+        updated += recompute(low, min(low + batch_size, high))
+        db.session.commit()
+    print(f"Recounted post statistics for {updated} users.")
+
+def _export(model, fields, path, fmt, batch_size, resume):
+    from services import transfer
+    total = transfer.table_size(model)
+    
+    def progress(rows, last_id):
+        click.echo(f"  {rows} rows written (last id {last_id}, {total} in table)", err=True)
+    
+    try:
+        written, last_id = transfer.export_table(model, fields, path, fmt, batch_size, resume, progress)
+    except (transfer.TransferError, OSError) as e:
+        raise click.ClickException(str(e))
+    print(f"Exported {written} {model.__tablename__} to {path} (last id {last_id}).")
+
+def _import(model, path, fmt, chunk_size, resume, restore_ids):
+    from services import transfer
+    
+    def progress(records, created, failed):
+        click.echo(f"  {records} records committed ({created} created, {failed} rejected)", err=True)
+    
+    try:
+        created, failed, errors = transfer.import_table(
+            model, path, fmt, chunk_size, resume, restore_ids, progress
+        )
+    except (transfer.TransferError, OSError) as e:
+        raise click.ClickException(str(e))
+    print(f"Imported {created} {model.__tablename__} from {path}; {failed} rejected.")
+    for error in errors:
+        print(f"  {error}")
+
+def transfer_options(command):
+    """Options shared by the export/import commands"""
+    command = click.option("--format", "fmt", type=click.Choice(["ndjson", "csv"]),
+                           help="File format (default: csv for .csv files, else ndjson).")(command)
+    command = click.option("--resume", is_flag=True,
+                           help="Continue an interrupted run from PATH's checkpoint file.")(command)
+    return click.argument("path", type=click.Path(dir_okay=False))(command)
+
+@cli.command("export-users")
+@transfer_options
+@click.option("--batch-size", default=1000, show_default=True, help="Rows fetched and checkpointed per batch.")
+@click.option("--password-hash/--no-password-hash", default=True, show_default=True,
+              help="Include password hashes, so imported users can still log in.")
+def export_users(path, fmt, resume, batch_size, password_hash):
+    """Stream all users to an NDJSON or CSV file."""
+    from services.transfer import USER_FIELDS
+    fields = USER_FIELDS + ('password_hash',) if password_hash else USER_FIELDS
+    _export(User, fields, path, fmt, batch_size, resume)
+
+@cli.command("export-posts")
+@transfer_options
+@click.option("--batch-size", default=1000, show_default=True, help="Rows fetched and checkpointed per batch.")
+def export_posts(path, fmt, resume, batch_size):
+    """Stream all posts to an NDJSON or CSV file."""
+    from services.transfer import POST_FIELDS
+    _export(Post, POST_FIELDS, path, fmt, batch_size, resume)
+
+@cli.command("import-users")
+@transfer_options
+@click.option("--chunk-size", default=1000, show_default=True, help="Records inserted per transaction.")
+@click.option("--restore-ids/--new-ids", default=True, show_default=True,
+              help="Keep the ids from the file (restoring into an empty database) or assign new ones.")
+def import_users(path, fmt, resume, chunk_size, restore_ids):
+    """Insert users from an NDJSON or CSV file (password or password_hash per record)."""
+    _import(User, path, fmt, chunk_size, resume, restore_ids)
+
+@cli.command("import-posts")
+@transfer_options
+@click.option("--chunk-size", default=1000, show_default=True, help="Records inserted per transaction.")
+@click.option("--restore-ids/--new-ids", default=True, show_default=True,
+              help="Keep the ids from the file (restoring into an empty database) or assign new ones.")
+def import_posts(path, fmt, resume, chunk_size, restore_ids):
+    """Insert posts from an NDJSON or CSV file; authors must already exist."""
+    _import(Post, path, fmt, chunk_size, resume, restore_ids)
+
+@cli.command("run-worker")
+def run_worker():
+    """Run background jobs from the redis queue."""
+    backend = current_app.extensions['jobs']
+    if not hasattr(backend, 'work'):
+        print(f"JOBS_BACKEND is '{current_app.config['JOBS_BACKEND']}'; jobs run in the web process.")
+        return
+    
+    print("Worker started, waiting for jobs...")
+    try:
+        backend.work()
+    except KeyboardInterrupt:
+        print("Worker stopped.")
+
+@cli.command("list-dead-jobs")
+def list_dead_jobs():
+    """List jobs that failed on every attempt."""
+    dead = current_app.extensions['jobs'].dead_letters()
+    if not dead:
+        print("No dead jobs.")
+        return
+    
+    print("\nDead jobs:")
+    print("-" * 50)
+    for job in dead:
+        print(f"ID: {job['id']}")
+        print(f"Task: {job['task']}")
+        print(f"Attempts: {job['attempts']}")
+        print(f"Error: {job.get('error')}")
+        print("-" * 50)
+
 @cli.command("shell")
 def shell():
     """Start a Python shell with Flask app context."""
     import code
-    with app.app_context():
-        code.interact(local=locals())
+    code.interact(local=locals())
 
 if __name__ == '__main__':
     cli() 
\ No newline at end of file
@@ -0,0 +1,50 @@
+"""Add indexes for listing, filtering and ETag queries
+
+Revision ID: 4b1e2c7a9f30
+Revises: d0dff4df9489
+Create Date: 2026-10-18 10:12:41.508173
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '4b1e2c7a9f30'
+down_revision = 'd0dff4df9489'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_posts_created_at_id', 'posts', ['created_at', 'id']),
+    ('ix_posts_is_published_created_at_id', 'posts', ['is_published', 'created_at', 'id']),
+    ('ix_posts_author_id_created_at_id', 'posts', ['author_id', 'created_at', 'id']),
+    ('ix_posts_updated_at_id', 'posts', ['updated_at', 'id']),
+    ('ix_users_created_at_id', 'users', ['created_at', 'id']),
+    ('ix_users_updated_at_id', 'users', ['updated_at', 'id']),
+]
+
+
+def _is_postgresql():
+    return op.get_bind().dialect.name == 'postgresql'
+
+
+def upgrade():
+    if _is_postgresql():
+        # CREATE INDEX CONCURRENTLY cannot run inside a transaction block and
+        # does not lock the table against writes while it builds
+        with op.get_context().autocommit_block():
+            for name, table, columns in INDEXES:
+                op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+    else:
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    if _is_postgresql():
+        with op.get_context().autocommit_block():
+            for name, table, _ in reversed(INDEXES):
+                op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+    else:
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table)
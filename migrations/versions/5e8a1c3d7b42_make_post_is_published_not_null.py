@@ -0,0 +1,63 @@
+"""Make posts.is_published NOT NULL
+
+Revision ID: 5e8a1c3d7b42
+Revises: 9a4f6b2c8d17
+Create Date: 2026-10-18 18:02:37.114926
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e8a1c3d7b42'
+down_revision = '9a4f6b2c8d17'
+branch_labels = None
+depends_on = None
+
+# NULL was never counted as published by the post counters
+BACKFILL = 'UPDATE posts SET is_published = false WHERE is_published IS NULL'
+
+POSTGRESQL_UPGRADE = [
+    BACKFILL,
+    'ALTER TABLE posts ALTER COLUMN is_published SET DEFAULT false',
+    # Validating a CHECK only blocks schema changes, and SET NOT NULL then
+    # trusts it instead of scanning the table under an exclusive lock
+    'ALTER TABLE posts ADD CONSTRAINT posts_is_published_not_null CHECK (is_published IS NOT NULL) NOT VALID',
+    'ALTER TABLE posts VALIDATE CONSTRAINT posts_is_published_not_null',
+    'ALTER TABLE posts ALTER COLUMN is_published SET NOT NULL',
+    'ALTER TABLE posts DROP CONSTRAINT posts_is_published_not_null',
+]
+
+
+def _is_postgresql():
+    return op.get_bind().dialect.name == 'postgresql'
+
+
+def _alter_sqlite(**changes):
+    # SQLite rebuilds the table, which drops its triggers (the FTS sync ones)
+    connection = op.get_bind()
+    triggers = connection.execute(sa.text(
+        "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'posts'"
+    )).scalars().all()
+    with op.batch_alter_table('posts', schema=None) as batch_op:
+        batch_op.alter_column('is_published', existing_type=sa.Boolean(), **changes)
+    for trigger in triggers:
+        op.execute(trigger)
+
+
+def upgrade():
+    if _is_postgresql():
+        for statement in POSTGRESQL_UPGRADE:
+            op.execute(statement)
+    else:
+        op.execute(BACKFILL)
+        _alter_sqlite(nullable=False, server_default=sa.false())
+
+
+def downgrade():
+    if _is_postgresql():
+        op.execute('ALTER TABLE posts ALTER COLUMN is_published DROP NOT NULL')
+        op.execute('ALTER TABLE posts ALTER COLUMN is_published DROP DEFAULT')
+    else:
+        _alter_sqlite(nullable=True, server_default=None)
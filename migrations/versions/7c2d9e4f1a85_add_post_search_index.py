@@ -0,0 +1,103 @@
+"""Add full-text search index over post titles and content
+
+Revision ID: 7c2d9e4f1a85
+Revises: 4b1e2c7a9f30
+Create Date: 2026-10-18 14:03:27.114902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c2d9e4f1a85'
+down_revision = '4b1e2c7a9f30'
+branch_labels = None
+depends_on = None
+
+# Rows indexed per statement while backfilling existing posts
+BATCH_SIZE = 1000
+
+SQLITE_UPGRADE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5("
+    "title, content, content='posts', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS posts_fts_ai AFTER INSERT ON posts BEGIN "
+    "INSERT INTO posts_fts(rowid, title, content) VALUES (new.id, new.title, new.content); END",
+    "CREATE TRIGGER IF NOT EXISTS posts_fts_ad AFTER DELETE ON posts BEGIN "
+    "INSERT INTO posts_fts(posts_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content); END",
+    "CREATE TRIGGER IF NOT EXISTS posts_fts_au AFTER UPDATE OF title, content ON posts BEGIN "
+    "INSERT INTO posts_fts(posts_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content); "
+    "INSERT INTO posts_fts(rowid, title, content) VALUES (new.id, new.title, new.content); END",
+]
+
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('english', coalesce({row}.title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce({row}.content, '')), 'B')"
+)
+
+POSTGRESQL_UPGRADE = [
+    "ALTER TABLE posts ADD COLUMN IF NOT EXISTS search_vector tsvector",
+    "CREATE OR REPLACE FUNCTION posts_search_vector_update() RETURNS trigger AS $$ "
+    f"BEGIN NEW.search_vector := {SEARCH_VECTOR.format(row='NEW')}; RETURN NEW; END "
+    "$$ LANGUAGE plpgsql",
+    "DROP TRIGGER IF EXISTS posts_search_vector_trigger ON posts",
+    "CREATE TRIGGER posts_search_vector_trigger "
+    "BEFORE INSERT OR UPDATE OF title, content ON posts "
+    "FOR EACH ROW EXECUTE FUNCTION posts_search_vector_update()",
+]
+
+
+def _is_postgresql():
+    return op.get_bind().dialect.name == 'postgresql'
+
+
+def _id_batches(connection):
+    """Yield ``(low, high]`` id ranges covering the posts table"""
+    high = connection.execute(sa.text('SELECT max(id) FROM posts')).scalar() or 0
+    for low in range(0, high, BATCH_SIZE):
+        yield low, min(low + BATCH_SIZE, high)
+
+
+def upgrade():
+    if _is_postgresql():
+        # The trigger keeps new writes indexed while existing rows are
+        # backfilled in short transactions, so the table is never locked
+        # for the whole rewrite
+        with op.get_context().autocommit_block():
+            connection = op.get_bind()
+            for statement in POSTGRESQL_UPGRADE:
+                op.execute(statement)
+            for low, high in _id_batches(connection):
+                connection.execute(
+                    sa.text(f"UPDATE posts SET search_vector = {SEARCH_VECTOR.format(row='posts')} "
+                            "WHERE id > :low AND id <= :high"),
+                    {'low': low, 'high': high}
+                )
+            op.execute(
+                'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_posts_search_vector '
+                'ON posts USING gin (search_vector)'
+            )
+    else:
+        connection = op.get_bind()
+        for statement in SQLITE_UPGRADE:
+            op.execute(statement)
+        for low, high in _id_batches(connection):
+            connection.execute(
+                sa.text('INSERT INTO posts_fts(rowid, title, content) '
+                        'SELECT id, title, content FROM posts WHERE id > :low AND id <= :high'),
+                {'low': low, 'high': high}
+            )
+
+
+def downgrade():
+    if _is_postgresql():
+        with op.get_context().autocommit_block():
+            op.execute('DROP INDEX CONCURRENTLY IF EXISTS ix_posts_search_vector')
+        op.execute('DROP TRIGGER IF EXISTS posts_search_vector_trigger ON posts')
+        op.execute('DROP FUNCTION IF EXISTS posts_search_vector_update()')
+        op.execute('ALTER TABLE posts DROP COLUMN IF EXISTS search_vector')
+    else:
+        for trigger in ('posts_fts_au', 'posts_fts_ad', 'posts_fts_ai'):
+            op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        op.execute('DROP TABLE IF EXISTS posts_fts')
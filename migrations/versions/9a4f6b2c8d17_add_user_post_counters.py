@@ -0,0 +1,55 @@
+"""Add maintained post counters to users
+
+Revision ID: 9a4f6b2c8d17
+Revises: 7c2d9e4f1a85
+Create Date: 2026-10-18 15:41:09.382657
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a4f6b2c8d17'
+down_revision = '7c2d9e4f1a85'
+branch_labels = None
+depends_on = None
+
+# Users recounted per statement while backfilling
+BATCH_SIZE = 1000
+
+BACKFILL = sa.text(
+    'UPDATE users SET '
+    'post_count = (SELECT count(*) FROM posts WHERE posts.author_id = users.id), '
+    'published_post_count = (SELECT count(*) FROM posts '
+    'WHERE posts.author_id = users.id AND posts.is_published), '
+    'last_post_at = (SELECT max(created_at) FROM posts WHERE posts.author_id = users.id) '
+    'WHERE id > :low AND id <= :high'
+)
+
+
+def _backfill(connection):
+    high = connection.execute(sa.text('SELECT max(id) FROM users')).scalar() or 0
+    for low in range(0, high, BATCH_SIZE):
+        connection.execute(BACKFILL, {'low': low, 'high': min(low + BATCH_SIZE, high)})
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('post_count', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('published_post_count', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('last_post_at', sa.DateTime(), nullable=True))
+    
+    if op.get_bind().dialect.name == 'postgresql':
+        # Recount in short transactions instead of locking every user row at once
+        with op.get_context().autocommit_block():
+            _backfill(op.get_bind())
+    else:
+        _backfill(op.get_bind())
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('last_post_at')
+        batch_op.drop_column('published_post_count')
+        batch_op.drop_column('post_count')
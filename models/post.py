@@ -1,15 +1,35 @@
 from app import db
 from datetime import datetime
+from sqlalchemy.orm import joinedload, selectinload
+from utils.search import FullTextIndex
+
+# Eager loading strategies for Post.author, selectable per query
+AUTHOR_LOADERS = {
+    'joined': joinedload,
+    'selectin': selectinload
+}
+
+# Ranked full-text index over title and content; title matches weigh more
+SEARCH_INDEX = FullTextIndex('posts', ('title', 'content'), weights=(10.0, 1.0))
 
 class Post(db.Model):
     """Post model for blog/articles"""
     __tablename__ = 'posts'
+    __table_args__ = (
+        # Keyset pagination of the full list, newest first
+        db.Index('ix_posts_created_at_id', 'created_at', 'id'),
+        # Published / per-author listings, same ordering
+        db.Index('ix_posts_is_published_created_at_id', 'is_published', 'created_at', 'id'),
+        db.Index('ix_posts_author_id_created_at_id', 'author_id', 'created_at', 'id'),
+        # Keyset pagination by updated_at (sort=updated_at) and max(updated_at) for collection ETags
+        db.Index('ix_posts_updated_at_id', 'updated_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     content = db.Column(db.Text, nullable=False)
     slug = db.Column(db.String(200), unique=True, nullable=False)
-    is_published = db.Column(db.Boolean, default=False)
+    is_published = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -24,8 +44,42 @@ class Post(db.Model):
         self.author_id = author_id
         self.is_published = is_published
     
-    def to_dict(self):
-        """Convert model to dictionary"""
+    @classmethod
+    def author_loader(cls, strategy='joined'):
+        """Loader option that fetches authors together with the posts
+        
+        ``joined`` adds a LEFT OUTER JOIN to the posts query; ``selectin``
+        issues one extra ``IN`` query per batch of posts. Either way the
+        number of statements no longer grows with the number of rows.
+        """
+        try:
+            return AUTHOR_LOADERS[strategy](cls.author)
+        except KeyError:
+            raise ValueError(f'Unknown author loading strategy: {strategy}')
+    
+    @classmethod
+    def search(cls, terms, dialect):
+        """Posts matching ``terms`` as ``(query, score)``; higher scores rank first"""
+        return SEARCH_INDEX.search(cls.query, cls, terms, dialect)
+    
+    # Fields exposed by to_dict, in output order
+    FIELDS = (
+        'id', 'title', 'content', 'slug', 'is_published', 'author_id', 'author',
+        'created_at', 'updated_at'
+    )
+    
+    def to_dict(self, fields=None):
+        """Convert model to dictionary, optionally restricted to ``fields``
+        
+        With ``fields`` only the named attributes are read, so columns
+        deferred by ``load_only`` are never fetched.
+        """
+        if fields is not None:
+            return {
+                field: (self.author.username if self.author else None)
+                if field == 'author' else getattr(self, field)
+                for field in fields
+            }
         return {
             'id': self.id,
             'title': self.title,
@@ -34,9 +88,11 @@ class Post(db.Model):
             'is_published': self.is_published,
             'author_id': self.author_id,
             'author': self.author.username if self.author else None,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+            'created_at': self.created_at,
+            'updated_at': self.updated_at
         }
     
     def __repr__(self):
-        return f'<Post {self.title}>' 
\ No newline at end of file
+        return f'<Post {self.title}>' 
+
+SEARCH_INDEX.attach(Post.__table__)
@@ -1,10 +1,13 @@
-from app import db
+from app import db, hasher
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
 
 class User(db.Model):
     """User model for authentication and user management"""
     __tablename__ = 'users'
+    __table_args__ = (
+        db.Index('ix_users_created_at_id', 'created_at', 'id'),
+        db.Index('ix_users_updated_at_id', 'updated_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
@@ -17,23 +20,65 @@ class User(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
-    def __init__(self, username, email, password, first_name=None, last_name=None):
+    # Post counters maintained by services.post_counts
+    post_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    published_post_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    last_post_at = db.Column(db.DateTime, nullable=True)
+    
+    def __init__(self, username, email, password=None, first_name=None, last_name=None, password_hash=None):
         self.username = username
         self.email = email
-        self.password_hash = generate_password_hash(password)
+        # Callers that hash off the current thread pass ``password_hash`` instead
+        self.password_hash = password_hash if password_hash is not None else hasher.hash(password)
         self.first_name = first_name
         self.last_name = last_name
     
     def set_password(self, password):
         """Set password hash"""
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hasher.hash(password)
     
     def check_password(self, password):
-        """Check password against hash"""
-        return check_password_hash(self.password_hash, password)
+        """Check password against hash
+        
+        On success, a hash made with outdated parameters is transparently
+        replaced with one using the configured method; the caller commits.
+        """
+        if not hasher.verify(self.password_hash, password):
+            return False
+        if hasher.needs_rehash(self.password_hash):
+            self.password_hash = hasher.hash(password)
+        return True
+    
+    def invalidation_jobs(self):
+        """Jobs invalidating other resources that embed this user's data
+        
+        A rename touches every post of the author; finding them is left to a
+        job so the write does not scan the author's posts.
+        """
+        if not db.inspect(self).attrs.username.history.has_changes():
+            return []
+        from tasks.cache import invalidate_author_posts
+        return [(invalidate_author_posts, (self.id,))]
+    
+    def stats(self):
+        """Maintained post statistics"""
+        return {
+            'user_id': self.id,
+            'post_count': self.post_count,
+            'published_post_count': self.published_post_count,
+            'last_post_at': self.last_post_at
+        }
+    
+    # Fields exposed by to_dict, in output order
+    FIELDS = (
+        'id', 'username', 'email', 'first_name', 'last_name', 'is_active', 'is_admin',
+        'created_at', 'updated_at'
+    )
     
-    def to_dict(self):
-        """Convert model to dictionary"""
+    def to_dict(self, fields=None):
+        """Convert model to dictionary, optionally restricted to ``fields``"""
+        if fields is not None:
+            return {field: getattr(self, field) for field in fields}
         return {
             'id': self.id,
             'username': self.username,
@@ -42,8 +87,8 @@ class User(db.Model):
             'last_name': self.last_name,
             'is_active': self.is_active,
             'is_admin': self.is_admin,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+            'created_at': self.created_at,
+            'updated_at': self.updated_at
         }
     
     def __repr__(self):
@@ -1,20 +1,139 @@
-from flask import Blueprint, jsonify, request
-from app import db
+from flask import Blueprint, current_app, jsonify, request
+from sqlalchemy.orm import load_only
+from app import db, cache
 from models.user import User
 from models.post import Post
+from schemas.rows import post_rows, user_rows
+from services import bulk
+from services.post_counts import PostCountChanges
+from tasks.cache import warm_post_cache, warm_user_cache
+from utils.conditional import (
+    collection_etag, is_conditional, is_not_modified, not_modified,
+    payload_etag, resource_validators, with_validators
+)
+from utils.hashing import HashingBusy
+from utils.pagination import (
+    cached_count, keyset_paginate, ordering, parse_page_args, wants_total
+)
+from utils.routing import read_from_replica, read_only
+from utils.query_args import (
+    QueryArgumentError, created_range, equals, parse_bool, parse_fields,
+    parse_filters, parse_sort
+)
+from utils.streaming import stream_query, streaming_requested
 
 api_bp = Blueprint('api', __name__)
 
+# Query-string filters accepted by the list endpoints
+USER_FILTERS = (
+    equals('is_active', User.is_active, parse_bool),
+    equals('is_admin', User.is_admin, parse_bool),
+) + created_range(User)
+
+POST_FILTERS = (
+    equals('author_id', Post.author_id, int),
+    equals('is_published', Post.is_published, parse_bool),
+) + created_range(Post)
+
+SORT_KEYS = ('created_at', 'updated_at')
+
+def _list_collection(kind, rows, filters):
+    """Filtered, sorted, keyset-paginated (or streamed) collection response
+    
+    Rows are selected as plain column tuples through the ``rows``
+    serializer (see schemas/rows.py) rather than loaded as ORM objects.
+    With ``fields=`` the SELECT list is narrowed to the requested columns,
+    and related fields are only joined when they are part of the response.
+    Pages are tagged by a hash of their body, so a request costs the page
+    query alone; only streams aggregate over the filtered table for a tag.
+    """
+    model = rows.model
+    clauses, applied = parse_filters(filters)
+    columns, descending = parse_sort(model, SORT_KEYS)
+    fields = parse_fields(model.FIELDS)
+    total_query = model.query.filter(*clauses)
+    query, serialize = rows.query(fields, required=columns)
+    query = query.filter(*clauses)
+    
+    if streaming_requested():
+        etag = collection_etag(kind, rows.version_query(fields).filter(*clauses).one())
+        if is_not_modified(etag):
+            return not_modified(etag)
+        response = stream_query(query.order_by(*ordering(columns, descending)), serialize)
+        return with_validators(response, etag)
+    
+    limit, cursor = parse_page_args()
+    page, next_cursor = keyset_paginate(query, columns, limit, cursor, descending)
+    
+    payload = {
+        kind: [serialize(row) for row in page],
+        'next_cursor': next_cursor
+    }
+    if wants_total():
+        payload['total'] = cached_count(f'{kind}?{applied}', total_query)
+    response = jsonify(payload)
+    etag = payload_etag(response.get_data())
+    if is_not_modified(etag):
+        return not_modified(etag)
+    return with_validators(response, etag), 200
+
+def _read_batch(key):
+    """Return ``(items, None)`` or ``(None, error_response)`` for a bulk request"""
+    data = request.get_json(silent=True)
+    items = data.get(key) if isinstance(data, dict) else None
+    
+    if not isinstance(items, list) or not items:
+        return None, (jsonify({'error': f'Expected a non-empty "{key}" list'}), 400)
+    if len(items) > current_app.config.get('BULK_MAX_ITEMS', 10000):
+        return None, (jsonify({'error': 'Too many items in batch'}), 413)
+    return items, None
+
+def _validate(schema, data, partial=False):
+    """Return ``(data, None)`` or ``(None, error_response)`` for a request body
+    
+    The schemas are imported by the handlers on first use, which keeps
+    marshmallow off the startup path.
+    """
+    from marshmallow import ValidationError
+    
+    try:
+        return schema.load(data, partial=partial), None
+    except ValidationError as e:
+        return None, (jsonify({'error': 'Invalid input', 'fields': e.messages}), 400)
+
+def _run_batch(operation, items, success_status):
+    """Run a bulk operation in one transaction and report per-item results"""
+    try:
+        results = operation(items, current_app.config.get('BULK_CHUNK_SIZE', 1000))
+        db.session.commit()
+    except HashingBusy:
+        raise
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+    
+    failed = sum(1 for result in results if result['status'] == 'error')
+    if failed == len(results):
+        status = 400
+    elif failed:
+        status = 207
+    else:
+        status = success_status
+    return jsonify({
+        'results': results,
+        'succeeded': len(results) - failed,
+        'failed': failed
+    }), status
+
 # User routes
 @api_bp.route('/users', methods=['GET'])
+@read_only
 def get_users():
-    """Get all users"""
+    """Get a page of users; supports filters, sort and sparse fieldsets"""
     try:
-        users = User.query.all()
-        return jsonify({
-            'users': [user.to_dict() for user in users],
-            'count': len(users)
-        }), 200
+        return _list_collection('users', user_rows, USER_FILTERS)
+    except QueryArgumentError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -22,10 +141,11 @@ def get_users():
 def create_user():
     """Create a new user"""
     try:
-        data = request.get_json()
+        from schemas.user import user_schema
         
-        if not data or not all(k in data for k in ['username', 'email', 'password']):
-            return jsonify({'error': 'Missing required fields'}), 400
+        data, error = _validate(user_schema, request.get_json() or {})
+        if error:
+            return error
         
         # Check if user already exists
         if User.query.filter_by(username=data['username']).first():
@@ -44,22 +164,81 @@ def create_user():
         
         db.session.add(user)
         db.session.commit()
+        warm_user_cache.delay(user.id)
         
         return jsonify({
             'message': 'User created successfully',
             'user': user.to_dict()
         }), 201
         
+    except HashingBusy:
+        raise
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@api_bp.route('/users/bulk', methods=['POST'])
+def bulk_create_users():
+    """Create many users in one transaction"""
+    items, error = _read_batch('users')
+    if error:
+        return error
+    return _run_batch(bulk.create_users, items, 201)
+
+@api_bp.route('/users/bulk', methods=['PATCH'])
+def bulk_update_users():
+    """Partially update many users, addressed by id"""
+    items, error = _read_batch('users')
+    if error:
+        return error
+    return _run_batch(bulk.update_users, items, 200)
+
+@api_bp.route('/users/bulk', methods=['DELETE'])
+def bulk_delete_users():
+    """Delete many users by id"""
+    ids, error = _read_batch('ids')
+    if error:
+        return error
+    return _run_batch(bulk.delete_users, ids, 200)
+
 @api_bp.route('/users/<int:user_id>', methods=['GET'])
+@read_only
 def get_user(user_id):
     """Get user by ID"""
     try:
-        user = User.query.get_or_404(user_id)
-        return jsonify({'user': user.to_dict()}), 200
+        key = f'users:{user_id}'
+        data = cache.get(key)
+        if data is None and is_conditional():
+            # Answer revalidations from a primary-key probe before loading the row
+            version = User.query.with_entities(User.id, User.updated_at).filter_by(id=user_id).first()
+            if version is not None:
+                etag, last_modified = resource_validators('users', *version)
+                if is_not_modified(etag, last_modified):
+                    return not_modified(etag, last_modified)
+        if data is None:
+            lease = cache.lease()
+            data = User.query.get_or_404(user_id).to_dict()
+            if not read_from_replica(db.session):
+                cache.set(key, data, lease=lease)
+        
+        etag, last_modified = resource_validators('users', data['id'], data['updated_at'])
+        if is_not_modified(etag, last_modified):
+            return not_modified(etag, last_modified)
+        return with_validators(jsonify({'user': data}), etag, last_modified), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/users/<int:user_id>/stats', methods=['GET'])
+@read_only
+def get_user_stats(user_id):
+    """Post counters of a user, read from the maintained columns"""
+    try:
+        user = User.query.options(
+            load_only(User.id, User.post_count, User.published_post_count, User.last_post_at)
+        ).filter_by(id=user_id).first()
+        if user is None:
+            return jsonify({'error': 'User not found'}), 404
+        return jsonify({'stats': user.stats()}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -67,11 +246,16 @@ def get_user(user_id):
 def update_user(user_id):
     """Update user by ID"""
     try:
+        from schemas.user import user_schema
+        
         user = User.query.get_or_404(user_id)
         data = request.get_json()
         
         if data is None:
             return jsonify({'error': 'No data provided'}), 400
+        data, error = _validate(user_schema, data, partial=True)
+        if error:
+            return error
         
         if 'username' in data:
             user.username = data['username']
@@ -85,12 +269,15 @@ def update_user(user_id):
             user.set_password(data['password'])
         
         db.session.commit()
+        warm_user_cache.delay(user.id)
         
         return jsonify({
             'message': 'User updated successfully',
             'user': user.to_dict()
         }), 200
         
+    except HashingBusy:
+        raise
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -111,14 +298,35 @@ def delete_user(user_id):
 
 # Post routes
 @api_bp.route('/posts', methods=['GET'])
+@read_only
 def get_posts():
-    """Get all posts"""
+    """Get a page of posts; supports filters, sort and sparse fieldsets"""
+    try:
+        return _list_collection('posts', post_rows, POST_FILTERS)
+    except QueryArgumentError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/posts/search', methods=['GET'])
+@read_only
+def search_posts():
+    """Ranked full-text search over post titles and content, keyset paginated"""
     try:
-        posts = Post.query.all()
+        clauses, _ = parse_filters(POST_FILTERS)
+        query, score = Post.search(request.args.get('q', ''), db.engine.dialect.name)
+        query = query.filter(*clauses).options(Post.author_loader()).add_columns(score.label('score'))
+        
+        limit, cursor = parse_page_args()
+        rows, next_cursor = keyset_paginate(
+            query, [score, Post.id], limit, cursor, key=lambda row: [row.score, row.Post.id]
+        )
         return jsonify({
-            'posts': [post.to_dict() for post in posts],
-            'count': len(posts)
+            'posts': [dict(post.to_dict(), score=score) for post, score in rows],
+            'next_cursor': next_cursor
         }), 200
+    except QueryArgumentError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -126,10 +334,11 @@ def get_posts():
 def create_post():
     """Create a new post"""
     try:
-        data = request.get_json()
+        from schemas.post import post_schema
         
-        if not data or not all(k in data for k in ['title', 'content', 'slug', 'author_id']):
-            return jsonify({'error': 'Missing required fields'}), 400
+        data, error = _validate(post_schema, request.get_json() or {})
+        if error:
+            return error
         
         # Check if post with same slug already exists
         if Post.query.filter_by(slug=data['slug']).first():
@@ -144,7 +353,11 @@ def create_post():
         )
         
         db.session.add(post)
+        counts = PostCountChanges()
+        counts.added(post.author_id, post.is_published)
+        counts.apply()
         db.session.commit()
+        warm_post_cache.delay(post.id)
         
         return jsonify({
             'message': 'Post created successfully',
@@ -155,12 +368,56 @@ def create_post():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@api_bp.route('/posts/bulk', methods=['POST'])
+def bulk_create_posts():
+    """Create many posts in one transaction"""
+    items, error = _read_batch('posts')
+    if error:
+        return error
+    return _run_batch(bulk.create_posts, items, 201)
+
+@api_bp.route('/posts/bulk', methods=['PATCH'])
+def bulk_update_posts():
+    """Partially update many posts, addressed by id"""
+    items, error = _read_batch('posts')
+    if error:
+        return error
+    return _run_batch(bulk.update_posts, items, 200)
+
+@api_bp.route('/posts/bulk', methods=['DELETE'])
+def bulk_delete_posts():
+    """Delete many posts by id"""
+    ids, error = _read_batch('ids')
+    if error:
+        return error
+    return _run_batch(bulk.delete_posts, ids, 200)
+
 @api_bp.route('/posts/<int:post_id>', methods=['GET'])
+@read_only
 def get_post(post_id):
     """Get post by ID"""
     try:
-        post = Post.query.get_or_404(post_id)
-        return jsonify({'post': post.to_dict()}), 200
+        key = f'posts:{post_id}'
+        data = cache.get(key)
+        if data is None and is_conditional():
+            # Answer revalidations from a primary-key probe before loading the row
+            version = Post.query.with_entities(Post.id, Post.updated_at, User.username).outerjoin(
+                Post.author
+            ).filter(Post.id == post_id).first()
+            if version is not None:
+                etag, last_modified = resource_validators('posts', *version)
+                if is_not_modified(etag, last_modified):
+                    return not_modified(etag, last_modified)
+        if data is None:
+            lease = cache.lease()
+            data = Post.query.options(Post.author_loader()).get_or_404(post_id).to_dict()
+            if not read_from_replica(db.session):
+                cache.set(key, data, lease=lease)
+        
+        etag, last_modified = resource_validators('posts', data['id'], data['updated_at'], data['author'])
+        if is_not_modified(etag, last_modified):
+            return not_modified(etag, last_modified)
+        return with_validators(jsonify({'post': data}), etag, last_modified), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -168,11 +425,16 @@ def get_post(post_id):
 def update_post(post_id):
     """Update post by ID"""
     try:
+        from schemas.post import post_schema
+        
         post = Post.query.get_or_404(post_id)
         data = request.get_json()
         
         if data is None:
             return jsonify({'error': 'No data provided'}), 400
+        data, error = _validate(post_schema, data, partial=True)
+        if error:
+            return error
         
         if 'title' in data:
             post.title = data['title']
@@ -181,9 +443,12 @@ def update_post(post_id):
         if 'slug' in data:
             post.slug = data['slug']
         if 'is_published' in data:
-            post.is_published = data['is_published']
+            counts = PostCountChanges()
+            counts.publish_post(post, data['is_published'])
+            counts.apply()
         
         db.session.commit()
+        warm_post_cache.delay(post.id)
         
         return jsonify({
             'message': 'Post updated successfully',
@@ -199,7 +464,10 @@ def delete_post(post_id):
     """Delete post by ID"""
     try:
         post = Post.query.get_or_404(post_id)
+        counts = PostCountChanges()
+        counts.removed(post.author_id, post.is_published)
         db.session.delete(post)
+        counts.apply()
         db.session.commit()
         
         return jsonify({'message': 'Post deleted successfully'}), 200
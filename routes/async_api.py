@@ -0,0 +1,493 @@
+"""
+Async counterparts of the hot handlers in routes/api.py
+
+Served by the ASGI entry point (asgi.py). Each handler runs inside an app
+context of the wrapped Flask app, so configuration, the cache, the password
+hasher and background jobs are shared with the WSGI handlers, while database
+round trips go through an AsyncSession and never block the event loop.
+"""
+import functools
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import load_only
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+
+from flask import current_app
+from werkzeug.http import parse_date, parse_etags
+from models.post import SEARCH_INDEX, Post
+from models.user import User
+from schemas.rows import post_rows, user_rows
+from services.post_counts import PostCountChanges
+from tasks.cache import warm_post_cache, warm_user_cache
+from utils.cache import LRUCache, NullCache, run_invalidations, take_invalidations
+from utils.conditional import make_etag, payload_etag, resource_validators
+from utils.hashing import HashingBusy
+from utils.instrumentation import AsyncRequestTimer
+from utils.pagination import (
+    cached_count_async, finish_page, ordering, page_query, parse_page_args, wants_total
+)
+from utils.query_args import QueryArgumentError, parse_fields, parse_filters, parse_sort
+from utils.routing import read_from_replica
+from utils.streaming import NDJSON_MIMETYPE, wants_ndjson
+
+# Same whitelists as the WSGI handlers
+from routes.api import POST_FILTERS, SORT_KEYS, USER_FILTERS
+
+
+def json_response(data, status=200, headers=None):
+    """Encode ``data`` with the app's JSON provider (orjson/msgspec when available)"""
+    return Response(current_app.json.dumps_bytes(data), status, headers, media_type='application/json')
+
+
+def _error(message, status):
+    return json_response({'error': message}, status)
+
+
+def _validate(schema, data, partial=False):
+    """Return ``(data, None)`` or ``(None, error_response)`` for a request body"""
+    from marshmallow import ValidationError
+    
+    try:
+        return schema.load(data, partial=partial), None
+    except ValidationError as e:
+        return None, json_response({'error': 'Invalid input', 'fields': e.messages}, 400)
+
+
+def with_app_context(handler=None, read_only=False):
+    """Run ``handler`` in an app context and a fresh AsyncSession
+    
+    The session is passed as the second argument and closed afterwards;
+    ``read_only`` handlers get a replica session when replicas are
+    configured. Errors are reported the way the WSGI handlers report them,
+    and requests are timed into the Flask app's metrics under the name of
+    the matching WSGI endpoint.
+    """
+    if handler is None:
+        return functools.partial(with_app_context, read_only=read_only)
+    endpoint = f'api.{handler.__name__}'
+    
+    @functools.wraps(handler)
+    async def wrapper(request):
+        flask_app = request.app.state.flask_app
+        database = request.app.state.database
+        with flask_app.app_context():
+            timer = AsyncRequestTimer() if 'metrics' in flask_app.extensions else None
+            async with (database.replica_session() if read_only else database.session()) as session:
+                response = await _handle(handler, request, session)
+            if timer is not None:
+                timer.finish(endpoint, request.method, response)
+            return response
+    return wrapper
+
+
+async def _handle(handler, request, session):
+    try:
+        return await handler(request, session)
+    except QueryArgumentError as e:
+        return _error(str(e), 400)
+    except HashingBusy:
+        await session.rollback()
+        return json_response({'error': 'Server busy, please retry'}, 429, {'Retry-After': '1'})
+    except Exception as e:
+        await session.rollback()
+        return _error(str(e), 500)
+
+
+async def _blocking(func, *args):
+    """Call ``func`` inline for in-process backends, on a worker thread otherwise"""
+    if isinstance(getattr(func, '__self__', None), (LRUCache, NullCache)):
+        return func(*args)
+    return await run_in_threadpool(func, *args)
+
+
+async def _cache_get(key):
+    return await _blocking(current_app.extensions['cache'].get, key)
+
+
+async def _cache_lease():
+    return await _blocking(current_app.extensions['cache'].lease)
+
+
+async def _cache_set(key, value, lease):
+    await _blocking(current_app.extensions['cache'].set, key, value, None, lease)
+
+
+async def _commit(session):
+    """Commit, then run the cache invalidations and jobs it queued off the event loop"""
+    await session.commit()
+    keys, jobs = take_invalidations(session)
+    if keys or jobs:
+        await run_in_threadpool(run_invalidations, keys, jobs)
+
+
+async def _enqueue(task, *args):
+    await run_in_threadpool(task.delay, *args)
+
+
+async def _hash_password(password):
+    # HashingPool waits on a process pool; keep that wait off the event loop
+    return await run_in_threadpool(current_app.extensions['password_hasher'].hash, password)
+
+
+async def _read_json(request):
+    try:
+        data = await request.json()
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _is_conditional(request):
+    return 'if-none-match' in request.headers or 'if-modified-since' in request.headers
+
+
+def _not_modified(request, etag, last_modified=None):
+    """``utils.conditional.is_not_modified`` for a Starlette request"""
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match:
+        return parse_etags(if_none_match).contains_weak(etag)
+    if_modified_since = parse_date(request.headers.get('if-modified-since'))
+    if last_modified is not None and if_modified_since is not None:
+        return last_modified.replace(microsecond=0) <= if_modified_since
+    return False
+
+
+def _revalidated(request, etag, last_modified):
+    """304 response when the request's validators still match, else None"""
+    if _not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=_validator_headers(etag, last_modified))
+    return None
+
+
+def _validator_headers(etag, last_modified):
+    headers = {'ETag': f'"{etag}"'}
+    if last_modified is not None:
+        headers['Last-Modified'] = last_modified.strftime('%a, %d %b %Y %H:%M:%S GMT')
+    return headers
+
+
+async def _list_collection(request, session, kind, rows, filters):
+    """Async ``_list_collection``: filters, sort, sparse fields, keyset pages or a stream"""
+    model = rows.model
+    args = request.query_params
+    clauses, applied = parse_filters(filters, args)
+    columns, descending = parse_sort(model, SORT_KEYS, args=args)
+    fields = parse_fields(model.FIELDS, args)
+    
+    statement, serialize = rows.select(fields, required=columns)
+    statement = statement.where(*clauses)
+    
+    ndjson = wants_ndjson(request.headers.get('accept'))
+    if ndjson or args.get('stream', '').lower() in ('1', 'true', 'yes'):
+        version = (await session.execute(rows.version_select(fields).where(*clauses))).one()
+        etag = make_etag(kind, *version, request.url.query, request.headers.get('accept'))
+        if _not_modified(request, etag):
+            return Response(status_code=304, headers=_validator_headers(etag, None))
+        response = await _stream(request, session, statement.order_by(*ordering(columns, descending)),
+                                 serialize, ndjson)
+        response.headers.update(_validator_headers(etag, None))
+        return response
+    
+    limit, cursor = parse_page_args(args)
+    page = (await session.execute(page_query(statement, columns, limit, cursor, descending))).all()
+    page, next_cursor = finish_page(page, columns, limit, descending=descending)
+    payload = {kind: [serialize(row) for row in page], 'next_cursor': next_cursor}
+    if wants_total(args):
+        payload['total'] = await cached_count_async(
+            f'{kind}?{applied}', session, select(func.count()).select_from(model).where(*clauses)
+        )
+    body = current_app.json.dumps_bytes(payload)
+    etag = payload_etag(body)
+    headers = _validator_headers(etag, None)
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, headers=headers, media_type='application/json')
+
+
+async def _stream(request, handler_session, statement, serialize, ndjson):
+    """Stream every row of ``statement`` from a server-side cursor
+    
+    Reads go to the database (primary or replica) ``handler_session`` is bound to.
+    """
+    flask_app = request.app.state.flask_app
+    database = request.app.state.database
+    batch_size = flask_app.config.get('API_STREAM_BATCH_SIZE', 500)
+    dumps = flask_app.json.dumps
+    
+    async def generate():
+        # The response outlives the handler; use its own session and context
+        with flask_app.app_context():
+            async with database.session(bind=handler_session.bind) as session:
+                separator = '\n' if ndjson else ','
+                if not ndjson:
+                    yield '['
+                first = True
+                result = await session.stream(statement.execution_options(yield_per=batch_size))
+                async for partition in result.partitions():
+                    chunk = separator.join(dumps(serialize(row)) for row in partition)
+                    yield chunk if first else separator + chunk
+                    first = False
+                yield '\n' if ndjson else ']'
+    
+    return StreamingResponse(generate(), media_type=NDJSON_MIMETYPE if ndjson else 'application/json')
+
+
+# User routes
+@with_app_context(read_only=True)
+async def get_users(request, session):
+    """Get a page of users; supports filters, sort and sparse fieldsets"""
+    return await _list_collection(request, session, 'users', user_rows, USER_FILTERS)
+
+
+@with_app_context
+async def create_user(request, session):
+    """Create a new user"""
+    from schemas.user import user_schema
+    
+    data, error = _validate(user_schema, await _read_json(request) or {})
+    if error:
+        return error
+    
+    if await session.scalar(select(User.id).where(User.username == data['username'])):
+        return _error('Username already exists', 400)
+    if await session.scalar(select(User.id).where(User.email == data['email'])):
+        return _error('Email already exists', 400)
+    
+    user = User(
+        username=data['username'],
+        email=data['email'],
+        password_hash=await _hash_password(data['password']),
+        first_name=data.get('first_name'),
+        last_name=data.get('last_name')
+    )
+    session.add(user)
+    await _commit(session)
+    await _enqueue(warm_user_cache, user.id)
+    
+    return json_response({'message': 'User created successfully', 'user': user.to_dict()}, 201)
+
+
+@with_app_context(read_only=True)
+async def get_user(request, session):
+    """Get user by ID"""
+    user_id = request.path_params['user_id']
+    key = f'users:{user_id}'
+    data = await _cache_get(key)
+    if data is None and _is_conditional(request):
+        # Answer revalidations from a primary-key probe before loading the row
+        version = (await session.execute(
+            select(User.id, User.updated_at).where(User.id == user_id)
+        )).first()
+        if version is not None:
+            response = _revalidated(request, *resource_validators('users', *version))
+            if response is not None:
+                return response
+    if data is None:
+        lease = await _cache_lease()
+        user = await session.get(User, user_id)
+        if user is None:
+            return _error('Not found', 404)
+        data = user.to_dict()
+        if not read_from_replica(session):
+            await _cache_set(key, data, lease)
+    
+    etag, last_modified = resource_validators('users', data['id'], data['updated_at'])
+    return _revalidated(request, etag, last_modified) or json_response(
+        {'user': data}, headers=_validator_headers(etag, last_modified)
+    )
+
+
+@with_app_context(read_only=True)
+async def get_user_stats(request, session):
+    """Post counters of a user, read from the maintained columns"""
+    user = await session.scalar(
+        select(User).options(
+            load_only(User.id, User.post_count, User.published_post_count, User.last_post_at)
+        ).where(User.id == request.path_params['user_id'])
+    )
+    if user is None:
+        return _error('User not found', 404)
+    return json_response({'stats': user.stats()})
+
+
+@with_app_context
+async def update_user(request, session):
+    """Update user by ID"""
+    from schemas.user import user_schema
+    
+    user = await session.get(User, request.path_params['user_id'])
+    if user is None:
+        return _error('Not found', 404)
+    data = await _read_json(request)
+    if data is None:
+        return _error('No data provided', 400)
+    data, error = _validate(user_schema, data, partial=True)
+    if error:
+        return error
+    
+    for field in ('username', 'email', 'first_name', 'last_name'):
+        if field in data:
+            setattr(user, field, data[field])
+    if 'password' in data:
+        user.password_hash = await _hash_password(data['password'])
+    
+    await _commit(session)
+    await _enqueue(warm_user_cache, user.id)
+    return json_response({'message': 'User updated successfully', 'user': user.to_dict()})
+
+
+@with_app_context
+async def delete_user(request, session):
+    """Delete user by ID"""
+    user = await session.get(User, request.path_params['user_id'])
+    if user is None:
+        return _error('Not found', 404)
+    await session.delete(user)
+    await _commit(session)
+    return json_response({'message': 'User deleted successfully'})
+
+
+# Post routes
+@with_app_context(read_only=True)
+async def get_posts(request, session):
+    """Get a page of posts; supports filters, sort and sparse fieldsets"""
+    return await _list_collection(request, session, 'posts', post_rows, POST_FILTERS)
+
+
+@with_app_context(read_only=True)
+async def search_posts(request, session):
+    """Ranked full-text search over post titles and content, keyset paginated"""
+    args = request.query_params
+    clauses, _ = parse_filters(POST_FILTERS, args)
+    dialect = request.app.state.database.engine.dialect.name
+    statement, score = SEARCH_INDEX.search(select(Post), Post, args.get('q', ''), dialect)
+    statement = statement.where(*clauses).options(Post.author_loader()).add_columns(score.label('score'))
+    
+    limit, cursor = parse_page_args(args)
+    columns = [score, Post.id]
+    rows = (await session.execute(page_query(statement, columns, limit, cursor))).all()
+    rows, next_cursor = finish_page(rows, columns, limit, key=lambda row: [row.score, row.Post.id])
+    return json_response({
+        'posts': [dict(post.to_dict(), score=score) for post, score in rows],
+        'next_cursor': next_cursor
+    })
+
+
+@with_app_context
+async def create_post(request, session):
+    """Create a new post"""
+    from schemas.post import post_schema
+    
+    data, error = _validate(post_schema, await _read_json(request) or {})
+    if error:
+        return error
+    
+    if await session.scalar(select(Post.id).where(Post.slug == data['slug'])):
+        return _error('Post with this slug already exists', 400)
+    
+    post = Post(
+        title=data['title'],
+        content=data['content'],
+        slug=data['slug'],
+        author_id=data['author_id'],
+        is_published=data.get('is_published', False)
+    )
+    session.add(post)
+    counts = PostCountChanges()
+    counts.added(post.author_id, post.is_published)
+    await counts.apply_async(session)
+    await _commit(session)
+    await session.refresh(post, ['author'])
+    await _enqueue(warm_post_cache, post.id)
+    
+    return json_response({'message': 'Post created successfully', 'post': post.to_dict()}, 201)
+
+
+@with_app_context(read_only=True)
+async def get_post(request, session):
+    """Get post by ID"""
+    post_id = request.path_params['post_id']
+    key = f'posts:{post_id}'
+    data = await _cache_get(key)
+    if data is None and _is_conditional(request):
+        # Answer revalidations from a primary-key probe before loading the row
+        version = (await session.execute(
+            select(Post.id, Post.updated_at, User.username).outerjoin(Post.author).where(Post.id == post_id)
+        )).first()
+        if version is not None:
+            response = _revalidated(request, *resource_validators('posts', *version))
+            if response is not None:
+                return response
+    if data is None:
+        lease = await _cache_lease()
+        post = await session.get(Post, post_id, options=[Post.author_loader()])
+        if post is None:
+            return _error('Not found', 404)
+        data = post.to_dict()
+        if not read_from_replica(session):
+            await _cache_set(key, data, lease)
+    
+    etag, last_modified = resource_validators('posts', data['id'], data['updated_at'], data['author'])
+    return _revalidated(request, etag, last_modified) or json_response(
+        {'post': data}, headers=_validator_headers(etag, last_modified)
+    )
+
+
+@with_app_context
+async def update_post(request, session):
+    """Update post by ID"""
+    from schemas.post import post_schema
+    
+    post = await session.get(Post, request.path_params['post_id'], options=[Post.author_loader()])
+    if post is None:
+        return _error('Not found', 404)
+    data = await _read_json(request)
+    if data is None:
+        return _error('No data provided', 400)
+    data, error = _validate(post_schema, data, partial=True)
+    if error:
+        return error
+    
+    for field in ('title', 'content', 'slug'):
+        if field in data:
+            setattr(post, field, data[field])
+    if 'is_published' in data:
+        counts = PostCountChanges()
+        await counts.publish_post_async(session, post, data['is_published'])
+        await counts.apply_async(session)
+    
+    await _commit(session)
+    await _enqueue(warm_post_cache, post.id)
+    return json_response({'message': 'Post updated successfully', 'post': post.to_dict()})
+
+
+@with_app_context
+async def delete_post(request, session):
+    """Delete post by ID"""
+    post = await session.get(Post, request.path_params['post_id'])
+    if post is None:
+        return _error('Not found', 404)
+    counts = PostCountChanges()
+    counts.removed(post.author_id, post.is_published)
+    await session.delete(post)
+    await counts.apply_async(session)
+    await _commit(session)
+    return json_response({'message': 'Post deleted successfully'})
+
+
+routes = [
+    Route('/api/users', get_users, methods=['GET']),
+    Route('/api/users', create_user, methods=['POST']),
+    Route('/api/users/{user_id:int}', get_user, methods=['GET']),
+    Route('/api/users/{user_id:int}', update_user, methods=['PUT']),
+    Route('/api/users/{user_id:int}', delete_user, methods=['DELETE']),
+    Route('/api/users/{user_id:int}/stats', get_user_stats, methods=['GET']),
+    Route('/api/posts', get_posts, methods=['GET']),
+    Route('/api/posts', create_post, methods=['POST']),
+    Route('/api/posts/search', search_posts, methods=['GET']),
+    Route('/api/posts/{post_id:int}', get_post, methods=['GET']),
+    Route('/api/posts/{post_id:int}', update_post, methods=['PUT']),
+    Route('/api/posts/{post_id:int}', delete_post, methods=['DELETE']),
+]
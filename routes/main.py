@@ -1,4 +1,9 @@
-from flask import Blueprint, jsonify, render_template_string
+from datetime import datetime, timezone
+from flask import Blueprint, Response, current_app, jsonify, render_template_string
+from app import db
+from utils.cache import NullCache
+from utils.health import check_cache, check_database, readiness
+from utils.pool import pool_status
 
 main_bp = Blueprint('main', __name__)
 
@@ -16,9 +21,49 @@ def health_check():
     """Health check endpoint"""
     return jsonify({
         'status': 'healthy',
-        'timestamp': '2024-01-01T00:00:00Z'
+        'timestamp': datetime.now(timezone.utc).isoformat()
     })
 
+def _engines():
+    """Every engine of the app (binds and replicas) keyed by a display name"""
+    engines = {bind_key or 'default': engine for bind_key, engine in db.engines.items()}
+    replicas = current_app.extensions.get('replicas')
+    if replicas:
+        engines.update((f'replica-{index}', engine) for index, engine in enumerate(replicas.engines))
+    return engines
+
+def _dependency_checks():
+    """Readiness checks for every database engine and the cache backend"""
+    checks = {f'database:{name}': check_database(engine) for name, engine in _engines().items()}
+    backend = current_app.extensions.get('cache')
+    if backend is not None and not isinstance(backend, NullCache):
+        checks['cache'] = check_cache(backend)
+    return checks
+
+@main_bp.route('/health/live')
+def liveness():
+    """Liveness probe: the worker is up and serving requests"""
+    return jsonify({'status': 'alive'})
+
+@main_bp.route('/health/ready')
+def readiness_check():
+    """Readiness probe: databases and cache answer within the timeout"""
+    ready, report = readiness(current_app).report(_dependency_checks)
+    return jsonify(report), 200 if ready else 503
+
+@main_bp.route('/metrics/pool')
+def pool_metrics():
+    """Connection pool occupancy and checkout wait statistics per engine"""
+    return jsonify({'engines': {name: pool_status(engine) for name, engine in _engines().items()}})
+
+@main_bp.route('/metrics')
+def metrics():
+    """Aggregated request and SQL metrics in Prometheus text format"""
+    registry = current_app.extensions.get('metrics')
+    if registry is None:
+        return jsonify({'error': 'Metrics are disabled'}), 404
+    return Response(registry.render(_engines()), mimetype='text/plain; version=0.0.4')
+
 @main_bp.route('/docs')
 def api_docs():
     """API documentation endpoint"""
@@ -26,13 +71,25 @@ def api_docs():
         'endpoints': {
             'GET /': 'Welcome message',
             'GET /health': 'Health check',
-            'GET /api/users': 'Get all users',
+            'GET /health/live': 'Liveness probe',
+            'GET /health/ready': 'Readiness probe with dependency latency',
+            'GET /metrics': 'Prometheus request/SQL metrics',
+            'GET /metrics/pool': 'Connection pool metrics',
+            'GET /api/users': 'Get users (cursor paginated)',
             'POST /api/users': 'Create new user',
+            'POST /api/users/bulk': 'Create many users',
+            'PATCH /api/users/bulk': 'Update many users',
+            'DELETE /api/users/bulk': 'Delete many users',
             'GET /api/users/<id>': 'Get user by ID',
+            'GET /api/users/<id>/stats': 'Post counters of a user',
             'PUT /api/users/<id>': 'Update user',
             'DELETE /api/users/<id>': 'Delete user',
-            'GET /api/posts': 'Get all posts',
+            'GET /api/posts': 'Get posts (cursor paginated)',
             'POST /api/posts': 'Create new post',
+            'POST /api/posts/bulk': 'Create many posts',
+            'PATCH /api/posts/bulk': 'Update many posts',
+            'DELETE /api/posts/bulk': 'Delete many posts',
+            'GET /api/posts/search?q=': 'Ranked full-text search over posts',
             'GET /api/posts/<id>': 'Get post by ID',
             'PUT /api/posts/<id>': 'Update post',
             'DELETE /api/posts/<id>': 'Delete post'
@@ -0,0 +1,28 @@
+"""
+Post schema
+
+Validates post request bodies; instances are created once, like in
+schemas/user.py.
+"""
+from marshmallow import EXCLUDE
+
+from app import ma
+from models.post import Post
+
+
+class PostSchema(ma.SQLAlchemyAutoSchema):
+    """The public post fields, with the author's username"""
+    
+    class Meta:
+        model = Post
+        include_fk = True
+        fields = Post.FIELDS
+        unknown = EXCLUDE
+    
+    id = ma.auto_field(dump_only=True)
+    author = ma.Function(lambda post: post.author.username if post.author else None, dump_only=True)
+    created_at = ma.auto_field(dump_only=True)
+    updated_at = ma.auto_field(dump_only=True)
+
+
+post_schema = PostSchema()
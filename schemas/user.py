@@ -0,0 +1,34 @@
+"""
+User schema
+
+Validates user request bodies. Building a schema resolves and converts every
+field, so the instances below are created once when the module is first
+imported and shared by all requests (schemas keep no per-call state).
+Importing this module loads flask_marshmallow; the routes import it on
+first use so it stays off the startup path.
+"""
+from marshmallow import EXCLUDE, validate
+
+from app import ma
+from models.user import User
+
+
+class UserSchema(ma.SQLAlchemyAutoSchema):
+    """The public user fields; ``password`` is accepted on input only"""
+    
+    class Meta:
+        model = User
+        fields = User.FIELDS + ('password',)
+        # Ignore fields clients may not set, as the handlers always have
+        unknown = EXCLUDE
+    
+    id = ma.auto_field(dump_only=True)
+    email = ma.auto_field(validate=[validate.Email(), validate.Length(max=120)])
+    password = ma.String(required=True, load_only=True, validate=validate.Length(min=1))
+    is_active = ma.auto_field(dump_only=True)
+    is_admin = ma.auto_field(dump_only=True)
+    created_at = ma.auto_field(dump_only=True)
+    updated_at = ma.auto_field(dump_only=True)
+
+
+user_schema = UserSchema()
@@ -0,0 +1,429 @@
+"""
+Batch create, update and delete of posts and users
+
+Each operation validates the whole batch up front (types and formats through
+the marshmallow schemas, in one ``load(many=True)`` call), checks uniqueness
+with one ``IN`` query per chunk instead of one query per item, and writes
+with executemany-style bulk statements. The caller owns the transaction and
+commits once. Every function returns one result dict per input item, in
+input order::
+
+    {'index': 0, 'status': 'created', 'id': 42}
+    {'index': 1, 'status': 'error', 'error': 'Post with this slug already exists'}
+"""
+from datetime import datetime
+
+from sqlalchemy import delete, insert, select, update
+from app import db, hasher
+from models.post import Post
+from models.user import User
+from services.post_counts import PostCountChanges
+from tasks.cache import invalidate_author_posts
+from utils.cache import mark_stale, queue_invalidation
+
+POST_UPDATABLE = ('title', 'content', 'slug', 'is_published')
+USER_UPDATABLE = ('username', 'email', 'first_name', 'last_name', 'password')
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _error(index, message):
+    return {'index': index, 'status': 'error', 'error': message}
+
+
+def _existing(column, values, chunk_size):
+    """Subset of ``values`` already stored in ``column``"""
+    found = set()
+    for chunk in _chunks(list(values), chunk_size):
+        found.update(db.session.execute(select(column).where(column.in_(chunk))).scalars())
+    return found
+
+
+def _owners(column, values, chunk_size):
+    """Map each stored value of a unique ``column`` to its row id"""
+    model = column.class_
+    owners = {}
+    for chunk in _chunks(list(values), chunk_size):
+        owners.update(db.session.execute(select(column, model.id).where(column.in_(chunk))).all())
+    return owners
+
+
+def _rows_by_id(columns, ids, chunk_size):
+    """Map each id to the given columns of its row"""
+    model = columns[0].class_
+    rows = {}
+    for chunk in _chunks(list(ids), chunk_size):
+        for row in db.session.execute(select(model.id, *columns).where(model.id.in_(chunk))):
+            rows[row[0]] = row[1:]
+    return rows
+
+
+def _is_id(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _insert(model, key, rows, positions, chunk_size, results):
+    """Bulk insert ``rows``, matching generated ids back through unique ``key``
+    
+    RETURNING order is not guaranteed across batched multi-row INSERTs, and
+    asking SQLAlchemy to sort by parameter order forces one statement per row
+    on some backends, so ids are matched through a unique column instead.
+    """
+    column = getattr(model, key)
+    for chunk_rows, chunk_positions in zip(_chunks(rows, chunk_size), _chunks(positions, chunk_size)):
+        ids = dict(db.session.execute(insert(model).returning(column, model.id), chunk_rows).all())
+        for index, row in zip(chunk_positions, chunk_rows):
+            results[index] = {'index': index, 'status': 'created', 'id': ids[row[key]]}
+
+
+def _update(model, rows, positions, chunk_size, results):
+    for chunk_rows in _chunks(rows, chunk_size):
+        db.session.execute(update(model), chunk_rows)
+    for index, row in zip(positions, rows):
+        results[index] = {'index': index, 'status': 'updated', 'id': row['id']}
+    mark_stale(db.session, *(f'{model.__tablename__}:{row["id"]}' for row in rows))
+
+
+def _delete(model, ids, positions, chunk_size, results):
+    for chunk in _chunks(ids, chunk_size):
+        db.session.execute(
+            delete(model).where(model.id.in_(chunk)),
+            execution_options={'synchronize_session': False}
+        )
+    for index, row_id in zip(positions, ids):
+        results[index] = {'index': index, 'status': 'deleted', 'id': row_id}
+    mark_stale(db.session, *(f'{model.__tablename__}:{row_id}' for row_id in ids))
+
+
+def _unique_in_batch(candidates, field, label, results):
+    """Drop candidates whose ``field`` repeats an earlier item of the batch"""
+    seen = set()
+    kept = []
+    for index, item in candidates:
+        if field in item:
+            if item[field] in seen:
+                results[index] = _error(index, f'Duplicate {label} in batch')
+                continue
+            seen.add(item[field])
+        kept.append((index, item))
+    return kept
+
+
+def _kept(item, keep):
+    """The ``keep`` fields present in ``item``, copied verbatim into the row"""
+    return {key: item[key] for key in keep if key in item}
+
+
+def _check_kept(model, candidates, keep, chunk_size, results):
+    """Drop candidates whose ``keep`` fields do not fit their columns
+    
+    Kept fields bypass the schemas, so an id must be an integer, timestamps
+    datetimes and so on; with ``id`` kept, ids must also be new.
+    """
+    columns = model.__table__.c
+    valid = []
+    for index, item in candidates:
+        for key in keep:
+            if key not in item:
+                continue
+            value, column = item[key], columns[key]
+            if value is None:
+                ok = column.nullable and not column.primary_key
+            elif column.type.python_type is int:
+                ok = _is_id(value)
+            else:
+                ok = isinstance(value, column.type.python_type)
+            if not ok:
+                results[index] = _error(index, f'{key}: Invalid value.')
+                break
+        else:
+            valid.append((index, item))
+    if 'id' not in keep:
+        return valid
+    
+    valid = _unique_in_batch(valid, 'id', 'id', results)
+    taken = _existing(model.id, [item['id'] for _, item in valid if 'id' in item], chunk_size)
+    label = model.__name__
+    kept = []
+    for index, item in valid:
+        if item.get('id') in taken:
+            results[index] = _error(index, f'{label} with this id already exists')
+        else:
+            kept.append((index, item))
+    return kept
+
+
+def _describe(messages):
+    """One line from marshmallow's per-field error messages"""
+    return '; '.join(
+        f'{field}: {" ".join(errors) if isinstance(errors, list) else errors}' if field != '_schema'
+        else ' '.join(errors)
+        for field, errors in messages.items()
+    )
+
+
+def _load(schema, candidates, results, partial=False, carry=()):
+    """Validate candidates with ``schema``; invalid ones become per-item errors
+    
+    Returns ``(index, data)`` pairs of the valid candidates, where ``data``
+    is the loaded item plus its ``carry`` fields (such as ``id``), which
+    the schema does not accept from clients.
+    """
+    from marshmallow import ValidationError
+    
+    try:
+        loaded, errors = schema.load([item for _, item in candidates], many=True, partial=partial), {}
+    except ValidationError as e:
+        loaded, errors = e.valid_data, e.messages
+    valid = []
+    for position, ((index, item), data) in enumerate(zip(candidates, loaded)):
+        if position in errors:
+            results[index] = _error(index, _describe(errors[position]))
+        else:
+            valid.append((index, dict(data, **_kept(item, carry))))
+    return valid
+
+
+def _validate_ids(items, results):
+    """Candidates carrying an integer id that is unique within the batch"""
+    candidates = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not _is_id(item.get('id')):
+            results[index] = _error(index, 'Missing or invalid id')
+        else:
+            candidates.append((index, item))
+    return _unique_in_batch(candidates, 'id', 'id', results)
+
+
+def create_posts(items, chunk_size=DEFAULT_CHUNK_SIZE, keep=()):
+    """Insert new posts
+    
+    ``keep`` names extra columns taken from the items as given, such as
+    ``('id', 'created_at', 'updated_at')`` when restoring an export.
+    """
+    from schemas.post import post_schema
+    
+    results = [None] * len(items)
+    candidates = _load(post_schema, list(enumerate(items)), results, carry=keep)
+    candidates = _check_kept(Post, candidates, keep, chunk_size, results)
+    candidates = _unique_in_batch(candidates, 'slug', 'slug', results)
+    
+    taken = _existing(Post.slug, [item['slug'] for _, item in candidates], chunk_size)
+    authors = _existing(User.id, {item['author_id'] for _, item in candidates}, chunk_size)
+    
+    rows, positions = [], []
+    for index, item in candidates:
+        if item['slug'] in taken:
+            results[index] = _error(index, 'Post with this slug already exists')
+        elif item['author_id'] not in authors:
+            results[index] = _error(index, 'Author not found')
+        else:
+            rows.append({
+                'title': item['title'],
+                'content': item['content'],
+                'slug': item['slug'],
+                'author_id': item['author_id'],
+                'is_published': item.get('is_published', False),
+                **_kept(item, keep)
+            })
+            positions.append(index)
+    
+    _insert(Post, 'slug', rows, positions, chunk_size, results)
+    
+    counts = PostCountChanges()
+    for row in rows:
+        counts.added(row['author_id'], row['is_published'])
+    counts.apply()
+    return results
+
+
+def update_posts(items, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Apply partial updates to existing posts, addressed by ``id``"""
+    from schemas.post import post_schema
+    
+    results = [None] * len(items)
+    candidates = _validate_ids(items, results)
+    candidates = _load(post_schema, candidates, results, partial=True, carry=('id',))
+    candidates = _unique_in_batch(candidates, 'slug', 'slug', results)
+    
+    found = _existing(Post.id, [item['id'] for _, item in candidates], chunk_size)
+    slug_owners = _owners(Post.slug, [item['slug'] for _, item in candidates if 'slug' in item], chunk_size)
+    
+    now = datetime.utcnow()
+    rows, positions = [], []
+    for index, item in candidates:
+        if item['id'] not in found:
+            results[index] = _error(index, 'Post not found')
+        elif slug_owners.get(item.get('slug'), item['id']) != item['id']:
+            results[index] = _error(index, 'Post with this slug already exists')
+        else:
+            row = {key: item[key] for key in POST_UPDATABLE if key in item}
+            row.update(id=item['id'], updated_at=now)
+            rows.append(row)
+            positions.append(index)
+    
+    # Flags are written by counts.publish, which only counts posts it changed
+    publishing = {}
+    for row in rows:
+        if 'is_published' in row:
+            publishing.setdefault(row.pop('is_published'), []).append(row['id'])
+    
+    _update(Post, rows, positions, chunk_size, results)
+    
+    counts = PostCountChanges()
+    for is_published, ids in publishing.items():
+        for chunk in _chunks(ids, chunk_size):
+            counts.publish(chunk, is_published, now)
+    counts.apply()
+    return results
+
+
+def delete_posts(ids, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Delete posts by id"""
+    results = [None] * len(ids)
+    candidates = _validate_ids([{'id': post_id} for post_id in ids], results)
+    found = _rows_by_id((Post.author_id, Post.is_published), [item['id'] for _, item in candidates], chunk_size)
+    
+    delete_ids, positions = [], []
+    counts = PostCountChanges()
+    for index, item in candidates:
+        if item['id'] not in found:
+            results[index] = _error(index, 'Post not found')
+        else:
+            delete_ids.append(item['id'])
+            positions.append(index)
+            counts.removed(*found[item['id']])
+    
+    _delete(Post, delete_ids, positions, chunk_size, results)
+    counts.apply()
+    return results
+
+
+def create_users(items, chunk_size=DEFAULT_CHUNK_SIZE, keep=()):
+    """Insert new users
+    
+    ``keep`` names extra columns taken from the items as given. With
+    ``password_hash`` among them, an item carrying a hash needs no
+    ``password`` and is not hashed again.
+    """
+    from schemas.user import user_schema
+    
+    def pre_hashed(item):
+        return 'password_hash' in keep and 'password_hash' in item
+    
+    results = [None] * len(items)
+    # Restored users may carry a password hash instead of a password
+    partial = ('password',) if 'password_hash' in keep else False
+    candidates = []
+    for index, item in _load(user_schema, list(enumerate(items)), results, partial, carry=keep):
+        if 'password' in item or pre_hashed(item):
+            candidates.append((index, item))
+        else:
+            results[index] = _error(index, 'password: Missing data for required field.')
+    candidates = _check_kept(User, candidates, keep, chunk_size, results)
+    candidates = _unique_in_batch(candidates, 'username', 'username', results)
+    candidates = _unique_in_batch(candidates, 'email', 'email', results)
+    
+    taken_usernames = _existing(User.username, [item['username'] for _, item in candidates], chunk_size)
+    taken_emails = _existing(User.email, [item['email'] for _, item in candidates], chunk_size)
+    
+    accepted = []
+    for index, item in candidates:
+        if item['username'] in taken_usernames:
+            results[index] = _error(index, 'Username already exists')
+        elif item['email'] in taken_emails:
+            results[index] = _error(index, 'Email already exists')
+        else:
+            accepted.append((index, item))
+    
+    passwords = [item['password'] for _, item in accepted if not pre_hashed(item)]
+    hashes = iter(hasher.hash_many(passwords) if passwords else [])
+    rows = [
+        {
+            'username': item['username'],
+            'email': item['email'],
+            'password_hash': item['password_hash'] if pre_hashed(item) else next(hashes),
+            'first_name': item.get('first_name'),
+            'last_name': item.get('last_name'),
+            'is_active': True,
+            'is_admin': False,
+            **_kept(item, keep)
+        }
+        for _, item in accepted
+    ]
+    _insert(User, 'username', rows, [index for index, _ in accepted], chunk_size, results)
+    return results
+
+
+def update_users(items, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Apply partial updates to existing users, addressed by ``id``"""
+    from schemas.user import user_schema
+    
+    results = [None] * len(items)
+    candidates = _validate_ids(items, results)
+    candidates = _load(user_schema, candidates, results, partial=True, carry=('id',))
+    candidates = _unique_in_batch(candidates, 'username', 'username', results)
+    candidates = _unique_in_batch(candidates, 'email', 'email', results)
+    
+    found = _existing(User.id, [item['id'] for _, item in candidates], chunk_size)
+    username_owners = _owners(
+        User.username, [item['username'] for _, item in candidates if 'username' in item], chunk_size
+    )
+    email_owners = _owners(User.email, [item['email'] for _, item in candidates if 'email' in item], chunk_size)
+    
+    passwords = [item['password'] for _, item in candidates if 'password' in item]
+    hashes = iter(hasher.hash_many(passwords) if passwords else [])
+    
+    now = datetime.utcnow()
+    rows, positions = [], []
+    for index, item in candidates:
+        password_hash = next(hashes) if 'password' in item else None
+        if item['id'] not in found:
+            results[index] = _error(index, 'User not found')
+        elif username_owners.get(item.get('username'), item['id']) != item['id']:
+            results[index] = _error(index, 'Username already exists')
+        elif email_owners.get(item.get('email'), item['id']) != item['id']:
+            results[index] = _error(index, 'Email already exists')
+        else:
+            row = {key: item[key] for key in USER_UPDATABLE if key in item and key != 'password'}
+            if password_hash is not None:
+                row['password_hash'] = password_hash
+            row.update(id=item['id'], updated_at=now)
+            rows.append(row)
+            positions.append(index)
+    
+    _update(User, rows, positions, chunk_size, results)
+    
+    # Posts embed their author's username; finding them is left to a job, as
+    # for renames through the ORM (User.invalidation_jobs)
+    for row in rows:
+        if 'username' in row:
+            queue_invalidation(db.session, invalidate_author_posts, row['id'])
+    return results
+
+
+def delete_users(ids, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Delete users by id; users who still author posts are rejected"""
+    results = [None] * len(ids)
+    candidates = _validate_ids([{'id': user_id} for user_id in ids], results)
+    candidate_ids = [item['id'] for _, item in candidates]
+    found = _existing(User.id, candidate_ids, chunk_size)
+    authors = _existing(Post.author_id, candidate_ids, chunk_size)
+    
+    delete_ids, positions = [], []
+    for index, item in candidates:
+        if item['id'] not in found:
+            results[index] = _error(index, 'User not found')
+        elif item['id'] in authors:
+            results[index] = _error(index, 'User still has posts')
+        else:
+            delete_ids.append(item['id'])
+            positions.append(index)
+    
+    _delete(User, delete_ids, positions, chunk_size, results)
+    return results
@@ -0,0 +1,150 @@
+"""
+Per-author post counters
+
+``users.post_count``, ``users.published_post_count`` and ``users.last_post_at``
+are maintained in the same transaction as the post writes that change them,
+so author statistics are a primary-key lookup instead of an aggregate over
+the posts table. Counts are adjusted with relative ``col = col + delta``
+updates, which stay correct under concurrent writers; ``last_post_at`` is
+re-read from the ``(author_id, created_at)`` index.
+
+Publishing goes through ``publish``: a conditional UPDATE that only matches
+posts whose flag actually changes, so two requests toggling the same post
+cannot both count the change they read.
+"""
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import bindparam, func, select
+from sqlalchemy.orm.attributes import set_committed_value
+from app import db
+from models.post import Post
+from models.user import User
+from utils.cache import cache_key, mark_stale
+
+users = User.__table__
+posts = Post.__table__
+
+
+def _post_count(*criteria):
+    return select(func.count()).select_from(posts).where(
+        posts.c.author_id == users.c.id, *criteria
+    ).scalar_subquery()
+
+
+def _last_post_at():
+    return select(func.max(posts.c.created_at)).where(
+        posts.c.author_id == users.c.id
+    ).scalar_subquery()
+
+
+def _publish_statement(post_ids, is_published, updated_at):
+    return posts.update().where(
+        posts.c.id.in_(post_ids), posts.c.is_published.is_distinct_from(is_published)
+    ).values(is_published=is_published, updated_at=updated_at).returning(posts.c.author_id)
+
+
+def _published_in_place(session, post, is_published, updated_at, changed):
+    """Bring a loaded ``post`` in line with the row ``publish`` wrote"""
+    set_committed_value(post, 'is_published', is_published)
+    if changed:
+        set_committed_value(post, 'updated_at', updated_at)
+        mark_stale(session, cache_key(post))
+
+
+class PostCountChanges:
+    """Counter deltas per author, applied in one executemany UPDATE"""
+    
+    def __init__(self):
+        self._deltas = defaultdict(lambda: [0, 0])
+    
+    def added(self, author_id, is_published):
+        delta = self._deltas[author_id]
+        delta[0] += 1
+        delta[1] += 1 if is_published else 0
+    
+    def removed(self, author_id, is_published):
+        delta = self._deltas[author_id]
+        delta[0] -= 1
+        delta[1] -= 1 if is_published else 0
+    
+    def published(self, author_id, was_published, is_published):
+        if bool(was_published) != bool(is_published):
+            self._deltas[author_id][1] += 1 if is_published else -1
+    
+    def _count_published(self, author_ids, is_published):
+        for author_id in author_ids:
+            self.published(author_id, not is_published, is_published)
+        return len(author_ids)
+    
+    def publish(self, post_ids, is_published, updated_at=None):
+        """Set ``is_published`` on ``post_ids`` and count the posts that changed
+        
+        Returns how many did; the rest already had the flag, possibly set by
+        a concurrent request that counted them itself.
+        """
+        author_ids = db.session.execute(
+            _publish_statement(post_ids, is_published, updated_at or datetime.utcnow())
+        ).scalars().all()
+        return self._count_published(author_ids, is_published)
+    
+    async def publish_async(self, session, post_ids, is_published, updated_at=None):
+        """``publish`` for an AsyncSession"""
+        result = await session.execute(
+            _publish_statement(post_ids, is_published, updated_at or datetime.utcnow())
+        )
+        return self._count_published(result.scalars().all(), is_published)
+    
+    def publish_post(self, post, is_published):
+        """``publish`` for a loaded post, keeping the instance up to date"""
+        now = datetime.utcnow()
+        changed = self.publish([post.id], is_published, now)
+        _published_in_place(db.session, post, is_published, now, changed)
+    
+    async def publish_post_async(self, session, post, is_published):
+        """``publish_post`` for an AsyncSession"""
+        now = datetime.utcnow()
+        changed = await self.publish_async(session, [post.id], is_published, now)
+        _published_in_place(session, post, is_published, now, changed)
+    
+    def _statement(self):
+        statement = users.update().where(users.c.id == bindparam('author_key')).values(
+            post_count=users.c.post_count + bindparam('posts_delta'),
+            published_post_count=users.c.published_post_count + bindparam('published_delta'),
+            last_post_at=_last_post_at(),
+            # Counters are not part of the user resource; keep its validators
+            updated_at=users.c.updated_at
+        )
+        # Fixed lock order across concurrent transactions
+        parameters = [
+            {'author_key': author_id, 'posts_delta': total, 'published_delta': published}
+            for author_id, (total, published) in sorted(self._deltas.items())
+        ]
+        self._deltas.clear()
+        return statement, parameters
+    
+    def apply(self):
+        """Flush pending post writes and update the affected authors"""
+        if not self._deltas:
+            return
+        db.session.flush()
+        db.session.execute(*self._statement())
+    
+    async def apply_async(self, session):
+        """``apply`` for an AsyncSession"""
+        if not self._deltas:
+            return
+        await session.flush()
+        await session.execute(*self._statement())
+
+
+def recompute(low, high):
+    """Recount the counters of users with ``low < id <= high`` from the posts table"""
+    return db.session.execute(
+        users.update().where(users.c.id > low, users.c.id <= high).values(
+            post_count=_post_count(),
+            published_post_count=_post_count(posts.c.is_published.is_(True)),
+            last_post_at=_last_post_at(),
+            updated_at=users.c.updated_at
+        )
+    ).rowcount
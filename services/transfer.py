@@ -0,0 +1,241 @@
+"""
+Streaming export and import of users and posts
+
+Exports read plain column tuples in primary-key order through ``yield_per``
+batches (a server-side cursor where the driver has one), so memory stays
+flat however large the table is, and write them as NDJSON or CSV. Imports
+parse the file record by record and insert one chunk per transaction
+through services.bulk, which checks uniqueness per chunk and hashes
+passwords in the shared hashing pool.
+
+Both directions write a checkpoint next to the file after every batch, so
+an interrupted run continues where it stopped with ``resume=True``:
+
+    <path>.export.checkpoint  {"last_id": 41000, "bytes": 9324871}  last id written, file size
+    <path>.import.checkpoint  {"records": 40000}                     records already committed
+"""
+import csv
+import itertools
+import json
+import os
+from datetime import datetime
+
+from sqlalchemy import func, select, text
+from sqlalchemy.exc import SQLAlchemyError
+from app import db
+from models.user import User
+from services import bulk
+from utils.query_args import parse_bool
+
+FORMATS = ('ndjson', 'csv')
+
+USER_FIELDS = ('id', 'username', 'email', 'first_name', 'last_name', 'is_active', 'is_admin',
+               'created_at', 'updated_at')
+POST_FIELDS = ('id', 'title', 'content', 'slug', 'author_id', 'is_published', 'created_at', 'updated_at')
+
+# Columns restored verbatim on import; posts refer to their authors by id
+USER_KEEP = ('id', 'is_active', 'is_admin', 'created_at', 'updated_at', 'password_hash')
+POST_KEEP = ('id', 'created_at', 'updated_at')
+
+# Post bodies can exceed the csv module's default 128 KiB field limit
+csv.field_size_limit(2 ** 31 - 1)
+
+
+class TransferError(RuntimeError):
+    """Raised for unusable files or checkpoints"""
+
+
+def detect_format(path, fmt=None):
+    """``fmt`` if given, else ``csv`` for ``.csv`` files and ``ndjson`` otherwise"""
+    if fmt:
+        if fmt not in FORMATS:
+            raise TransferError(f'Unknown format: {fmt}')
+        return fmt
+    return 'csv' if path.lower().endswith('.csv') else 'ndjson'
+
+
+def checkpoint_path(path, kind):
+    return f'{path}.{kind}.checkpoint'
+
+
+def read_checkpoint(path, kind):
+    try:
+        with open(checkpoint_path(path, kind)) as handle:
+            return json.load(handle)
+    except FileNotFoundError:
+        raise TransferError(f'No {kind} checkpoint for {path}; nothing to resume')
+
+
+def write_checkpoint(path, kind, **state):
+    # Replace atomically so a crash never leaves a torn checkpoint
+    target = checkpoint_path(path, kind)
+    with open(target + '.tmp', 'w') as handle:
+        json.dump(state, handle)
+    os.replace(target + '.tmp', target)
+
+
+def _encode(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def export_rows(model, fields, after_id=0, batch_size=1000):
+    """Yield the ``fields`` of every row with ``id > after_id`` as dicts, in id order"""
+    statement = select(*(getattr(model, field) for field in fields)).where(
+        model.id > after_id
+    ).order_by(model.id).execution_options(yield_per=batch_size)
+    for row in db.session.execute(statement):
+        yield dict(zip(fields, row))
+
+
+def export_table(model, fields, path, fmt=None, batch_size=1000, resume=False, progress=None):
+    """Write ``model``'s rows to ``path``; returns ``(rows written, last id)``
+    
+    ``progress(rows, last_id)`` is called after each batch is flushed.
+    """
+    fmt = detect_format(path, fmt)
+    after_id = 0
+    mode = 'w'
+    if resume:
+        state = read_checkpoint(path, 'export')
+        # Drop whatever was written after the last complete batch
+        with open(path, 'r+b') as handle:
+            handle.truncate(state['bytes'])
+        after_id, mode = state['last_id'], 'a'
+    
+    written = 0
+    last_id = after_id
+    with open(path, mode, newline='', encoding='utf-8') as handle:
+        if fmt == 'csv':
+            writer = csv.writer(handle)
+            if mode == 'w':
+                writer.writerow(fields)
+        
+        def write(record):
+            if fmt == 'csv':
+                writer.writerow([_encode(record[field]) for field in fields])
+            else:
+                encoded = {key: _encode(value) for key, value in record.items()}
+                handle.write(json.dumps(encoded, ensure_ascii=False) + '\n')
+        
+        def checkpoint():
+            handle.flush()
+            write_checkpoint(path, 'export', last_id=last_id, bytes=handle.tell())
+        
+        checkpoint()
+        for record in export_rows(model, fields, after_id, batch_size):
+            write(record)
+            written += 1
+            last_id = record['id']
+            if written % batch_size == 0:
+                checkpoint()
+                if progress:
+                    progress(written, last_id)
+        checkpoint()
+    return written, last_id
+
+
+def read_records(handle, fmt):
+    """Yield one dict per record of an open NDJSON or CSV file"""
+    if fmt == 'csv':
+        yield from csv.DictReader(handle)
+        return
+    for number, line in enumerate(handle, 1):
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                raise TransferError(f'Line {number}: {e}')
+
+
+def decode(model, record):
+    """Convert the string values of a CSV or NDJSON record to the column types
+    
+    Empty CSV cells become None in nullable columns; fields that are not
+    columns (such as ``password``) pass through unchanged.
+    """
+    columns = model.__table__.c
+    decoded = {}
+    for key, value in record.items():
+        column = columns.get(key)
+        if column is not None and isinstance(value, str):
+            python_type = column.type.python_type
+            if value == '' and column.nullable:
+                value = None
+            elif python_type is bool:
+                value = parse_bool(value)
+            elif python_type is int:
+                value = int(value)
+            elif python_type is datetime:
+                value = datetime.fromisoformat(value.rstrip('Z'))
+        decoded[key] = value
+    return decoded
+
+
+def sync_id_sequence(model):
+    """Move a PostgreSQL id sequence past ids inserted explicitly"""
+    if db.engine.dialect.name != 'postgresql':
+        return
+    table = model.__tablename__
+    db.session.execute(text(
+        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), GREATEST(MAX(id), 1)) FROM {table}"
+    ))
+
+
+def import_table(model, path, fmt=None, chunk_size=1000, resume=False, restore_ids=True, progress=None):
+    """Insert the records of ``path`` into ``model``'s table
+    
+    With ``restore_ids`` the exported ids are kept, so posts still point at
+    their authors after restoring users and then posts into an empty
+    database; without it every record gets a new id. Records whose id is
+    already taken are rejected like any other invalid record. Returns
+    ``(created, failed, errors)``, where ``errors`` holds the first few
+    per-record errors. ``progress(records, created, failed)`` is called
+    after each committed chunk.
+    """
+    create, keep = (bulk.create_users, USER_KEEP) if model is User else (bulk.create_posts, POST_KEEP)
+    if not restore_ids:
+        keep = tuple(field for field in keep if field != 'id')
+    fmt = detect_format(path, fmt)
+    skip = 0
+    if resume:
+        skip = read_checkpoint(path, 'import')['records']
+    
+    done, created, failed, errors = skip, 0, 0, []
+    with open(path, newline='', encoding='utf-8') as handle:
+        records = itertools.islice(read_records(handle, fmt), skip, None)
+        while True:
+            chunk = []
+            for record in itertools.islice(records, chunk_size):
+                try:
+                    chunk.append(decode(model, record))
+                except (TypeError, ValueError) as e:
+                    raise TransferError(f'Record {done + len(chunk) + 1}: invalid value ({e})')
+            if not chunk:
+                break
+            try:
+                results = create(chunk, chunk_size, keep=keep)
+                if 'id' in keep:
+                    sync_id_sequence(model)
+                db.session.commit()
+            except SQLAlchemyError as e:
+                # Earlier chunks stay committed; --resume continues from here
+                db.session.rollback()
+                raise TransferError(f'Records {done + 1}-{done + len(chunk)}: {getattr(e, "orig", None) or e}')
+            
+            for result in results:
+                if result['status'] == 'error':
+                    failed += 1
+                    if len(errors) < 10:
+                        errors.append(f'record {done + result["index"] + 1}: {result["error"]}')
+                else:
+                    created += 1
+            done += len(chunk)
+            write_checkpoint(path, 'import', records=done)
+            if progress:
+                progress(done, created, failed)
+    return created, failed, errors
+
+
+def table_size(model):
+    """Row count, for progress totals"""
+    return db.session.scalar(select(func.count()).select_from(model))
@@ -0,0 +1,37 @@
+"""
+Cache warming and invalidation tasks
+
+Queued after writes so the first read of a new or changed record is served
+from the cache, and so invalidations that need a query of their own stay off
+the write path.
+"""
+from app import cache, db, jobs
+from models.post import Post
+from models.user import User
+from utils.cache import cache_key
+
+
+@jobs.task()
+def warm_post_cache(post_id):
+    """Store the serialized post under its cache key"""
+    lease = cache.lease()
+    post = db.session.get(Post, post_id, options=[Post.author_loader()])
+    if post is not None:
+        cache.set(cache_key(post), post.to_dict(), lease=lease)
+
+
+@jobs.task()
+def warm_user_cache(user_id):
+    """Store the serialized user under its cache key"""
+    lease = cache.lease()
+    user = db.session.get(User, user_id)
+    if user is not None:
+        cache.set(cache_key(user), user.to_dict(), lease=lease)
+
+
+@jobs.task()
+def invalidate_author_posts(user_id, batch_size=1000):
+    """Drop the cached posts that embed the author's username"""
+    post_ids = db.session.execute(db.select(Post.id).filter_by(author_id=user_id)).scalars()
+    for batch in post_ids.partitions(batch_size):
+        cache.delete_many(*(f'posts:{post_id}' for post_id in batch))
@@ -0,0 +1,185 @@
+"""
+Shared fixtures and SQL budget checks
+
+``@pytest.mark.max_queries(n)`` fails a test when any request it sends
+through the Flask app executes more than ``n`` SQL statements. With
+``table_scans=False`` it also fails when SQLite plans a full scan of a table
+for one of them. ``assert_max_sql_time`` bounds the time spent in SQL by a
+block of code.
+"""
+import random
+import re
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from flask import request, request_finished, request_started
+
+from app import create_app, db
+from utils.query_counter import QueryCounter
+
+# "SCAN posts" without an index; virtual (FTS) tables are lookups, not scans
+TABLE_SCAN = re.compile(r'^SCAN (\w+)$')
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        'markers', 'max_queries(limit, table_scans=True): fail when a request executes more than '
+        '``limit`` SQL statements (or, with table_scans=False, plans a full table scan)'
+    )
+
+
+@pytest.fixture
+def app():
+    """Create application for testing"""
+    app = create_app('testing')
+    
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    """Create test client"""
+    return app.test_client()
+
+
+@pytest.fixture
+def runner(app):
+    """Create test runner"""
+    return app.test_cli_runner()
+
+
+@pytest.fixture
+def seeded(app):
+    """A dataset large enough for query plans and N+1 patterns to show
+    
+    Returns the number of rows inserted per table.
+    """
+    from models.post import Post
+    from models.user import User
+    from services.post_counts import recompute
+    
+    users, posts = 50, 500
+    start = datetime(2024, 1, 1)
+    rng = random.Random(0)
+    db.session.execute(db.insert(User), [
+        {
+            'username': f'user{i}',
+            'email': f'user{i}@example.com',
+            'password_hash': 'x',
+            'is_active': i % 10 != 0,
+            'is_admin': i == 1,
+            'created_at': start + timedelta(hours=i),
+            'updated_at': start + timedelta(hours=i)
+        }
+        for i in range(users)
+    ])
+    db.session.execute(db.insert(Post), [
+        {
+            'title': f'Post {i}',
+            'content': 'Content ' * 20,
+            'slug': f'seeded-{i}',
+            'author_id': rng.randint(1, users),
+            'is_published': i % 3 != 0,
+            'created_at': start + timedelta(minutes=i),
+            'updated_at': start + timedelta(minutes=i)
+        }
+        for i in range(posts)
+    ])
+    recompute(0, users)
+    db.session.commit()
+    db.session.remove()
+    return {'users': users, 'posts': posts}
+
+
+def _table_scans(statements, parameters):
+    """Tables SQLite would scan in full for the SELECT statements given"""
+    scans = set()
+    with db.engine.connect() as connection:
+        for statement, params in zip(statements, parameters):
+            if not statement.lstrip().upper().startswith('SELECT'):
+                continue
+            for row in connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, params):
+                match = TABLE_SCAN.match(row[-1])
+                if match:
+                    scans.add(match.group(1))
+    return scans
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_call(item):
+    """Fail the test itself (not its teardown) when a request broke the SQL budget"""
+    outcome = yield
+    violations = getattr(item, 'sql_budget_violations', None)
+    if violations and outcome.excinfo is None:
+        outcome.force_exception(pytest.fail.Exception(
+            'SQL budget exceeded\n' + '\n'.join(violations), pytrace=False
+        ))
+
+
+@pytest.fixture(autouse=True)
+def query_budget(request):
+    """Check every request of a test carrying the ``max_queries`` marker"""
+    marker = request.node.get_closest_marker('max_queries')
+    if marker is None:
+        yield
+        return
+    
+    limit = marker.args[0]
+    allow_scans = marker.kwargs.get('table_scans', True)
+    app = request.getfixturevalue('app')
+    counter = QueryCounter(db.engine)
+    violations = request.node.sql_budget_violations = []
+    
+    def started(sender, **extra):
+        counter.__enter__()
+    
+    def finished(sender, response, **extra):
+        counter.__exit__(None, None, None)
+        label = f'{_request_label()} -> {response.status_code}'
+        if counter.count > limit:
+            statements = '\n    '.join(counter.statements)
+            violations.append(f'{label}: {counter.count} statements (budget {limit}):\n    {statements}')
+        if not allow_scans and db.engine.dialect.name == 'sqlite':
+            scans = _table_scans(counter.statements, counter.parameters)
+            if scans:
+                violations.append(f'{label}: full scan of {", ".join(sorted(scans))}')
+    
+    request_started.connect(started, app)
+    request_finished.connect(finished, app)
+    try:
+        yield
+    finally:
+        request_started.disconnect(started, app)
+        request_finished.disconnect(finished, app)
+
+
+def _request_label():
+    return f'{request.method} {request.full_path.rstrip("?")}'
+
+
+@pytest.fixture
+def assert_max_sql_time(app):
+    """Context manager failing when the SQL run inside it takes longer than ``ms``
+    
+    ::
+    
+        with assert_max_sql_time(50):
+            client.get('/api/posts')
+    """
+    @contextmanager
+    def check(ms):
+        with QueryCounter(db.engine) as counter:
+            yield counter
+        if counter.total_time > ms:
+            slowest = sorted(zip(counter.durations, counter.statements), reverse=True)[:3]
+            detail = '\n    '.join(f'{duration:.2f} ms  {statement}' for duration, statement in slowest)
+            pytest.fail(
+                f'SQL took {counter.total_time:.2f} ms in {counter.count} statements '
+                f'(budget {ms} ms); slowest:\n    {detail}', pytrace=False
+            )
+    return check
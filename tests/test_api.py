@@ -1,30 +1,21 @@
+import json
+import os
+import pstats
+import time
+from datetime import datetime
 import pytest
-from app import create_app, db
+from sqlalchemy import create_engine
+from app import create_app, db, jobs
 from models.user import User
 from models.post import Post
-
-@pytest.fixture
-def app():
-    """Create application for testing"""
-    app = create_app()
-    app.config['TESTING'] = True
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
-    
-    with app.app_context():
-        db.create_all()
-        yield app
-        db.session.remove()
-        db.drop_all()
-
-@pytest.fixture
-def client(app):
-    """Create test client"""
-    return app.test_client()
-
-@pytest.fixture
-def runner(app):
-    """Create test runner"""
-    return app.test_cli_runner()
+from services.post_counts import PostCountChanges
+from utils.cache import FakeCache
+from utils.jobs import ThreadBackend
+from utils.hashing import HashingBusy, HashingPool
+from utils.routing import replica_reads
+from utils.pool import TimedQueuePool, build_engine_options, pool_status
+from utils.json_provider import FastJSONProvider, orjson, msgspec
+from utils.query_counter import QueryCounter
 
 def test_index_route(client):
     """Test main index route"""
@@ -48,6 +39,7 @@ def test_api_docs(client):
     data = response.get_json()
     assert 'endpoints' in data
 
+@pytest.mark.max_queries(5)
 def test_create_user(client):
     """Test user creation"""
     user_data = {
@@ -65,14 +57,22 @@ def test_create_user(client):
     assert data['user']['username'] == 'testuser'
     assert data['user']['email'] == 'test@example.com'
 
-def test_get_users(client):
+@pytest.mark.max_queries(2, table_scans=False)
+def test_get_users(client, seeded, assert_max_sql_time):
     """Test getting all users"""
-    response = client.get('/api/users')
+    with assert_max_sql_time(50):
+        response = client.get('/api/users')
     assert response.status_code == 200
     data = response.get_json()
     assert 'users' in data
-    assert 'count' in data
+    assert 'next_cursor' in data
+    
+    data = client.get(f"/api/users?cursor={data['next_cursor']}").get_json()
+    assert len(data['users']) == 20
+    assert client.get('/api/users/3').status_code == 200
+    assert client.get('/api/users/3/stats').status_code == 200
 
+@pytest.mark.max_queries(6)
 def test_create_post(client):
     """Test post creation"""
     # First create a user
@@ -98,10 +98,1044 @@ def test_create_post(client):
     assert 'post' in data
     assert data['post']['title'] == 'Test Post'
 
-def test_get_posts(client):
+@pytest.mark.max_queries(2, table_scans=False)
+def test_get_posts(client, seeded, assert_max_sql_time):
     """Test getting all posts"""
-    response = client.get('/api/posts')
+    with assert_max_sql_time(50):
+        response = client.get('/api/posts')
     assert response.status_code == 200
     data = response.get_json()
     assert 'posts' in data
-    assert 'count' in data 
\ No newline at end of file
+    assert 'next_cursor' in data
+    
+    # Embedding authors must not cost one query per post
+    data = client.get(f"/api/posts?limit=100&cursor={data['next_cursor']}").get_json()
+    assert len(data['posts']) == 100 and all(post['author'] for post in data['posts'])
+    assert client.get('/api/posts?is_published=true&author_id=7&sort=-updated_at').status_code == 200
+    assert client.get('/api/posts/3').status_code == 200
+    assert client.get('/api/posts/search?q=post&limit=5').status_code == 200
+
+def test_get_posts_keyset_pagination(client):
+    """Test walking the posts collection page by page with cursors"""
+    client.post('/api/users', json={
+        'username': 'testuser',
+        'email': 'test@example.com',
+        'password': 'password123'
+    })
+    for i in range(5):
+        client.post('/api/posts', json={
+            'title': f'Post {i}',
+            'content': 'Content',
+            'slug': f'post-{i}',
+            'author_id': 1
+        })
+    
+    seen = []
+    cursor = None
+    while True:
+        url = '/api/posts?limit=2' + (f'&cursor={cursor}' if cursor else '')
+        data = client.get(url).get_json()
+        assert len(data['posts']) <= 2
+        seen.extend(post['id'] for post in data['posts'])
+        cursor = data['next_cursor']
+        if cursor is None:
+            break
+    
+    assert sorted(seen) == [1, 2, 3, 4, 5]
+    assert len(seen) == len(set(seen))
+    
+    data = client.get('/api/posts?limit=2&include_total=1').get_json()
+    assert data['total'] == 5
+    
+    # A cursor only continues the ordering it was issued for
+    cursor = data['next_cursor']
+    assert client.get(f'/api/posts?limit=2&cursor={cursor}&sort=-created_at').status_code == 200
+    response = client.get(f'/api/posts?limit=2&cursor={cursor}&sort=updated_at')
+    assert response.status_code == 400
+    assert 'sort order' in response.get_json()['error']
+
+def test_get_posts_invalid_pagination(client):
+    """Test that malformed cursors and limits are rejected"""
+    assert client.get('/api/posts?cursor=not-a-cursor').status_code == 400
+    assert client.get('/api/posts?limit=abc').status_code == 400
+    assert client.get('/api/posts?limit=0').status_code == 400
+
+def test_get_posts_constant_query_count(app, client):
+    """Test that listing posts does not issue one query per author"""
+    def seed(start, count):
+        for i in range(start, start + count):
+            client.post('/api/users', json={
+                'username': f'user{i}',
+                'email': f'user{i}@example.com',
+                'password': 'password123'
+            })
+            client.post('/api/posts', json={
+                'title': f'Post {i}',
+                'content': 'Content',
+                'slug': f'post-{i}',
+                'author_id': i + 1
+            })
+    
+    def count_list_queries():
+        db.session.remove()
+        with QueryCounter(db.engine) as counter:
+            response = client.get('/api/posts')
+        assert response.status_code == 200
+        return counter.count, len(response.get_json()['posts'])
+    
+    seed(0, 2)
+    small_count, small_rows = count_list_queries()
+    seed(2, 8)
+    large_count, large_rows = count_list_queries()
+    
+    assert (small_rows, large_rows) == (2, 10)
+    assert small_count == large_count
+
+def test_get_posts_streaming(app, client):
+    """Test streaming the posts collection as a JSON array and as NDJSON"""
+    app.config['API_STREAM_BATCH_SIZE'] = 2
+    client.post('/api/users', json={
+        'username': 'testuser',
+        'email': 'test@example.com',
+        'password': 'password123'
+    })
+    for i in range(5):
+        client.post('/api/posts', json={
+            'title': f'Post {i}',
+            'content': 'Content',
+            'slug': f'post-{i}',
+            'author_id': 1
+        })
+    
+    response = client.get('/api/posts?stream=1')
+    assert response.status_code == 200
+    assert response.is_streamed
+    posts = json.loads(response.get_data(as_text=True))
+    assert [post['id'] for post in posts] == [5, 4, 3, 2, 1]
+    assert posts[0]['author'] == 'testuser'
+    
+    # Renaming the author changes the streamed bodies, so it changes their tag
+    etag = response.headers['ETag']
+    assert client.get('/api/posts?stream=1', headers={'If-None-Match': etag}).status_code == 304
+    client.put('/api/users/1', json={'username': 'renamed'})
+    response = client.get('/api/posts?stream=1', headers={'If-None-Match': etag})
+    assert response.status_code == 200 and json.loads(response.get_data(as_text=True))[0]['author'] == 'renamed'
+    
+    response = client.get('/api/posts', headers={'Accept': 'application/x-ndjson'})
+    assert response.mimetype == 'application/x-ndjson'
+    lines = response.get_data(as_text=True).splitlines()
+    assert [json.loads(line)['slug'] for line in lines] == [f'post-{i}' for i in range(4, -1, -1)]
+    
+    response = client.get('/api/users?stream=1')
+    assert [user['username'] for user in json.loads(response.get_data(as_text=True))] == ['renamed']
+
+@pytest.mark.parametrize('backend', [
+    'stdlib',
+    pytest.param('orjson', marks=pytest.mark.skipif(orjson is None, reason='orjson not installed')),
+    pytest.param('msgspec', marks=pytest.mark.skipif(msgspec is None, reason='msgspec not installed'))
+])
+def test_json_provider_backends(app, backend):
+    """Test that every JSON backend produces the same output"""
+    provider = FastJSONProvider(app, backend)
+    payload = {'b': [1, None, True], 'a': datetime(2024, 1, 2, 3, 4, 5, 6), 'c': 'é'}
+    
+    assert json.loads(provider.dumps(payload)) == {
+        'a': '2024-01-02T03:04:05.000006', 'b': [1, None, True], 'c': 'é'
+    }
+    assert provider.dumps(payload).index('"a"') < provider.dumps(payload).index('"b"')
+    assert provider.loads(provider.dumps(payload))['b'] == [1, None, True]
+
+def test_datetimes_serialized_as_iso_8601(client):
+    """Test that model timestamps are rendered as ISO 8601 strings"""
+    response = client.post('/api/users', json={
+        'username': 'testuser',
+        'email': 'test@example.com',
+        'password': 'password123'
+    })
+    created_at = response.get_json()['user']['created_at']
+    assert datetime.fromisoformat(created_at)
+
+def test_detail_cache_invalidated_on_write(app, client):
+    """Test read-through caching of post/user details and invalidation on commit"""
+    app.extensions['cache'] = fake = FakeCache()
+    client.post('/api/users', json={
+        'username': 'testuser',
+        'email': 'test@example.com',
+        'password': 'password123'
+    })
+    client.post('/api/posts', json={
+        'title': 'Original',
+        'content': 'Content',
+        'slug': 'original',
+        'author_id': 1
+    })
+    # Drop the entries warmed by the background jobs to exercise read-through
+    fake.clear()
+    
+    client.get('/api/posts/1')
+    assert client.get('/api/posts/1').get_json()['post']['title'] == 'Original'
+    assert fake.misses == ['posts:1']
+    assert fake.hits == ['posts:1']
+    
+    client.put('/api/posts/1', json={'title': 'Edited'})
+    assert 'posts:1' in fake.deleted
+    assert client.get('/api/posts/1').get_json()['post']['title'] == 'Edited'
+    
+    # Renaming the author invalidates the posts that embed the username
+    client.get('/api/users/1')
+    client.put('/api/users/1', json={'username': 'renamed'})
+    assert {'users:1', 'posts:1'} <= set(fake.deleted)
+    assert client.get('/api/posts/1').get_json()['post']['author'] == 'renamed'
+    assert client.get('/api/users/1').get_json()['user']['username'] == 'renamed'
+    
+    # A fill leased before a write commits is discarded, not stored over it
+    lease = fake.lease()
+    client.put('/api/posts/1', json={'title': 'Again'})
+    assert fake.set('posts:1', {'title': 'Edited'}, lease=lease) is False
+    assert client.get('/api/posts/1').get_json()['post']['title'] == 'Again'
+    assert fake.get('posts:1')['title'] == 'Again'
+    
+    client.delete('/api/posts/1')
+    assert fake.get('posts:1') is None
+
+def test_conditional_get_detail(app, client):
+    """Test ETag and Last-Modified revalidation on post and user detail"""
+    client.post('/api/users', json={
+        'username': 'testuser',
+        'email': 'test@example.com',
+        'password': 'password123'
+    })
+    client.post('/api/posts', json={
+        'title': 'Post',
+        'content': 'Content',
+        'slug': 'post',
+        'author_id': 1
+    })
+    
+    response = client.get('/api/posts/1')
+    etag = response.headers['ETag']
+    # The embedded author name can change without touching the post
+    assert 'Last-Modified' not in response.headers
+    
+    response = client.get('/api/posts/1', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    
+    # A cold cache is revalidated from a narrow (id, updated_at, author) probe
+    app.extensions['cache'].clear()
+    db.session.remove()
+    with QueryCounter(db.engine) as counter:
+        response = client.get('/api/posts/1', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert counter.count == 1
+    assert 'content' not in counter.statements[0]
+    
+    last_modified = client.get('/api/users/1').headers['Last-Modified']
+    response = client.get('/api/users/1', headers={'If-Modified-Since': last_modified})
+    assert response.status_code == 304
+    
+    client.put('/api/users/1', json={'username': 'renamed'})
+    response = client.get('/api/posts/1', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    
+    client.put('/api/posts/1', json={'title': 'Edited'})
+    response = client.get('/api/posts/1', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+def test_conditional_get_collection(client):
+    """Test that collection ETags change when rows are added or deleted"""
+    client.post('/api/users', json={
+        'username': 'testuser',
+        'email': 'test@example.com',
+        'password': 'password123'
+    })
+    # Page ETags hash the body; no aggregate over the whole table is run
+    db.session.remove()
+    with QueryCounter(db.engine) as counter:
+        response = client.get('/api/users')
+    assert counter.count == 1
+    assert 'Last-Modified' not in response.headers
+    etag = response.headers['ETag']
+    assert client.get('/api/users', headers={'If-None-Match': etag}).status_code == 304
+    
+    client.post('/api/users', json={
+        'username': 'another',
+        'email': 'another@example.com',
+        'password': 'password123'
+    })
+    response = client.get('/api/users', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert len(response.get_json()['users']) == 2
+    
+    etag = response.headers['ETag']
+    client.delete('/api/users/2')
+    assert client.get('/api/users', headers={'If-None-Match': etag}).status_code == 200
+
+def test_bulk_users_and_posts(app, client):
+    """Test bulk create, update and delete with per-item results"""
+    response = client.post('/api/users/bulk', json={'users': [
+        {'username': 'alice', 'email': 'alice@example.com', 'password': 'pw'},
+        {'username': 'bob', 'email': 'bob@example.com', 'password': 'pw'},
+        {'username': 'alice', 'email': 'other@example.com', 'password': 'pw'},
+        {'username': 'carol'}
+    ]})
+    assert response.status_code == 207
+    data = response.get_json()
+    assert [r['status'] for r in data['results']] == ['created', 'created', 'error', 'error']
+    assert (data['succeeded'], data['failed']) == (2, 2)
+    
+    posts = [
+        {'title': f'Post {i}', 'content': 'Content', 'slug': f'post-{i}', 'author_id': 1 + i % 2}
+        for i in range(50)
+    ]
+    db.session.remove()
+    with QueryCounter(db.engine) as counter:
+        response = client.post('/api/posts/bulk', json={'posts': posts})
+    assert response.status_code == 201
+    assert [r['id'] for r in response.get_json()['results']] == list(range(1, 51))
+    assert len([s for s in counter.statements if s.startswith('INSERT')]) == 1
+    
+    response = client.post('/api/posts/bulk', json={'posts': [
+        {'title': 'Dup', 'content': 'Content', 'slug': 'post-0', 'author_id': 1},
+        {'title': 'Orphan', 'content': 'Content', 'slug': 'orphan', 'author_id': 99}
+    ]})
+    assert response.status_code == 400
+    assert [r['error'] for r in response.get_json()['results']] == [
+        'Post with this slug already exists', 'Author not found'
+    ]
+    
+    # Malformed items fail on their own instead of failing the batch
+    response = client.post('/api/posts/bulk', json={'posts': [
+        {'title': 'List slug', 'content': 'Content', 'slug': ['x'], 'author_id': 1},
+        {'title': 'Bad flag', 'content': 'Content', 'slug': 'bad-flag', 'author_id': 1, 'is_published': 'maybe'},
+        {'title': 'Fine', 'content': 'Content', 'slug': 'fine', 'author_id': [1]},
+        'not an object'
+    ]})
+    assert response.status_code == 400
+    errors = [r['error'] for r in response.get_json()['results']]
+    assert errors[0].startswith('slug:') and errors[1].startswith('is_published:')
+    assert errors[2].startswith('author_id:') and errors[3] == 'Invalid input type.'
+    response = client.patch('/api/users/bulk', json={'users': [{'id': 1, 'email': {'x': 1}}]})
+    assert response.get_json()['results'][0]['error'].startswith('email:')
+    
+    client.get('/api/posts/1')
+    response = client.patch('/api/posts/bulk', json={'posts': [
+        {'id': 1, 'title': 'Edited', 'is_published': True},
+        {'id': 2, 'slug': 'post-3'},
+        {'id': 999, 'title': 'Missing'}
+    ]})
+    assert response.status_code == 207
+    assert [r['status'] for r in response.get_json()['results']] == ['updated', 'error', 'error']
+    post = client.get('/api/posts/1').get_json()['post']
+    assert (post['title'], post['is_published']) == ('Edited', True)
+    
+    response = client.patch('/api/users/bulk', json={'users': [{'id': 1, 'username': 'alice2'}]})
+    assert response.status_code == 200
+    assert client.get('/api/posts/1').get_json()['post']['author'] == 'alice2'
+    assert client.get('/api/posts/2').get_json()['post']['author'] == 'bob'
+    
+    response = client.delete('/api/users/bulk', json={'ids': [1]})
+    assert response.get_json()['results'][0]['error'] == 'User still has posts'
+    
+    response = client.delete('/api/posts/bulk', json={'ids': [1, 2, 1000]})
+    assert [r['status'] for r in response.get_json()['results']] == ['deleted', 'deleted', 'error']
+    assert client.get('/api/posts/1').status_code != 200
+    
+    assert client.post('/api/posts/bulk', json={'posts': []}).status_code == 400
+    app.config['BULK_MAX_ITEMS'] = 1
+    assert client.post('/api/posts/bulk', json={'posts': posts[:2]}).status_code == 413
+
+def test_password_hashing_pool(app, client):
+    """Test pooled hashing, backpressure and rehash-on-login"""
+    pool = HashingPool(method='pbkdf2:sha256:1000', workers=1)
+    pwhash = pool.hash('secret')
+    assert pool.verify(pwhash, 'secret')
+    assert not pool.verify(pwhash, 'wrong')
+    assert len(pool.hash_many(['a', 'b', 'c'])) == 3
+    
+    # A hash the caller gave up on keeps its slot until it actually finishes
+    slow = HashingPool(method='pbkdf2:sha256:2000000', workers=1, max_pending=1, timeout=0.01)
+    with pytest.raises(TimeoutError):
+        slow.hash('secret')
+    with pytest.raises(HashingBusy):
+        slow.hash('secret')
+    deadline = time.monotonic() + 30
+    while not slow._slots.acquire(blocking=False):
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+    slow._slots.release()
+    
+    app.extensions['password_hasher'] = HashingPool(method='pbkdf2:sha256:1000', workers=1, max_pending=0)
+    response = client.post('/api/users', json={
+        'username': 'testuser',
+        'email': 'test@example.com',
+        'password': 'password123'
+    })
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '1'
+    
+    app.extensions['password_hasher'] = HashingPool(method='pbkdf2:sha256:1000', workers=0)
+    user = User(username='testuser', email='test@example.com', password='password123')
+    assert user.password_hash.startswith('pbkdf2:sha256:1000$')
+    
+    app.extensions['password_hasher'] = HashingPool(method='pbkdf2:sha256:2000', workers=0)
+    assert not user.check_password('wrong')
+    assert user.password_hash.startswith('pbkdf2:sha256:1000$')
+    assert user.check_password('password123')
+    assert user.password_hash.startswith('pbkdf2:sha256:2000$')
+    assert user.check_password('password123')
+
+def _query_plans(run):
+    """SQLite query plans of every SELECT issued by ``run``"""
+    db.session.remove()
+    with QueryCounter(db.engine) as counter:
+        run()
+    plans = []
+    connection = db.session.connection()
+    for statement, parameters in zip(counter.statements, counter.parameters):
+        if statement.lstrip().upper().startswith('SELECT'):
+            rows = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+            plans.append(' | '.join(row[-1] for row in rows))
+    return plans
+
+def test_hot_queries_use_indexes(client):
+    """Test that listing and filtering queries are served by indexes"""
+    client.post('/api/users/bulk', json={'users': [
+        {'username': f'user{i}', 'email': f'user{i}@example.com', 'password': 'pw'} for i in range(3)
+    ]})
+    client.post('/api/posts/bulk', json={'posts': [
+        {'title': f'Post {i}', 'content': 'Content', 'slug': f'post-{i}', 'author_id': 1 + i % 3,
+         'is_published': i % 2 == 0}
+        for i in range(30)
+    ]})
+    cursor = client.get('/api/posts?limit=5').get_json()['next_cursor']
+    
+    plans = _query_plans(lambda: client.get(f'/api/posts?limit=5&cursor={cursor}'))
+    # Only the page query runs; the ETag hashes the body
+    assert len(plans) == 1
+    # The cursor seeks into the index rather than scanning past earlier pages
+    assert any('SEARCH posts USING INDEX ix_posts_created_at_id' in plan for plan in plans)
+    
+    cursor = client.get('/api/posts?limit=5&sort=updated_at').get_json()['next_cursor']
+    plans = _query_plans(lambda: client.get(f'/api/posts?limit=5&sort=updated_at&cursor={cursor}'))
+    assert any('SEARCH posts USING INDEX ix_posts_updated_at_id' in plan for plan in plans)
+    
+    plans = _query_plans(lambda: client.get('/api/users?limit=5'))
+    assert any('users USING INDEX ix_users_created_at_id' in plan for plan in plans)
+    
+    ordering = (Post.created_at.desc(), Post.id.desc())
+    plans = _query_plans(lambda: Post.query.filter_by(is_published=True).order_by(*ordering).limit(5).all())
+    assert 'SEARCH posts USING INDEX ix_posts_is_published_created_at_id' in plans[0]
+    
+    plans = _query_plans(lambda: Post.query.filter_by(author_id=2).order_by(*ordering).limit(5).all())
+    assert 'SEARCH posts USING INDEX ix_posts_author_id_created_at_id' in plans[0]
+
+def test_get_posts_filters_sort_and_fields(client):
+    """Test whitelisted filters, sort keys and sparse fieldsets"""
+    client.post('/api/users/bulk', json={'users': [
+        {'username': f'user{i}', 'email': f'user{i}@example.com', 'password': 'pw'} for i in range(2)
+    ]})
+    client.post('/api/posts/bulk', json={'posts': [
+        {'title': f'Post {i}', 'content': 'Content', 'slug': f'post-{i}', 'author_id': 1 + i % 2,
+         'is_published': i < 4}
+        for i in range(6)
+    ]})
+    
+    data = client.get('/api/posts?author_id=1&is_published=true').get_json()
+    assert sorted(post['id'] for post in data['posts']) == [1, 3]
+    
+    data = client.get('/api/posts?sort=created_at&limit=3').get_json()
+    assert [post['id'] for post in data['posts']] == [1, 2, 3]
+    data = client.get(f'/api/posts?sort=created_at&limit=3&cursor={data["next_cursor"]}').get_json()
+    assert [post['id'] for post in data['posts']] == [4, 5, 6]
+    
+    data = client.get('/api/posts?created_after=2000-01-01T00:00:00&created_before=2000-01-02').get_json()
+    assert data['posts'] == []
+    
+    db.session.remove()
+    with QueryCounter(db.engine) as counter:
+        data = client.get('/api/posts?fields=id,title&is_published=false').get_json()
+    assert data['posts'] == [{'id': 6, 'title': 'Post 5'}, {'id': 5, 'title': 'Post 4'}]
+    page_query = counter.statements[-1]
+    assert 'content' not in page_query and 'JOIN' not in page_query
+    
+    data = client.get('/api/posts?fields=title,author&limit=1').get_json()
+    assert data['posts'] == [{'title': 'Post 5', 'author': 'user1'}]
+    
+    data = client.get('/api/users?fields=username&is_admin=false&include_total=1').get_json()
+    assert data['total'] == 2
+    assert data['users'] == [{'username': 'user1'}, {'username': 'user0'}]
+    
+    assert client.get('/api/posts?fields=password').status_code == 400
+    assert client.get('/api/posts?sort=content').status_code == 400
+    assert client.get('/api/posts?is_published=maybe').status_code == 400
+    assert client.get('/api/posts?author_id=x').status_code == 400
+
+def test_engine_options_per_database():
+    """Test pool settings derived from the database URL"""
+    assert build_engine_options('sqlite:///:memory:') == {}
+    
+    options = build_engine_options('sqlite:///app.db', pool_size=3, max_overflow=1)
+    assert options['poolclass'] is TimedQueuePool
+    assert (options['pool_size'], options['max_overflow']) == (3, 1)
+    assert 'connect_args' not in options
+    
+    options = build_engine_options('postgresql://u:p@db/app', statement_timeout_ms=5000)
+    assert options['connect_args'] == {'options': '-c statement_timeout=5000'}
+
+def test_pool_metrics(tmp_path, client):
+    """Test checkout statistics of the timed pool and the metrics endpoint"""
+    uri = f'sqlite:///{tmp_path / "pool.db"}'
+    engine = create_engine(uri, **build_engine_options(uri, pool_size=1, max_overflow=0))
+    with engine.connect():
+        status = pool_status(engine)
+        assert (status['checked_out'], status['checkouts']) == (1, 1)
+    assert pool_status(engine)['checked_in'] == 1
+    engine.dispose()
+    
+    response = client.get('/metrics/pool')
+    assert response.status_code == 200
+    assert response.get_json()['engines']['default']['pool'] == 'StaticPool'
+
+def test_read_replica_routing(tmp_path):
+    """Test that read-only handlers read replicas and writes stick to the primary"""
+    primary_uri = f'sqlite:///{tmp_path / "primary.db"}'
+    replica_uris = [f'sqlite:///{tmp_path / f"replica{i}.db"}' for i in range(2)]
+    app = create_app('testing', {
+        'SQLALCHEMY_DATABASE_URI': primary_uri,
+        'SQLALCHEMY_REPLICA_URIS': replica_uris
+    })
+    client = app.test_client()
+    
+    with app.app_context():
+        db.create_all()
+        for index, engine in enumerate(app.extensions['replicas'].engines):
+            db.metadata.create_all(engine)
+            with engine.begin() as connection:
+                connection.execute(User.__table__.insert(), {
+                    'username': f'replica{index}', 'email': f'replica{index}@example.com',
+                    'password_hash': 'x', 'created_at': datetime.utcnow(), 'updated_at': datetime.utcnow()
+                })
+    
+    assert client.post('/api/users', json={
+        'username': 'primary',
+        'email': 'primary@example.com',
+        'password': 'password123'
+    }).status_code == 201
+    
+    seen = {client.get('/api/users').get_json()['users'][0]['username'] for _ in range(4)}
+    assert seen == {'replica0', 'replica1'}
+    
+    # Lagging replica reads are served but never shared through the cache
+    with app.app_context():
+        app.extensions['cache'].clear()
+        assert client.get('/api/users/1').get_json()['user']['username'].startswith('replica')
+        assert app.extensions['cache'].get('users:1') is None
+    
+    with app.app_context():
+        with replica_reads(db.session):
+            assert User.query.one().username.startswith('replica')
+            db.session.add(Post(title='t', content='c', slug='s', author_id=1))
+            db.session.flush()
+            # Read-after-write within the same scope goes to the primary
+            assert User.query.one().username == 'primary'
+            db.session.rollback()
+        assert User.query.one().username == 'primary'
+        db.session.remove()
+        app.extensions['replicas'].dispose()
+    
+    # The async handlers read the same replicas and do not cache what they read there
+    from starlette.testclient import TestClient
+    from asgi import create_asgi_app
+    asgi_app = create_asgi_app('testing', {
+        'SQLALCHEMY_DATABASE_URI': primary_uri,
+        'SQLALCHEMY_REPLICA_URIS': replica_uris
+    })
+    with TestClient(asgi_app) as async_client:
+        seen = {async_client.get('/api/users').json()['users'][0]['username'] for _ in range(4)}
+        assert seen == {'replica0', 'replica1'}
+        assert async_client.get('/api/users/1').json()['user']['username'].startswith('replica')
+        with asgi_app.state.flask_app.app_context():
+            assert asgi_app.state.flask_app.extensions['cache'].get('users:1') is None
+
+def test_request_instrumentation(client):
+    """Test Server-Timing headers and the Prometheus metrics endpoint"""
+    client.post('/api/users', json={
+        'username': 'testuser',
+        'email': 'test@example.com',
+        'password': 'password123'
+    })
+    response = client.get('/api/users')
+    timing = response.headers['Server-Timing']
+    assert timing.startswith('app;dur=')
+    assert 'db;dur=' in timing and 'queries' in timing
+    
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    body = response.get_data(as_text=True)
+    assert 'http_request_duration_seconds_count{endpoint="api.get_users",method="GET"} 1' in body
+    assert 'http_requests_total{endpoint="api.create_user",method="POST",status="201"} 1' in body
+    assert 'db_statements_total{endpoint="api.get_users"} 1' in body
+    assert '# TYPE db_query_seconds_total counter' in body
+
+def test_request_profiling(tmp_path):
+    """Test opt-in cProfile and sampling profiles for allowed clients"""
+    assert 'profiler' not in repr(create_app('testing').before_request_funcs)
+    
+    app = create_app('testing', {
+        'PROFILER_ENABLED': True,
+        'PROFILER_DIR': str(tmp_path),
+        'PROFILER_ALLOWED_IPS': ['127.0.0.1']
+    })
+    client = app.test_client()
+    with app.app_context():
+        db.create_all()
+        
+        response = client.get('/api/users', headers={'X-Profile': 'cprofile'})
+        assert response.status_code == 200
+        stats = pstats.Stats(str(tmp_path / response.headers['X-Profile-File']))
+        assert stats.total_calls > 0
+        
+        response = client.get('/api/users?_profile=sample')
+        assert response.headers['X-Profile-File'].endswith('.folded')
+        assert os.path.exists(tmp_path / response.headers['X-Profile-File'])
+        
+        response = client.get('/api/users?_profile=cprofile&_profile_download=1')
+        assert response.headers['Content-Disposition'].startswith('attachment')
+        
+        assert 'X-Profile-File' not in client.get('/api/users').headers
+        response = client.get('/api/users', headers={'X-Profile': 'cprofile'},
+                              environ_base={'REMOTE_ADDR': '10.0.0.1'})
+        assert 'X-Profile-File' not in response.headers
+        db.drop_all()
+
+def test_health_probes(client, app):
+    """Test liveness, readiness checks, result caching and failure reporting"""
+    assert client.get('/health/live').get_json() == {'status': 'alive'}
+    assert not client.get('/health').get_json()['timestamp'].startswith('2024-01-01')
+    
+    response = client.get('/health/ready')
+    assert response.status_code == 200
+    report = response.get_json()
+    assert report['status'] == 'ready' and report['cached'] is False
+    assert set(report['checks']) == {'database:default', 'cache'}
+    assert all(check['latency_ms'] >= 0 for check in report['checks'].values())
+    assert client.get('/health/ready').get_json()['cached'] is True
+    
+    def broken():
+        raise RuntimeError('connection refused')
+    
+    state = app.extensions['readiness']
+    ready, report = state.report(lambda: {'database:default': broken})
+    assert ready is True and report['cached'] is True
+    state._expires = 0
+    ready, report = state.report(lambda: {'database:default': broken})
+    assert ready is False
+    assert report['checks']['database:default']['error'] == 'connection refused'
+    
+    state.timeout = 0.05
+    state._expires = 0
+    ready, report = state.report(lambda: {'slow': lambda: time.sleep(0.5)})
+    assert report['checks']['slow']['status'] == 'timeout'
+
+def test_search_posts(client):
+    """Test ranked full-text search, cursor paging and index maintenance"""
+    client.post('/api/users', json={
+        'username': 'testuser',
+        'email': 'test@example.com',
+        'password': 'password123'
+    })
+    posts = [
+        ('Flask caching', 'Notes on caching'),
+        ('Deploying apps', 'Flask behind gunicorn'),
+        ('Flask in production', 'flask flask'),
+        ('Unrelated', 'Nothing to see'),
+    ]
+    for i, (title, content) in enumerate(posts):
+        client.post('/api/posts', json={
+            'title': title,
+            'content': content,
+            'slug': f'post-{i}',
+            'author_id': 1
+        })
+    
+    data = client.get('/api/posts/search?q=flask').get_json()
+    assert {post['id'] for post in data['posts']} == {1, 2, 3}
+    assert data['posts'][-1]['id'] == 2
+    scores = [post['score'] for post in data['posts']]
+    assert scores == sorted(scores, reverse=True)
+    
+    seen, cursor = [], None
+    while True:
+        url = '/api/posts/search?q=flask&limit=1' + (f'&cursor={cursor}' if cursor else '')
+        data = client.get(url).get_json()
+        seen.extend(post['id'] for post in data['posts'])
+        cursor = data['next_cursor']
+        if cursor is None:
+            break
+    assert sorted(seen) == [1, 2, 3] and len(seen) == 3
+    
+    assert [p['id'] for p in client.get('/api/posts/search?q=deploy*').get_json()['posts']] == [2]
+    client.put('/api/posts/4', json={'title': 'Flask tips'})
+    client.delete('/api/posts/1')
+    data = client.get('/api/posts/search?q=flask').get_json()
+    assert {post['id'] for post in data['posts']} == {2, 3, 4}
+    assert client.get('/api/posts/search?q=%22OR').get_json()['posts'] == []
+    assert client.get('/api/posts/search?q=').status_code == 400
+
+def test_background_jobs(app, client):
+    """Test cache warming jobs, retries with backoff and the dead-letter list"""
+    app.extensions['cache'] = fake = FakeCache()
+    client.post('/api/users', json={
+        'username': 'testuser',
+        'email': 'test@example.com',
+        'password': 'password123'
+    })
+    client.post('/api/posts', json={
+        'title': 'Warm',
+        'content': 'Content',
+        'slug': 'warm',
+        'author_id': 1
+    })
+    assert fake.get('posts:1')['author'] == 'testuser'
+    assert fake.get('users:1')['username'] == 'testuser'
+    
+    backend = app.extensions['jobs']
+    calls = []
+    
+    @jobs.task(name='flaky', max_retries=2, backoff=0)
+    def flaky(fail_times):
+        calls.append(fail_times)
+        if len(calls) <= fail_times:
+            raise RuntimeError('boom')
+    
+    with app.app_context():
+        flaky.delay(2)
+        assert len(calls) == 3 and backend.dead_letters() == []
+        calls.clear()
+        flaky.delay(5)
+        assert len(calls) == 3
+        dead = backend.dead_letters()[0]
+        assert dead['task'] == 'flaky' and dead['attempts'] == 3
+        assert dead['error'] == 'RuntimeError: boom'
+        jobs.enqueue('missing')
+        assert backend.dead_letters()[0]['error'] == 'Unknown task: missing'
+    
+    threaded = ThreadBackend(app, jobs.tasks, workers=2)
+    calls.clear()
+    threaded.push({'id': 'a', 'task': 'flaky', 'args': [1], 'kwargs': {}, 'attempts': 0})
+    assert threaded.join(timeout=5)
+    assert len(calls) == 2 and threaded.dead_letters() == []
+
+def test_user_post_counters(app, client):
+    """Test post counters maintained by single and bulk post writes"""
+    for name in ('alice', 'bob'):
+        client.post('/api/users', json={
+            'username': name,
+            'email': f'{name}@example.com',
+            'password': 'password123'
+        })
+    assert client.get('/api/users/1/stats').get_json()['stats'] == {
+        'user_id': 1, 'post_count': 0, 'published_post_count': 0, 'last_post_at': None
+    }
+    updated_at = client.get('/api/users/1').get_json()['user']['updated_at']
+    
+    for i in range(3):
+        client.post('/api/posts', json={
+            'title': f'Post {i}',
+            'content': 'Content',
+            'slug': f'post-{i}',
+            'author_id': 1,
+            'is_published': i == 0
+        })
+    client.put('/api/posts/2', json={'is_published': True})
+    client.put('/api/posts/2', json={'is_published': True})
+    client.delete('/api/posts/1')
+    client.post('/api/posts/bulk', json={'posts': [
+        {'title': 'B', 'content': 'C', 'slug': 'bulk-1', 'author_id': 2, 'is_published': True},
+        {'title': 'B', 'content': 'C', 'slug': 'bulk-2', 'author_id': 1},
+    ]})
+    client.patch('/api/posts/bulk', json={'posts': [{'id': 3, 'is_published': True}, {'id': 4, 'is_published': False}]})
+    client.delete('/api/posts/bulk', json={'ids': [5]})
+    
+    # Null is not a publish state; it must not reach the counters
+    assert client.put('/api/posts/3', json={'is_published': None}).status_code == 400
+    response = client.patch('/api/posts/bulk', json={'posts': [{'id': 3, 'is_published': None}]})
+    assert response.get_json()['results'][0]['error'] == 'is_published: Field may not be null.'
+    
+    # Another request unpublishes post 2 after this one loaded it; only one counts it
+    with app.app_context():
+        post = db.session.get(Post, 2)
+        other = PostCountChanges()
+        assert other.publish([2], False) == 1
+        other.apply()
+        counts = PostCountChanges()
+        counts.publish_post(post, False)
+        counts.apply()
+        db.session.commit()
+        assert post.is_published is False
+    
+    with app.app_context():
+        for user in User.query.all():
+            posts = Post.query.filter_by(author_id=user.id).all()
+            assert user.post_count == len(posts)
+            assert user.published_post_count == sum(1 for post in posts if post.is_published)
+            assert user.last_post_at == max((post.created_at for post in posts), default=None)
+    
+    stats = client.get('/api/users/1/stats').get_json()['stats']
+    assert (stats['post_count'], stats['published_post_count']) == (2, 1)
+    assert client.get('/api/users/1').get_json()['user']['updated_at'] == updated_at
+    assert client.get('/api/users/99/stats').status_code == 404
+
+def test_load_benchmark_smoke(tmp_path):
+    """Test that the load benchmark seeds, drives the app and reports percentiles"""
+    from benchmarks import api_load
+    
+    report = api_load.run(
+        str(tmp_path / 'bench.db'), users=5, posts=30, requests=8, concurrency=2,
+        drivers=('test-client',), endpoints=('list_posts', 'get_post', 'create_post'), warmup=0
+    )
+    results = report['results']['test-client']
+    assert report['dataset'] == dict(report['dataset'], users=5, posts=30)
+    for endpoint in ('list_posts', 'get_post', 'create_post'):
+        assert results[endpoint]['requests'] == 8 and results[endpoint]['errors'] == 0
+        assert results[endpoint]['p50_ms'] <= results[endpoint]['p95_ms'] <= results[endpoint]['p99_ms']
+
+def test_asgi_async_routes(tmp_path):
+    """Test the async handlers and the WSGI fallback of the ASGI entry point"""
+    from starlette.testclient import TestClient
+    from asgi import create_asgi_app
+    
+    # A database file, so the sync and async engines see the same rows
+    asgi_app = create_asgi_app('testing', {'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "asgi.db"}'})
+    with asgi_app.state.flask_app.app_context():
+        db.create_all()
+    
+    with TestClient(asgi_app) as client:
+        response = client.post('/api/users', json={
+            'username': 'async', 'email': 'async@example.com', 'password': 'password123'
+        })
+        assert response.status_code == 201
+        user_id = response.json()['user']['id']
+        assert client.post('/api/users', json={
+            'username': 'async', 'email': 'other@example.com', 'password': 'password123'
+        }).status_code == 400
+        
+        for i in range(3):
+            response = client.post('/api/posts', json={
+                'title': f'Async post {i}', 'content': 'Written through asyncio',
+                'slug': f'async-{i}', 'author_id': user_id, 'is_published': i > 0
+            })
+            assert response.status_code == 201
+            assert response.json()['post']['author'] == 'async'
+        
+        page = client.get('/api/posts?limit=2').json()
+        assert [post['slug'] for post in page['posts']] == ['async-2', 'async-1']
+        rest = client.get(f'/api/posts?limit=2&cursor={page["next_cursor"]}').json()
+        assert [post['slug'] for post in rest['posts']] == ['async-0'] and rest['next_cursor'] is None
+        assert client.get('/api/posts?is_published=false&fields=id,slug').json()['posts'] == [
+            {'id': 1, 'slug': 'async-0'}
+        ]
+        stream = client.get('/api/posts?stream=1')
+        assert len(stream.json()) == 3
+        assert client.get('/api/posts?sort=title').status_code == 400
+        
+        # Same validators, cached totals and metrics as the WSGI list handler
+        response = client.get('/api/posts?limit=2&include_total=1')
+        assert response.json()['total'] == 3 and 'db;dur=' in response.headers['Server-Timing']
+        assert client.get('/api/posts?limit=2&include_total=1', headers={
+            'If-None-Match': response.headers['ETag']
+        }).status_code == 304
+        assert client.get('/api/posts?stream=1', headers={'If-None-Match': stream.headers['ETag']}).status_code == 304
+        assert 'db_statements_total{endpoint="api.get_posts"}' in client.get('/metrics').text
+        
+        response = client.get('/api/posts/1')
+        assert response.json()['post']['slug'] == 'async-0'
+        assert client.get('/api/posts/1', headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+        
+        # Revalidation on a cold cache is answered by the primary-key probe
+        response = client.get(f'/api/users/{user_id}')
+        asgi_app.state.flask_app.extensions['cache'].clear()
+        assert client.get(f'/api/users/{user_id}', headers={
+            'If-Modified-Since': response.headers['Last-Modified']
+        }).status_code == 304
+        assert client.get('/api/posts/1', headers={'If-None-Match': response.headers['ETag']}).status_code == 200
+        
+        # NDJSON only when the client prefers it, and CORS as on the Flask app
+        assert client.get('/api/posts', headers={
+            'Accept': 'application/json, application/x-ndjson;q=0.5'
+        }).headers['Content-Type'] == 'application/json'
+        assert client.get('/api/posts', headers={
+            'Accept': 'application/x-ndjson'
+        }).headers['Content-Type'] == 'application/x-ndjson'
+        response = client.get('/api/posts/1', headers={'Origin': 'http://localhost:3000'})
+        assert response.headers['Access-Control-Allow-Origin'] == 'http://localhost:3000'
+        assert 'Access-Control-Allow-Origin' not in client.get('/api/posts/1', headers={
+            'Origin': 'http://evil.example'
+        }).headers
+        assert client.get('/api/posts/99').status_code == 404
+        
+        assert client.put('/api/posts/1', json={'is_published': True}).json()['post']['is_published'] is True
+        assert client.delete('/api/posts/3').status_code == 200
+        assert client.get('/api/posts?stream=1', headers={'If-None-Match': stream.headers['ETag']}).status_code == 200
+        assert client.get(f'/api/users/{user_id}/stats').json()['stats']['published_post_count'] == 2
+        assert client.get('/api/posts/search?q=async').json()['posts'][0]['score'] > 0
+        
+        # Rename through the async session invalidates cached posts embedding the author
+        assert client.put(f'/api/users/{user_id}', json={'username': 'renamed'}).status_code == 200
+        assert client.get('/api/posts/1').json()['post']['author'] == 'renamed'
+        
+        # Routes without an async counterpart are served by the Flask app
+        assert client.get('/health/live').json() == {'status': 'alive'}
+        assert client.post('/api/posts/bulk', json={'posts': []}).status_code == 400
+
+def test_gunicorn_config(monkeypatch, tmp_path):
+    """Test worker sizing from the environment and pool disposal after fork"""
+    import runpy
+    from types import SimpleNamespace
+    
+    # The config file sets DB_POOL_SIZE; setenv first so teardown restores it
+    monkeypatch.setenv('DB_POOL_SIZE', '')
+    monkeypatch.delenv('DB_POOL_SIZE')
+    path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'gunicorn.conf.py')
+    monkeypatch.setenv('GUNICORN_WORKER_CLASS', 'sync')
+    monkeypatch.setenv('GUNICORN_MAX_REQUESTS', '500')
+    settings = runpy.run_path(path)
+    assert settings['workers'] == 2 * settings['cpu_count']() + 1
+    assert settings['preload_app'] and settings['max_requests_jitter'] == 50
+    
+    monkeypatch.setenv('GUNICORN_WORKER_CLASS', 'gthread')
+    monkeypatch.setenv('WEB_CONCURRENCY', '3')
+    monkeypatch.setenv('GUNICORN_THREADS', '6')
+    settings = runpy.run_path(path)
+    assert (settings['workers'], settings['threads']) == (3, 6)
+    assert os.environ['DB_POOL_SIZE'] == '6'
+    
+    app = create_app('testing', {'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "fork.db"}'})
+    with app.app_context():
+        db.session.execute(db.text('SELECT 1'))
+        db.session.remove()
+        pool = db.engine.pool
+        assert pool.checkedin() == 1
+    
+    server = SimpleNamespace(cfg=SimpleNamespace(preload_app=True), app=SimpleNamespace(wsgi=lambda: app))
+    settings['post_fork'](server, None)
+    with app.app_context():
+        assert db.engine.pool is not pool and db.engine.pool.checkedin() == 0
+
+def test_startup_cost():
+    """Test that importing the app is lazy and startup stays within budget (-X importtime)"""
+    import subprocess
+    import sys
+    
+    code = (
+        'import time, app\n'
+        'assert "app" not in vars(app), "importing app.py built an app"\n'
+        'started = time.perf_counter()\n'
+        'app.create_app("testing")\n'
+        'print((time.perf_counter() - started) * 1000)\n'
+    )
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        capture_output=True, text=True, check=True
+    )
+    # "import time: <self us> | <cumulative us> | <indented module name>"
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if line.startswith('import time:') and not line.endswith('package'):
+            _, total, name = line[len('import time:'):].split('|')
+            cumulative[name.strip()] = int(total) / 1000
+    
+    # Only the `flask db` commands and schemas need these
+    assert not {'alembic', 'flask_migrate', 'flask_marshmallow'} & cumulative.keys()
+    assert cumulative['app'] < float(os.getenv('STARTUP_IMPORT_BUDGET_MS', '1500'))
+    assert float(result.stdout) < float(os.getenv('STARTUP_CREATE_APP_BUDGET_MS', '500'))
+
+def test_export_import_resume(app, seeded, tmp_path):
+    """Test streaming export/import round trips and resumes after an interruption"""
+    from services import transfer
+    
+    class Interrupted(Exception):
+        pass
+    
+    def crash_after(batches):
+        calls = []
+        
+        def progress(*args):
+            calls.append(args)
+            if len(calls) == batches:
+                raise Interrupted()
+        return progress
+    
+    def snapshot():
+        users = [(u.id, u.username, u.password_hash, u.is_active, u.created_at, u.post_count, u.published_post_count)
+                 for u in User.query.order_by(User.id)]
+        posts = [(p.id, p.slug, p.content, p.author_id, p.is_published, p.created_at)
+                 for p in Post.query.order_by(Post.id)]
+        return users, posts
+    
+    before = snapshot()
+    users_path = str(tmp_path / 'users.ndjson')
+    posts_path = str(tmp_path / 'posts.csv')
+    fields = transfer.USER_FIELDS + ('password_hash',)
+    
+    with pytest.raises(Interrupted):
+        transfer.export_table(User, fields, users_path, batch_size=20, progress=crash_after(1))
+    with open(users_path, 'a') as handle:
+        handle.write('{"id": 21, "userna')  # torn write after the checkpoint
+    assert transfer.export_table(User, fields, users_path, batch_size=20, resume=True) == (30, 50)
+    assert transfer.export_table(Post, transfer.POST_FIELDS, posts_path, batch_size=64) == (500, 500)
+    
+    db.drop_all()
+    db.create_all()
+    assert transfer.import_table(User, users_path) == (50, 0, [])
+    with pytest.raises(Interrupted):
+        transfer.import_table(Post, posts_path, chunk_size=200, progress=crash_after(1))
+    assert transfer.import_table(Post, posts_path, chunk_size=200, resume=True) == (300, 0, [])
+    db.session.expire_all()
+    assert snapshot() == before
+    
+    # A second run rejects every record instead of duplicating it
+    created, failed, errors = transfer.import_table(Post, posts_path, restore_ids=False)
+    assert (created, failed) == (0, 500) and errors[0] == 'record 1: Post with this slug already exists'
+    created, failed, errors = transfer.import_table(Post, posts_path)
+    assert (created, failed) == (0, 500) and errors[0] == 'record 1: Post with this id already exists'
+    
+    # Kept fields are checked per record: taken or malformed ids, non-datetime stamps
+    bad_path = tmp_path / 'bad.ndjson'
+    bad_path.write_text('\n'.join(json.dumps(dict(
+        {'username': f'bad{i}', 'email': f'bad{i}@example.com', 'password_hash': 'x'}, **fields
+    )) for i, fields in enumerate([{'id': 1}, {'id': [99]}, {'id': 98, 'created_at': [1]}, {'id': 97}])))
+    assert transfer.import_table(User, str(bad_path)) == (1, 3, [
+        'record 1: User with this id already exists', 'record 2: id: Invalid value.',
+        'record 3: created_at: Invalid value.'
+    ])
+
+@pytest.mark.max_queries(2)
+def test_schemas_and_row_serializers(app, client, seeded):
+    """Test schema validation and that list rows match the detail representation"""
+    from models.post import Post
+    from schemas.rows import post_rows
+    
+    response = client.post('/api/users', json={'username': 'new', 'email': 'not-an-email'})
+    assert response.status_code == 400
+    assert set(response.get_json()['fields']) == {'email', 'password'}
+    response = client.put('/api/posts/1', json={'is_published': 'maybe'})
+    assert response.status_code == 400
+    assert 'is_published' in response.get_json()['fields']
+    
+    data = client.get('/api/posts?limit=50').get_json()
+    posts = Post.query.options(Post.author_loader()).order_by(Post.created_at.desc(), Post.id.desc()).limit(50)
+    expected = app.json.loads(app.json.dumps([post.to_dict() for post in posts]))
+    assert data['posts'] == expected
+    
+    data = client.get('/api/posts?fields=author,title&sort=updated_at&limit=5').get_json()
+    assert all(list(post) == ['author', 'title'] for post in data['posts'])
+    assert data['posts'][0]['author'] is not None
+    
+    # Plans are compiled once per fieldset
+    assert post_rows.query(('title',))[1] is post_rows.query(('title',))[1]
@@ -0,0 +1,110 @@
+"""
+Async SQLAlchemy engine for the ASGI entry point
+
+The async engine talks to the same database as the Flask app through an
+asyncio driver (aiosqlite for SQLite, asyncpg for PostgreSQL) and is used
+with the same models. Sessions are created per request from
+``AsyncDatabase.session()``; read-only handlers use ``replica_session()``,
+which binds the whole session to one of the SQLALCHEMY_REPLICA_URIS.
+"""
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from utils.cache import register_invalidation
+from utils.routing import ReplicaSet
+
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+}
+
+
+class AsyncRequestSession(Session):
+    """Sync session class behind every AsyncSession; carries the cache invalidation hooks"""
+
+
+# Commits run on the event loop; routes/async_api.py invalidates off it
+register_invalidation(AsyncRequestSession, deferred=True)
+
+
+def async_database_url(uri):
+    """``uri`` rewritten to use the asyncio driver of its backend"""
+    url = make_url(uri)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f'No async driver configured for {backend}')
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+def build_async_engine_options(url, config):
+    """Pool and connect options for the async engine, mirroring the sync engine's settings"""
+    if url.get_backend_name() == 'sqlite':
+        if url.database in (None, '', ':memory:'):
+            # Every aiosqlite connection to :memory: is a new, empty database
+            return {'poolclass': StaticPool}
+        return {}
+    
+    options = {
+        'pool_size': config.get('DB_POOL_SIZE', 5),
+        'max_overflow': config.get('DB_MAX_OVERFLOW', 10),
+        'pool_timeout': config.get('DB_POOL_TIMEOUT', 30),
+        'pool_recycle': config.get('DB_POOL_RECYCLE', 1800),
+        'pool_pre_ping': config.get('DB_POOL_PRE_PING', True)
+    }
+    statement_timeout = config.get('DB_STATEMENT_TIMEOUT_MS')
+    if statement_timeout:
+        options['connect_args'] = {'server_settings': {'statement_timeout': str(int(statement_timeout))}}
+    return options
+
+
+class AsyncDatabase:
+    """Async engine and session factory for a Flask app's primary database
+    
+    ``SQLALCHEMY_ASYNC_DATABASE_URI`` overrides the URL; by default the sync
+    engine's URL is reused (relative SQLite paths already resolved by
+    Flask-SQLAlchemy) with the driver swapped.
+    """
+    
+    def __init__(self, app, db):
+        config = app.config
+        uri = config.get('SQLALCHEMY_ASYNC_DATABASE_URI')
+        if not uri:
+            with app.app_context():
+                uri = db.engine.url
+        url = async_database_url(uri)
+        self.engine = create_async_engine(url, **build_async_engine_options(url, config))
+        replica_urls = [async_database_url(uri) for uri in config.get('SQLALCHEMY_REPLICA_URIS') or []]
+        self.replicas = ReplicaSet(
+            create_async_engine(url, **build_async_engine_options(url, config)) for url in replica_urls
+        )
+        self.session = async_sessionmaker(
+            self.engine, class_=AsyncSession, sync_session_class=AsyncRequestSession,
+            # Objects stay readable after commit without another round trip
+            expire_on_commit=False
+        )
+    
+    def replica_session(self):
+        """Session for a read-only handler: on the next replica, if there are any
+        
+        The replica is recorded in ``session.info`` like ``RoutingSession``
+        does, so handlers can tell (``read_from_replica``) not to cache it.
+        """
+        if not self.replicas.engines:
+            return self.session()
+        engine = self.replicas.next()
+        session = self.session(bind=engine)
+        session.info['replica'] = engine
+        return session
+    
+    async def dispose(self):
+        await self.engine.dispose()
+        for engine in self.replicas.engines:
+            await engine.dispose()
+    
+    def dispose_after_fork(self):
+        """Forget connections inherited from a parent process without closing them"""
+        self.engine.sync_engine.dispose(close=False)
+        for engine in self.replicas.engines:
+            engine.sync_engine.dispose(close=False)
@@ -0,0 +1,362 @@
+"""
+Read-through cache for API resources
+
+Backends share a tiny interface so the in-process LRU used by default can be
+swapped for Redis (the ``redis`` service in docker-compose.yml) or for a
+recording fake in tests. Entries are keyed ``<table>:<id>`` and are dropped
+after every commit that touched the underlying row, so a stale read never
+outlives a write.
+
+Invalidations that have to look other rows up first, such as the posts that
+embed a renamed author, are queued as background jobs after the commit
+instead of running inside the writer's flush.
+
+Filling a miss races with those invalidations: a reader that loaded the row
+just before a write committed would store the old version right after the
+write dropped the key. Readers therefore take a ``lease()`` before loading
+and pass it to ``set``. Every invalidation stamps its keys with a newer
+generation, and a fill whose lease predates the key's stamp is discarded.
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+
+
+def cache_key(obj):
+    """Cache key of a model instance"""
+    return f'{obj.__tablename__}:{obj.id}'
+
+
+class CacheBackend:
+    """Interface implemented by every cache backend"""
+    
+    def get(self, key):
+        """Return the cached value or ``None`` on a miss"""
+        raise NotImplementedError
+    
+    def lease(self):
+        """Token for filling a miss; take it before loading the value"""
+        return 0
+    
+    def set(self, key, value, ttl=None, lease=None):
+        """Store ``value``; with ``lease``, only if ``key`` was not invalidated
+        since the lease was taken. Returns whether the value was stored."""
+        raise NotImplementedError
+    
+    def delete_many(self, *keys):
+        """Drop ``keys`` and reject fills of them leased before now"""
+        raise NotImplementedError
+    
+    def clear(self):
+        raise NotImplementedError
+    
+    def ping(self):
+        """Return True when the backend is reachable"""
+        return True
+
+
+class NullCache(CacheBackend):
+    """Backend that never stores anything"""
+    
+    def get(self, key):
+        return None
+    
+    def set(self, key, value, ttl=None, lease=None):
+        return False
+    
+    def delete_many(self, *keys):
+        pass
+    
+    def clear(self):
+        pass
+
+
+class LRUCache(CacheBackend):
+    """Thread-safe in-process LRU cache with per-entry TTL"""
+    
+    def __init__(self, max_entries=10000, default_ttl=60):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Invalidation generation per recently invalidated key, oldest first;
+        # leases older than the newest stamp pruned from it are rejected
+        self._generation = 0
+        self._stamps = OrderedDict()
+        self._floor = 0
+    
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+    
+    def lease(self):
+        with self._lock:
+            return self._generation
+    
+    def set(self, key, value, ttl=None, lease=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            if lease is not None and (lease < self._floor or self._stamps.get(key, 0) > lease):
+                return False
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return True
+    
+    def delete_many(self, *keys):
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                self._entries.pop(key, None)
+                self._stamps.pop(key, None)
+                self._stamps[key] = self._generation
+            while len(self._stamps) > self.max_entries:
+                _, self._floor = self._stamps.popitem(last=False)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self):
+        return len(self._entries)
+
+
+class FakeCache(LRUCache):
+    """LRU cache that records hits, misses and deletions for assertions"""
+    
+    def __init__(self, max_entries=10000, default_ttl=60):
+        super().__init__(max_entries, default_ttl)
+        self.hits = []
+        self.misses = []
+        self.deleted = []
+    
+    def get(self, key):
+        value = super().get(key)
+        (self.misses if value is None else self.hits).append(key)
+        return value
+    
+    def delete_many(self, *keys):
+        self.deleted.extend(keys)
+        super().delete_many(*keys)
+
+
+# KEYS: value key, stamp key; ARGV: value, lease, ttl
+_SET_IF_NOT_INVALIDATED = """
+local stamp = redis.call('GET', KEYS[2])
+if stamp and tonumber(stamp) > tonumber(ARGV[2]) then
+    return 0
+end
+if tonumber(ARGV[3]) > 0 then
+    redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[3])
+else
+    redis.call('SET', KEYS[1], ARGV[1])
+end
+return 1
+"""
+
+# KEYS: generation counter, then value key and stamp key pairs; ARGV: stamp ttl
+_INVALIDATE = """
+local generation = redis.call('INCR', KEYS[1])
+for i = 2, #KEYS, 2 do
+    redis.call('DEL', KEYS[i])
+    redis.call('SET', KEYS[i + 1], generation, 'EX', ARGV[1])
+end
+return generation
+"""
+
+
+class RedisCache(CacheBackend):
+    """Redis backed cache; values are pickled
+    
+    Invalidation stamps expire after ``stamp_ttl`` seconds, which bounds how
+    long a reader may take between ``lease()`` and ``set``.
+    """
+    
+    def __init__(self, url, default_ttl=60, key_prefix='cache:', stamp_ttl=300):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('CACHE_BACKEND is redis but the redis package is not installed')
+        self.client = redis.Redis.from_url(url)
+        self.default_ttl = default_ttl
+        self.key_prefix = key_prefix
+        self.stamp_ttl = stamp_ttl
+        self.generation_key = key_prefix + 'generation'
+        self._set_if_not_invalidated = self.client.register_script(_SET_IF_NOT_INVALIDATED)
+        self._invalidate = self.client.register_script(_INVALIDATE)
+    
+    def _stamp_key(self, key):
+        return f'{self.key_prefix}stamp:{key}'
+    
+    def get(self, key):
+        raw = self.client.get(self.key_prefix + key)
+        return None if raw is None else pickle.loads(raw)
+    
+    def lease(self):
+        return int(self.client.get(self.generation_key) or 0)
+    
+    def set(self, key, value, ttl=None, lease=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        if lease is None:
+            return bool(self.client.set(self.key_prefix + key, pickle.dumps(value), ex=ttl or None))
+        return bool(self._set_if_not_invalidated(
+            keys=[self.key_prefix + key, self._stamp_key(key)], args=[pickle.dumps(value), lease, ttl or 0]
+        ))
+    
+    def delete_many(self, *keys):
+        if keys:
+            pairs = [name for key in keys for name in (self.key_prefix + key, self._stamp_key(key))]
+            self._invalidate(keys=[self.generation_key] + pairs, args=[self.stamp_ttl])
+    
+    def clear(self):
+        # Keep the generation counter; resetting it would validate old leases
+        for key in self.client.scan_iter(match=self.key_prefix + '*'):
+            if key.decode() != self.generation_key:
+                self.client.delete(key)
+    
+    def ping(self):
+        return bool(self.client.ping())
+
+
+def create_backend(config):
+    """Build the backend selected by CACHE_BACKEND"""
+    name = config.get('CACHE_BACKEND', 'lru')
+    ttl = config.get('CACHE_DEFAULT_TTL', 60)
+    max_entries = config.get('CACHE_MAX_ENTRIES', 10000)
+    
+    if name == 'lru':
+        return LRUCache(max_entries, ttl)
+    if name == 'fake':
+        return FakeCache(max_entries, ttl)
+    if name == 'redis':
+        return RedisCache(
+            config.get('CACHE_REDIS_URL', 'redis://localhost:6379/0'), ttl,
+            config.get('CACHE_KEY_PREFIX', 'cache:')
+        )
+    if name == 'null':
+        return NullCache()
+    raise ValueError(f'Unknown cache backend: {name}')
+
+
+class Cache:
+    """Flask extension exposing the configured cache backend"""
+    
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        app.extensions['cache'] = create_backend(app.config)
+    
+    @property
+    def backend(self):
+        return current_app.extensions['cache']
+    
+    def get(self, key):
+        return self.backend.get(key)
+    
+    def lease(self):
+        return self.backend.lease()
+    
+    def set(self, key, value, ttl=None, lease=None):
+        return self.backend.set(key, value, ttl, lease)
+    
+    def delete_many(self, *keys):
+        self.backend.delete_many(*keys)
+    
+    def clear(self):
+        self.backend.clear()
+
+
+def mark_stale(session, *keys):
+    """Schedule ``keys`` for invalidation when ``session`` commits
+    
+    Flushes of ORM instances are tracked automatically; call this for writes
+    that bypass the unit of work, such as bulk UPDATE/DELETE statements.
+    """
+    session.info.setdefault('stale_cache_keys', set()).update(keys)
+
+
+def queue_invalidation(session, task, *args):
+    """Schedule ``task.delay(*args)`` for when ``session`` commits
+    
+    For invalidations that need a query of their own, such as every post of
+    a renamed author, so the write does not run it.
+    """
+    session.info.setdefault('invalidation_jobs', []).append((task, args))
+
+
+def _after_flush(session, flush_context):
+    keys = set()
+    jobs = []
+    for obj in list(session.dirty) + list(session.deleted):
+        if not hasattr(obj, '__tablename__'):
+            continue
+        keys.add(cache_key(obj))
+        # ``(task, args)`` pairs that invalidate resources embedding ``obj``
+        dependents = getattr(obj, 'invalidation_jobs', None)
+        if dependents is not None:
+            jobs.extend(dependents())
+    if keys:
+        mark_stale(session, *keys)
+    for task, args in jobs:
+        queue_invalidation(session, task, *args)
+
+
+def run_invalidations(keys, jobs):
+    """Drop ``keys`` from the app's cache and queue the invalidation ``jobs``"""
+    if not has_app_context():
+        return
+    if keys and 'cache' in current_app.extensions:
+        current_app.extensions['cache'].delete_many(*keys)
+    for task, args in jobs or ():
+        task.delay(*args)
+
+
+def take_invalidations(session):
+    """``(keys, jobs)`` committed by a session registered with ``deferred=True``"""
+    keys, jobs = session.info.pop('committed_invalidations', (set(), []))
+    return keys, jobs
+
+
+def _after_commit(session):
+    run_invalidations(session.info.pop('stale_cache_keys', None), session.info.pop('invalidation_jobs', None))
+
+
+def _after_commit_deferred(session):
+    # The cache and queue calls may block; an event loop runs them elsewhere
+    keys, jobs = session.info.setdefault('committed_invalidations', (set(), []))
+    keys.update(session.info.pop('stale_cache_keys', ()))
+    jobs.extend(session.info.pop('invalidation_jobs', ()))
+
+
+def _after_rollback(session):
+    session.info.pop('stale_cache_keys', None)
+    session.info.pop('invalidation_jobs', None)
+
+
+def register_invalidation(session, deferred=False):
+    """Hook cache invalidation into ``session``'s transaction events
+    
+    With ``deferred``, commits only collect the invalidations; the caller
+    runs them with ``run_invalidations(*take_invalidations(session))``.
+    """
+    for name, listener in (('after_flush', _after_flush),
+                           ('after_commit', _after_commit_deferred if deferred else _after_commit),
+                           ('after_rollback', _after_rollback)):
+        if not event.contains(session, name, listener):
+            event.listen(session, name, listener)
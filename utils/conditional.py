@@ -0,0 +1,81 @@
+"""
+Conditional GET support (ETag / Last-Modified)
+
+Single resources are versioned by ``updated_at`` (plus any values their
+representation copies from other rows), so revalidation can be answered from
+a narrow query or a cached representation before any row is serialized.
+Collection pages are tagged with a hash of the response body, which costs
+nothing beyond the page query; aggregating over the whole filtered table is
+left to streamed responses, which read every row anyway. Collections carry
+no Last-Modified: ``max(updated_at)`` does not move when a row is deleted.
+"""
+import hashlib
+from datetime import timezone
+
+from flask import current_app, request
+
+
+def make_etag(*parts):
+    """Strong ETag value for the given version components"""
+    raw = '|'.join('' if part is None else str(part) for part in parts)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def _as_utc(value):
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def resource_validators(kind, resource_id, updated_at, *embedded):
+    """``(etag, last_modified)`` of a single resource
+    
+    ``embedded`` are values the representation copies from other rows, such
+    as a post's author name; changing them does not touch ``updated_at``, so
+    they are part of the ETag and there is no usable Last-Modified (None).
+    """
+    etag = make_etag(kind, resource_id, updated_at, *embedded)
+    return etag, None if embedded else _as_utc(updated_at)
+
+
+def payload_etag(body):
+    """Strong ETag of a response body"""
+    return hashlib.sha1(body).hexdigest()
+
+
+def collection_etag(kind, version):
+    """ETag of a streamed collection at ``version`` and the current query string
+    
+    ``version`` is the row of ``RowSerializer.version_query`` for the
+    collection's filters and fields.
+    """
+    return make_etag(kind, *version, request.query_string.decode('latin-1'), request.headers.get('Accept'))
+
+
+def is_conditional():
+    """Whether the request carries a validator worth checking"""
+    return bool(request.if_none_match) or request.if_modified_since is not None
+
+
+def is_not_modified(etag, last_modified=None):
+    """Evaluate If-None-Match (preferred) or If-Modified-Since"""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if last_modified is not None and request.if_modified_since is not None:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+def with_validators(response, etag, last_modified=None):
+    """Attach ETag and Last-Modified headers to ``response``"""
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    return response
+
+
+def not_modified(etag, last_modified=None):
+    """Empty 304 response carrying the current validators"""
+    return with_validators(current_app.response_class(status=304), etag, last_modified)
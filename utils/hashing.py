@@ -0,0 +1,167 @@
+"""
+Password hashing off the request thread
+
+scrypt/pbkdf2 are deliberately CPU-bound; running them inline lets a burst of
+signups pin every worker. Hashes run in a bounded process pool instead, and
+callers are turned away with ``HashingBusy`` (HTTP 429) once
+PASSWORD_HASH_MAX_PENDING hashes are already in flight in this process.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def _hash_chunk(passwords, method):
+    return [generate_password_hash(password, method) for password in passwords]
+
+
+class HashingBusy(RuntimeError):
+    """Raised when too many password hashes are already pending"""
+
+
+def _get_executor(workers):
+    """Process-wide pool, recreated after a fork"""
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context('spawn')
+            )
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def shutdown_executor():
+    """Stop the hashing pool of this process, if any"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None and _executor_pid == os.getpid():
+            _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+class HashingPool:
+    """Per-app hashing settings and backpressure"""
+    
+    def __init__(self, method='scrypt', workers=2, max_pending=16, timeout=30):
+        self.method = method
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._method_prefix = None
+    
+    def _acquire(self):
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy('Too many password hashes pending')
+    
+    def _release_when_done(self, futures):
+        """Give the slot back once every future has finished
+        
+        A caller that times out stops waiting but the hash keeps running in
+        the pool, so the slot has to stay taken until the work is really done.
+        """
+        remaining = [len(futures)]
+        lock = threading.Lock()
+        
+        def done(future):
+            with lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            self._slots.release()
+        
+        for future in futures:
+            future.add_done_callback(done)
+    
+    def _run(self, func, *args):
+        if not self.workers:
+            return func(*args)
+        self._acquire()
+        try:
+            future = _get_executor(self.workers).submit(func, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        self._release_when_done([future])
+        return future.result(self.timeout)
+    
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+    
+    def hash_many(self, passwords):
+        """Hash a batch of passwords using every pool worker, as one pending slot"""
+        passwords = list(passwords)
+        if not self.workers:
+            return [generate_password_hash(password, self.method) for password in passwords]
+        if not passwords:
+            return []
+        self._acquire()
+        chunksize = max(1, len(passwords) // (self.workers * 4))
+        futures = []
+        try:
+            executor = _get_executor(self.workers)
+            for start in range(0, len(passwords), chunksize):
+                futures.append(executor.submit(_hash_chunk, passwords[start:start + chunksize], self.method))
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            if not futures:
+                self._slots.release()
+                raise
+            self._release_when_done(futures)
+            raise
+        self._release_when_done(futures)
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        return [pwhash for future in futures
+                for pwhash in future.result(None if deadline is None else max(0, deadline - time.monotonic()))]
+    
+    def verify(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+    
+    def needs_rehash(self, pwhash):
+        """Whether ``pwhash`` was made with other parameters than the configured ones"""
+        if self._method_prefix is None:
+            # werkzeug normalizes the method string, e.g. 'scrypt' -> 'scrypt:32768:8:1'
+            self._method_prefix = generate_password_hash('', self.method, salt_length=1).split('$', 1)[0]
+        return pwhash.split('$', 1)[0] != self._method_prefix
+
+
+class PasswordHasher:
+    """Flask extension exposing the app's HashingPool"""
+    
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        app.extensions['password_hasher'] = HashingPool(
+            method=app.config.get('PASSWORD_HASH_METHOD', 'scrypt'),
+            workers=app.config.get('PASSWORD_HASH_WORKERS', 2),
+            max_pending=app.config.get('PASSWORD_HASH_MAX_PENDING', 16),
+            timeout=app.config.get('PASSWORD_HASH_TIMEOUT', 30)
+        )
+    
+    @property
+    def pool(self):
+        return current_app.extensions['password_hasher']
+    
+    def hash(self, password):
+        return self.pool.hash(password)
+    
+    def hash_many(self, passwords):
+        return self.pool.hash_many(passwords)
+    
+    def verify(self, pwhash, password):
+        return self.pool.verify(pwhash, password)
+    
+    def needs_rehash(self, pwhash):
+        return self.pool.needs_rehash(pwhash)
@@ -0,0 +1,98 @@
+"""
+Dependency checks behind the readiness probe
+
+Each check runs on a small shared thread pool so a hung database or cache
+cannot hold the probe past HEALTH_CHECK_TIMEOUT. Results are cached per app
+for HEALTH_CACHE_TTL seconds, so frequent probes from several load balancers
+cost at most one round of checks per window and worker.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='health-check')
+
+
+def check_database(engine):
+    """Run ``SELECT 1`` on a pooled connection of ``engine``"""
+    def check():
+        with engine.connect() as connection:
+            connection.execute(text('SELECT 1'))
+    return check
+
+
+def check_cache(backend):
+    """Ping the cache backend"""
+    def check():
+        if not backend.ping():
+            raise RuntimeError('ping failed')
+    return check
+
+
+def _timed(check):
+    start = time.perf_counter()
+    check()
+    return (time.perf_counter() - start) * 1000
+
+
+def run_checks(checks, timeout):
+    """Run ``{name: callable}`` concurrently and report status and latency of each"""
+    start = time.perf_counter()
+    futures = {name: _executor.submit(_timed, check) for name, check in checks.items()}
+    results = {}
+    for name, future in futures.items():
+        remaining = max(timeout - (time.perf_counter() - start), 0)
+        try:
+            latency = future.result(timeout=remaining)
+            results[name] = {'status': 'ok', 'latency_ms': round(latency, 2)}
+        except FutureTimeout:
+            future.cancel()
+            results[name] = {'status': 'timeout', 'latency_ms': round(timeout * 1000, 2)}
+        except Exception as e:
+            results[name] = {
+                'status': 'error',
+                'latency_ms': round((time.perf_counter() - start) * 1000, 2),
+                'error': str(e)
+            }
+    return results
+
+
+class Readiness:
+    """Readiness state of one app, refreshed at most once per ``ttl`` seconds"""
+    
+    def __init__(self, ttl, timeout):
+        self.ttl = ttl
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._expires = 0.0
+        self._report = None
+    
+    def report(self, checks):
+        """Return ``(ready, report)``, running ``checks()`` when the cached report is stale"""
+        with self._lock:
+            now = time.monotonic()
+            if self._report is not None and now < self._expires:
+                return self._report['status'] == 'ready', dict(self._report, cached=True)
+            
+            results = run_checks(checks(), self.timeout)
+            ready = all(result['status'] == 'ok' for result in results.values())
+            self._report = {
+                'status': 'ready' if ready else 'unavailable',
+                'checked_at': datetime.now(timezone.utc).isoformat(),
+                'checks': results
+            }
+            self._expires = time.monotonic() + self.ttl
+            return ready, dict(self._report, cached=False)
+
+
+def readiness(app):
+    """The Readiness instance of ``app``, created on first use"""
+    state = app.extensions.get('readiness')
+    if state is None:
+        state = app.extensions['readiness'] = Readiness(
+            app.config.get('HEALTH_CACHE_TTL', 2.0), app.config.get('HEALTH_CHECK_TIMEOUT', 2.0)
+        )
+    return state
@@ -0,0 +1,187 @@
+"""
+Request timing and SQL instrumentation
+
+Records per-endpoint latency histograms plus SQL statement counts and time
+per request (from ``before_cursor_execute``/``after_cursor_execute``), adds a
+``Server-Timing`` header to every response and renders the aggregates in the
+Prometheus text exposition format.
+"""
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from utils.pool import pool_status
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# ``[statements, seconds]`` of the async request running in this context
+_async_sql = ContextVar('async_sql', default=None)
+
+
+class Histogram:
+    """Cumulative histogram with fixed upper bounds"""
+    
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+    
+    def observe(self, value):
+        self.total += value
+        self.count += 1
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+
+
+class Metrics:
+    """Thread-safe in-process metrics registry for one app"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = defaultdict(Histogram)
+        self.requests = defaultdict(int)
+        self.sql_statements = defaultdict(int)
+        self.sql_seconds = defaultdict(float)
+    
+    def record(self, endpoint, method, status, duration, statements, sql_seconds):
+        with self._lock:
+            self.latency[(endpoint, method)].observe(duration)
+            self.requests[(endpoint, method, status)] += 1
+            self.sql_statements[endpoint] += statements
+            self.sql_seconds[endpoint] += sql_seconds
+    
+    def render(self, engines=None):
+        """Prometheus text exposition of every metric"""
+        lines = []
+        with self._lock:
+            lines.append('# HELP http_request_duration_seconds Request latency by endpoint')
+            lines.append('# TYPE http_request_duration_seconds histogram')
+            for (endpoint, method), histogram in sorted(self.latency.items()):
+                labels = f'endpoint="{endpoint}",method="{method}"'
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f'http_request_duration_seconds_sum{{{labels}}} {histogram.total:.6f}')
+                lines.append(f'http_request_duration_seconds_count{{{labels}}} {histogram.count}')
+            
+            lines.append('# HELP http_requests_total Requests by endpoint and status')
+            lines.append('# TYPE http_requests_total counter')
+            for (endpoint, method, status), count in sorted(self.requests.items()):
+                lines.append(f'http_requests_total{{endpoint="{endpoint}",method="{method}",status="{status}"}} {count}')
+            
+            lines.append('# HELP db_statements_total SQL statements executed by endpoint')
+            lines.append('# TYPE db_statements_total counter')
+            for endpoint, count in sorted(self.sql_statements.items()):
+                lines.append(f'db_statements_total{{endpoint="{endpoint}"}} {count}')
+            
+            lines.append('# HELP db_query_seconds_total Time spent in SQL by endpoint')
+            lines.append('# TYPE db_query_seconds_total counter')
+            for endpoint, seconds in sorted(self.sql_seconds.items()):
+                lines.append(f'db_query_seconds_total{{endpoint="{endpoint}"}} {seconds:.6f}')
+        
+        if engines:
+            gauges = (('checked_out', 'Connections in use'), ('checked_in', 'Idle connections'),
+                      ('overflow', 'Overflow connections open'))
+            for key, description in gauges:
+                lines.append(f'# HELP db_pool_{key} {description}')
+                lines.append(f'# TYPE db_pool_{key} gauge')
+                for name, engine in engines.items():
+                    status = pool_status(engine)
+                    if key in status:
+                        lines.append(f'db_pool_{key}{{engine="{name}"}} {status[key]}')
+        return '\n'.join(lines) + '\n'
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info['query_started'] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop('query_started', None)
+    if started is None:
+        return
+    if has_request_context() and 'request_started' in g:
+        g.sql_statements += 1
+        g.sql_seconds += time.perf_counter() - started
+        return
+    totals = _async_sql.get()
+    if totals is not None:
+        totals[0] += 1
+        totals[1] += time.perf_counter() - started
+
+
+class AsyncRequestTimer:
+    """Request timing for handlers served outside Flask's request hooks
+    
+    Create it in the task running the handler (SQL statements are counted
+    through a context variable), then ``finish`` with the response.
+    """
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql = [0, 0.0]
+        self._token = _async_sql.set(self.sql)
+    
+    def finish(self, endpoint, method, response):
+        """Add Server-Timing to ``response`` and record it in the app's metrics"""
+        _async_sql.reset(self._token)
+        elapsed = time.perf_counter() - self.started
+        statements, sql_seconds = self.sql
+        response.headers.append(
+            'Server-Timing',
+            f'app;dur={elapsed * 1000:.1f}, db;dur={sql_seconds * 1000:.1f};desc="{statements} queries"'
+        )
+        current_app.extensions['metrics'].record(
+            endpoint, method, response.status_code, elapsed, statements, sql_seconds
+        )
+        return response
+
+
+def _before_request():
+    g.request_started = time.perf_counter()
+    g.sql_statements = 0
+    g.sql_seconds = 0.0
+
+
+def _after_request(response):
+    if 'request_started' in g:
+        elapsed_ms = (time.perf_counter() - g.request_started) * 1000
+        response.headers.add(
+            'Server-Timing',
+            f'app;dur={elapsed_ms:.1f}, db;dur={g.sql_seconds * 1000:.1f};desc="{g.sql_statements} queries"'
+        )
+        g.response_status = response.status_code
+    return response
+
+
+def _teardown_request(exc):
+    # Runs after streamed bodies are fully sent, so their queries count too
+    if 'request_started' not in g:
+        return
+    status = 500 if exc is not None else g.get('response_status', 500)
+    current_app.extensions['metrics'].record(
+        request.endpoint or 'unmatched', request.method, status,
+        time.perf_counter() - g.request_started, g.sql_statements, g.sql_seconds
+    )
+
+
+def init_app(app):
+    """Install request hooks and SQL listeners for ``app``"""
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+    app.extensions['metrics'] = Metrics()
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    
+    for name, listener in (('before_cursor_execute', _before_cursor_execute),
+                           ('after_cursor_execute', _after_cursor_execute)):
+        if not event.contains(Engine, name, listener):
+            event.listen(Engine, name, listener)
@@ -0,0 +1,354 @@
+"""
+Background jobs
+
+Functions registered with ``@jobs.task()`` can be queued with
+``task.delay(*args, **kwargs)`` and run outside the request, each in its own
+app context. Failed jobs are retried with exponential backoff and moved to
+a dead-letter list once their retries are used up. Arguments must be JSON
+serializable (ids, not model instances).
+
+Backends, selected by JOBS_BACKEND:
+
+* ``thread`` - in-process worker threads, for development
+* ``redis``  - a redis list drained by ``python manage.py run-worker``
+* ``eager``  - runs jobs inline when queued, for tests
+"""
+import heapq
+import itertools
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import deque
+
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+
+class Task:
+    """A registered job function"""
+    
+    def __init__(self, queue, name, func, max_retries=None, backoff=None):
+        self.queue = queue
+        self.name = name
+        self.func = func
+        self.max_retries = max_retries
+        self.backoff = backoff
+    
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+    
+    def delay(self, *args, **kwargs):
+        """Queue a run of this task and return the job id"""
+        return self.queue.enqueue(self.name, *args, **kwargs)
+
+
+def new_job(task_name, args, kwargs):
+    return {
+        'id': uuid.uuid4().hex,
+        'task': task_name,
+        'args': list(args),
+        'kwargs': kwargs,
+        'attempts': 0,
+        'enqueued_at': time.time()
+    }
+
+
+class JobBackend:
+    """Interface implemented by every job backend"""
+    
+    def __init__(self, app, tasks, dead_letter_max=1000):
+        self.app = app
+        self.tasks = tasks
+        self.max_retries = app.config.get('JOBS_MAX_RETRIES', 3)
+        self.backoff = app.config.get('JOBS_RETRY_BACKOFF', 1.0)
+        self.dead_letter_max = dead_letter_max
+    
+    def push(self, job, delay=0):
+        """Queue ``job`` to run in ``delay`` seconds"""
+        raise NotImplementedError
+    
+    def dead_letters(self):
+        """Jobs that failed on every attempt, most recent first"""
+        raise NotImplementedError
+    
+    def bury(self, job):
+        raise NotImplementedError
+    
+    def execute(self, job):
+        """Run ``job`` once; retry it later or bury it when it fails"""
+        task = self.tasks.get(job['task'])
+        job['attempts'] += 1
+        if task is None:
+            job['error'] = f"Unknown task: {job['task']}"
+            self.bury(job)
+            return False
+        
+        try:
+            with self.app.app_context():
+                task.func(*job['args'], **job['kwargs'])
+            return True
+        except Exception as e:
+            job['error'] = f'{type(e).__name__}: {e}'
+        
+        max_retries = self.max_retries if task.max_retries is None else task.max_retries
+        if job['attempts'] > max_retries:
+            logger.error('Job %s (%s) failed permanently: %s', job['id'], job['task'], job['error'])
+            self.bury(job)
+        else:
+            backoff = self.backoff if task.backoff is None else task.backoff
+            delay = backoff * 2 ** (job['attempts'] - 1)
+            logger.warning('Job %s (%s) failed, retrying in %.1fs: %s',
+                           job['id'], job['task'], delay, job['error'])
+            self.push(job, delay)
+        return False
+
+
+class EagerBackend(JobBackend):
+    """Run jobs inline as soon as they are queued; retries do not sleep"""
+    
+    def __init__(self, app, tasks, dead_letter_max=1000):
+        super().__init__(app, tasks, dead_letter_max)
+        self._dead = deque(maxlen=dead_letter_max)
+        self._retries = deque()
+        self._running = False
+    
+    def push(self, job, delay=0):
+        self._retries.append(job)
+        if self._running:
+            return
+        self._running = True
+        try:
+            while self._retries:
+                self.execute(self._retries.popleft())
+        finally:
+            self._running = False
+    
+    def bury(self, job):
+        self._dead.appendleft(job)
+    
+    def dead_letters(self):
+        return list(self._dead)
+
+
+class ThreadBackend(JobBackend):
+    """In-process worker threads fed from a delay-ordered heap"""
+    
+    def __init__(self, app, tasks, workers=2, dead_letter_max=1000):
+        super().__init__(app, tasks, dead_letter_max)
+        self.workers = max(workers, 1)
+        self._dead = deque(maxlen=dead_letter_max)
+        self._heap = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._active = 0
+        self._pid = None
+    
+    def _ensure_workers(self):
+        # Threads do not survive fork; start them lazily in each process
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        for index in range(self.workers):
+            threading.Thread(target=self._work, name=f'job-worker-{index}', daemon=True).start()
+    
+    def push(self, job, delay=0):
+        with self._condition:
+            self._ensure_workers()
+            heapq.heappush(self._heap, (time.monotonic() + delay, next(self._sequence), job))
+            self._condition.notify()
+    
+    def _next(self):
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                if self._heap and self._heap[0][0] <= now:
+                    self._active += 1
+                    return heapq.heappop(self._heap)[2]
+                timeout = self._heap[0][0] - now if self._heap else None
+                self._condition.wait(timeout)
+    
+    def _work(self):
+        while True:
+            job = self._next()
+            try:
+                self.execute(job)
+            finally:
+                with self._condition:
+                    self._active -= 1
+                    self._condition.notify_all()
+    
+    def join(self, timeout=None):
+        """Wait until no job is queued or running; True unless ``timeout`` expired"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._heap or self._active:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+    
+    def bury(self, job):
+        self._dead.appendleft(job)
+    
+    def dead_letters(self):
+        return list(self._dead)
+
+
+class RedisBackend(JobBackend):
+    """Jobs stored in redis: a ready list, a delayed sorted set and a dead-letter list
+    
+    Workers move each job atomically from the ready list onto a processing
+    list of their own and only drop it there once it has run, so a worker
+    that dies mid-job leaves it behind instead of losing it. Every worker
+    keeps a heartbeat key alive while it runs; the processing lists of
+    workers whose heartbeat expired are pushed back onto the ready list, so
+    a job runs at least once (twice if its worker dies right after running it).
+    """
+    
+    def __init__(self, app, tasks, url, prefix='jobs:', dead_letter_max=1000, heartbeat_ttl=30):
+        super().__init__(app, tasks, dead_letter_max)
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.ready_key = prefix + 'ready'
+        self.delayed_key = prefix + 'delayed'
+        self.dead_key = prefix + 'dead'
+        self.heartbeat_ttl = heartbeat_ttl
+    
+    def push(self, job, delay=0):
+        payload = json.dumps(job)
+        if delay > 0:
+            self.client.zadd(self.delayed_key, {payload: time.time() + delay})
+        else:
+            self.client.lpush(self.ready_key, payload)
+    
+    def _promote_due(self):
+        """Move delayed jobs whose time has come onto the ready list"""
+        for payload in self.client.zrangebyscore(self.delayed_key, 0, time.time(), start=0, num=100):
+            # Only the worker that removes the entry requeues it
+            if self.client.zrem(self.delayed_key, payload):
+                self.client.lpush(self.ready_key, payload)
+    
+    def _processing_key(self, worker_id):
+        return f'{self.prefix}processing:{worker_id}'
+    
+    def _heartbeat_key(self, worker_id):
+        return f'{self.prefix}worker:{worker_id}'
+    
+    def requeue_orphans(self):
+        """Push jobs held by workers without a heartbeat back onto the ready list"""
+        requeued = 0
+        prefix = self._processing_key('')
+        for key in self.client.scan_iter(match=prefix + '*'):
+            worker_id = key.decode()[len(prefix):]
+            if self.client.exists(self._heartbeat_key(worker_id)):
+                continue
+            while self.client.lmove(key, self.ready_key, 'RIGHT', 'RIGHT') is not None:
+                requeued += 1
+        if requeued:
+            logger.warning('Requeued %d job(s) from stopped workers', requeued)
+        return requeued
+    
+    def _beat(self, worker_id, stop):
+        while not stop.wait(self.heartbeat_ttl / 3):
+            self.client.set(self._heartbeat_key(worker_id), 1, ex=self.heartbeat_ttl)
+    
+    def work(self, poll_interval=1.0, stop=None):
+        """Run jobs until ``stop`` (a threading.Event) is set"""
+        worker_id = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        processing_key = self._processing_key(worker_id)
+        heartbeat_key = self._heartbeat_key(worker_id)
+        self.client.set(heartbeat_key, 1, ex=self.heartbeat_ttl)
+        # A separate thread, so a long job does not look like a dead worker
+        beating = threading.Event()
+        threading.Thread(target=self._beat, args=(worker_id, beating), daemon=True).start()
+        
+        next_recovery = 0
+        try:
+            while stop is None or not stop.is_set():
+                if time.monotonic() >= next_recovery:
+                    self.requeue_orphans()
+                    next_recovery = time.monotonic() + self.heartbeat_ttl
+                self._promote_due()
+                payload = self.client.blmove(self.ready_key, processing_key, poll_interval, 'RIGHT', 'LEFT')
+                if payload is None:
+                    continue
+                try:
+                    self.execute(json.loads(payload))
+                finally:
+                    # Retries and burials were pushed by execute; the job is done here
+                    self.client.lrem(processing_key, 1, payload)
+        finally:
+            beating.set()
+            self.client.delete(heartbeat_key)
+    
+    def bury(self, job):
+        with self.client.pipeline() as pipe:
+            pipe.lpush(self.dead_key, json.dumps(job))
+            pipe.ltrim(self.dead_key, 0, self.dead_letter_max - 1)
+            pipe.execute()
+    
+    def dead_letters(self):
+        return [json.loads(payload) for payload in self.client.lrange(self.dead_key, 0, -1)]
+
+
+def create_backend(app, tasks):
+    """Build the backend selected by JOBS_BACKEND"""
+    config = app.config
+    name = config.get('JOBS_BACKEND', 'thread')
+    dead_letter_max = config.get('JOBS_DEAD_LETTER_MAX', 1000)
+    
+    if name == 'thread':
+        return ThreadBackend(app, tasks, config.get('JOBS_WORKERS', 2), dead_letter_max)
+    if name == 'eager':
+        return EagerBackend(app, tasks, dead_letter_max)
+    if name == 'redis':
+        return RedisBackend(
+            app, tasks, config.get('JOBS_REDIS_URL', 'redis://localhost:6379/0'),
+            config.get('JOBS_KEY_PREFIX', 'jobs:'), dead_letter_max
+        )
+    raise ValueError(f'Unknown jobs backend: {name}')
+
+
+class JobQueue:
+    """Flask extension holding the task registry and the configured backend"""
+    
+    def __init__(self, app=None):
+        self.tasks = {}
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        app.extensions['jobs'] = create_backend(app, self.tasks)
+    
+    def task(self, name=None, max_retries=None, backoff=None):
+        """Register the decorated function as a task
+        
+        ``max_retries`` and ``backoff`` (seconds before the first retry,
+        doubled on each following one) default to JOBS_MAX_RETRIES and
+        JOBS_RETRY_BACKOFF.
+        """
+        def decorator(func):
+            task = Task(self, name or func.__name__, func, max_retries, backoff)
+            self.tasks[task.name] = task
+            return task
+        return decorator
+    
+    @property
+    def backend(self):
+        return current_app.extensions['jobs']
+    
+    def enqueue(self, task_name, *args, **kwargs):
+        """Queue a run of the named task and return the job id"""
+        job = new_job(task_name, args, kwargs)
+        self.backend.push(job)
+        return job['id']
+    
+    def dead_letters(self):
+        return self.backend.dead_letters()
@@ -0,0 +1,38 @@
+"""
+Lazy ``flask db`` commands
+
+Flask-Migrate imports alembic, which costs more at startup than the rest of
+the app's dependencies besides SQLAlchemy. Only the ``flask db`` commands
+need it, so a placeholder group is registered instead and Flask-Migrate is
+imported and initialised the first time one of its commands is looked up.
+"""
+import click
+from flask import current_app
+
+
+class MigrateGroup(click.Group):
+    """The ``db`` command group, loading Flask-Migrate on first use"""
+    
+    def __init__(self, db, **kwargs):
+        super().__init__(**kwargs)
+        self.db = db
+    
+    def _commands(self):
+        from flask_migrate import Migrate
+        from flask_migrate.cli import db as commands
+        
+        app = current_app._get_current_object()
+        if 'migrate' not in app.extensions:
+            Migrate(app, self.db)
+        return commands
+    
+    def list_commands(self, ctx):
+        return self._commands().list_commands(ctx)
+    
+    def get_command(self, ctx, name):
+        return self._commands().get_command(ctx, name)
+
+
+def init_app(app, db):
+    """Register the lazy ``flask db`` group on ``app``"""
+    app.cli.add_command(MigrateGroup(db, name='db', help='Perform database migrations.'))
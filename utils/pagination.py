@@ -0,0 +1,176 @@
+"""
+Keyset (cursor) pagination helpers
+
+Pages are addressed by an opaque cursor that encodes the sort key values of
+the last row returned, so fetching page N costs the same index seek as
+fetching page one (unlike OFFSET, which has to walk every skipped row).
+The cursor also records the sort order it was issued for, and is rejected
+when it comes back with another one.
+"""
+import base64
+import binascii
+import json
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app, request
+from sqlalchemy import and_, or_
+
+from utils.query_args import QueryArgumentError
+
+
+class PaginationError(QueryArgumentError):
+    """Raised when pagination arguments or cursors are invalid"""
+
+
+def sort_spec(columns, descending=True):
+    """Identify a keyset ordering, e.g. ``-created_at,id``
+    
+    Computed expressions (such as search scores) have no name and show up
+    as ``*``.
+    """
+    keys = ','.join(getattr(column, 'key', None) or '*' for column in columns)
+    return f'-{keys}' if descending else keys
+
+
+def encode_cursor(values, sort):
+    """Encode keyset values and the ``sort_spec`` they belong to into an opaque URL-safe cursor"""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps({'sort': sort, 'after': payload}, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, columns, sort):
+    """Decode a cursor back into values typed after the given columns
+    
+    Raises PaginationError unless the cursor was issued for the ``sort``
+    ordering; its values mean nothing under another one.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (binascii.Error, UnicodeError, ValueError):
+        raise PaginationError('Invalid cursor')
+    
+    if not isinstance(payload, dict) or not isinstance(payload.get('after'), list):
+        raise PaginationError('Invalid cursor')
+    if payload.get('sort') != sort:
+        raise PaginationError('Cursor was issued for a different sort order')
+    values = payload['after']
+    if len(values) != len(columns):
+        raise PaginationError('Invalid cursor')
+    
+    decoded = []
+    for column, value in zip(columns, values):
+        try:
+            if column.type.python_type is datetime:
+                value = datetime.fromisoformat(value)
+            else:
+                value = column.type.python_type(value)
+        except (TypeError, ValueError):
+            raise PaginationError('Invalid cursor')
+        decoded.append(value)
+    return decoded
+
+
+def parse_page_args(args=None):
+    """Read ``limit`` and ``cursor`` from the query string"""
+    args = request.args if args is None else args
+    default_size = current_app.config.get('API_DEFAULT_PAGE_SIZE', 20)
+    max_size = current_app.config.get('API_MAX_PAGE_SIZE', 100)
+    
+    try:
+        limit = int(args.get('limit', default_size))
+    except ValueError:
+        raise PaginationError('limit must be an integer')
+    if limit < 1:
+        raise PaginationError('limit must be positive')
+    
+    return min(limit, max_size), args.get('cursor') or None
+
+
+def _after(columns, values, descending):
+    """Build the row-value predicate ``(c1, c2, ...) < (v1, v2, ...)``
+    
+    The leading ``c1 <= v1`` bound is redundant but lets the planner turn the
+    predicate into an index range seek instead of scanning from the start.
+    """
+    column, value = columns[0], values[0]
+    beyond = column < value if descending else column > value
+    if len(columns) == 1:
+        return beyond
+    bound = column <= value if descending else column >= value
+    return and_(bound, or_(beyond, and_(column == value, _after(columns[1:], values[1:], descending))))
+
+
+def ordering(columns, descending=True):
+    """ORDER BY clauses matching keyset pagination over ``columns``"""
+    return [column.desc() if descending else column.asc() for column in columns]
+
+
+def page_query(query, columns, limit, cursor=None, descending=True):
+    """Restrict ``query`` (a Query or a Select) to one page plus one look-ahead row"""
+    if cursor:
+        values = decode_cursor(cursor, columns, sort_spec(columns, descending))
+        query = query.filter(_after(columns, values, descending))
+    return query.order_by(*ordering(columns, descending)).limit(limit + 1)
+
+
+def finish_page(rows, columns, limit, key=None, descending=True):
+    """Split the rows fetched by ``page_query`` into ``(rows, next_cursor)``"""
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        values = key(last) if key else [getattr(last, column.key) for column in columns]
+        next_cursor = encode_cursor(values, sort_spec(columns, descending))
+    return rows, next_cursor
+
+
+def keyset_paginate(query, columns, limit, cursor=None, descending=True, key=None):
+    """Return ``(rows, next_cursor)`` for one page of ``query``
+
+    ``columns`` must end with a unique column (normally the primary key) so
+    the ordering is total and no row is skipped or repeated across pages.
+    ``key`` returns the sort values of a row when they are not plain
+    attributes named after the columns, e.g. for computed scores.
+    """
+    rows = page_query(query, columns, limit, cursor, descending).all()
+    return finish_page(rows, columns, limit, key, descending)
+
+
+_count_lock = threading.Lock()
+
+
+def _cached_total(key):
+    with _count_lock:
+        entry = current_app.extensions.setdefault('count_cache', {}).get(key)
+        if entry and entry[1] > time.monotonic():
+            return entry[0]
+    return None
+
+
+def _store_total(key, total):
+    ttl = current_app.config.get('API_TOTAL_COUNT_TTL', 30)
+    with _count_lock:
+        current_app.extensions.setdefault('count_cache', {})[key] = (total, time.monotonic() + ttl)
+    return total
+
+
+def cached_count(key, query):
+    """Return ``query.count()``, cached per key for API_TOTAL_COUNT_TTL seconds"""
+    total = _cached_total(key)
+    return _store_total(key, query.count()) if total is None else total
+
+
+async def cached_count_async(key, session, statement):
+    """``cached_count`` for an AsyncSession and a ``select(func.count())`` statement"""
+    total = _cached_total(key)
+    return _store_total(key, await session.scalar(statement)) if total is None else total
+
+
+def wants_total(args=None):
+    """Whether the client asked for the (separately cached) total row count"""
+    args = request.args if args is None else args
+    return args.get('include_total', '').lower() in ('1', 'true', 'yes')
@@ -0,0 +1,118 @@
+"""
+Connection pool configuration and health metrics
+
+``TimedQueuePool`` is a drop-in QueuePool that records how long checkouts
+wait for a connection, so pool_size/max_overflow can be sized from data
+instead of guessed.
+"""
+import threading
+import time
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+
+class PoolStats:
+    """Thread-safe checkout counters for one pool"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+    
+    def record(self, waited, timed_out=False):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+            if timed_out:
+                self.timeouts += 1
+    
+    def snapshot(self):
+        with self._lock:
+            return {
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'wait_seconds_total': round(self.wait_seconds_total, 6),
+                'wait_seconds_max': round(self.wait_seconds_max, 6),
+                'wait_seconds_avg': round(self.wait_seconds_total / self.checkouts, 6) if self.checkouts else 0.0
+            }
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records checkout wait times and timeouts"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+    
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.stats.record(time.perf_counter() - started, timed_out=True)
+            raise
+        self.stats.record(time.perf_counter() - started)
+        return connection
+
+
+def build_engine_options(uri, pool_size=5, max_overflow=10, pool_timeout=30,
+                         pool_recycle=1800, pool_pre_ping=True, statement_timeout_ms=None):
+    """SQLALCHEMY_ENGINE_OPTIONS suited to the database behind ``uri``
+    
+    In-memory SQLite keeps Flask-SQLAlchemy's single shared connection; every
+    other database gets a TimedQueuePool sized by the arguments. PostgreSQL
+    connections also get a server-side ``statement_timeout``.
+    """
+    if not uri:
+        return {}
+    url = make_url(uri)
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        return {}
+    
+    options = {
+        'poolclass': TimedQueuePool,
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'pool_timeout': pool_timeout,
+        'pool_recycle': pool_recycle,
+        'pool_pre_ping': pool_pre_ping
+    }
+    if url.get_backend_name() == 'postgresql' and statement_timeout_ms:
+        options['connect_args'] = {'options': f'-c statement_timeout={int(statement_timeout_ms)}'}
+    return options
+
+
+def pool_status(engine):
+    """Current occupancy and checkout statistics of ``engine``'s pool"""
+    pool = engine.pool
+    status = {'pool': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow()
+        )
+    if isinstance(pool, TimedQueuePool):
+        status.update(pool.stats.snapshot())
+    return status
+
+
+def dispose_pools(app, db):
+    """Drop the pooled connections ``app`` inherited from a parent process
+    
+    Call in each worker right after fork (gunicorn ``post_fork`` with
+    ``preload_app``). ``close=False`` leaves the sockets to the parent, which
+    still owns them; the worker opens its own connections on first use.
+    """
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+    replicas = app.extensions.get('replicas')
+    if replicas:
+        replicas.dispose(close=False)
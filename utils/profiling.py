@@ -0,0 +1,125 @@
+"""
+Opt-in per-request profiling
+
+When PROFILER_ENABLED is set, a request from one of PROFILER_ALLOWED_IPS that
+sends ``X-Profile: cprofile`` (or ``sample``), or ``?_profile=cprofile``, runs
+under a profiler. The result is written to PROFILER_DIR and named in the
+``X-Profile-File`` response header:
+
+* ``cprofile`` - deterministic cProfile output, loadable with ``pstats``
+* ``sample``   - a wall-clock sampling profile as collapsed stacks, ready
+  for ``flamegraph.pl`` or speedscope
+
+Add ``_profile_download=1`` to receive the profile instead of the response
+body. With profiling disabled no hooks are installed at all.
+"""
+import cProfile
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from flask import current_app, g, request, send_file
+
+MODES = ('cprofile', 'sample')
+
+
+class SamplingProfiler:
+    """Sample one thread's call stack at a fixed interval"""
+    
+    def __init__(self, thread_id, interval=0.001):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def _sample(self):
+        frame = sys._current_frames().get(self.thread_id)
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+            frame = frame.f_back
+        if stack:
+            self.samples[';'.join(reversed(stack))] += 1
+    
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+    
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='request-sampler', daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+    
+    def dump(self, path):
+        """Write collapsed stacks, one ``frame;frame;frame count`` per line"""
+        with open(path, 'w') as handle:
+            for stack, count in self.samples.most_common():
+                handle.write(f'{stack} {count}\n')
+
+
+def _requested_mode():
+    mode = request.headers.get('X-Profile') or request.args.get('_profile')
+    if not mode:
+        return None
+    mode = mode.lower()
+    if mode in ('1', 'true'):
+        return 'cprofile'
+    return mode if mode in MODES else None
+
+
+def _start_profiling():
+    mode = _requested_mode()
+    if mode is None or request.remote_addr not in current_app.config.get('PROFILER_ALLOWED_IPS', ()):
+        return
+    
+    if mode == 'cprofile':
+        profiler = cProfile.Profile()
+        profiler.enable()
+    else:
+        profiler = SamplingProfiler(
+            threading.get_ident(), current_app.config.get('PROFILER_SAMPLE_INTERVAL', 0.001)
+        )
+        profiler.start()
+    g.profiler = (mode, profiler)
+
+
+def _stop_profiling(response):
+    if 'profiler' not in g:
+        return response
+    mode, profiler = g.pop('profiler')
+    if mode == 'cprofile':
+        profiler.disable()
+    else:
+        profiler.stop()
+    
+    directory = current_app.config.get('PROFILER_DIR', 'profiles')
+    os.makedirs(directory, exist_ok=True)
+    endpoint = (request.endpoint or 'unmatched').replace('.', '-')
+    extension = 'prof' if mode == 'cprofile' else 'folded'
+    filename = f'{time.strftime("%Y%m%dT%H%M%S")}-{endpoint}-{uuid.uuid4().hex[:8]}.{extension}'
+    path = os.path.join(directory, filename)
+    if mode == 'cprofile':
+        profiler.dump_stats(path)
+    else:
+        profiler.dump(path)
+    
+    if request.args.get('_profile_download'):
+        response = send_file(os.path.abspath(path), as_attachment=True, download_name=filename)
+    response.headers['X-Profile-File'] = filename
+    return response
+
+
+def init_app(app):
+    """Install the profiling hooks when PROFILER_ENABLED is set"""
+    if not app.config.get('PROFILER_ENABLED', False):
+        return
+    app.before_request(_start_profiling)
+    app.after_request(_stop_profiling)
@@ -0,0 +1,92 @@
+"""
+Whitelisted filtering, sorting and sparse fieldsets for list endpoints
+
+Only parameters declared by the endpoint are honoured; anything else in the
+query string is ignored, and malformed values raise QueryArgumentError so
+the endpoint can answer 400.
+"""
+import operator
+from collections import namedtuple
+from datetime import datetime
+
+from flask import request
+
+Filter = namedtuple('Filter', 'param column op parser')
+
+
+class QueryArgumentError(ValueError):
+    """Raised when a list endpoint query parameter is invalid"""
+
+
+def parse_bool(value):
+    lowered = value.lower()
+    if lowered in ('1', 'true', 'yes'):
+        return True
+    if lowered in ('0', 'false', 'no'):
+        return False
+    raise ValueError(value)
+
+
+def parse_datetime(value):
+    return datetime.fromisoformat(value)
+
+
+def equals(param, column, parser):
+    return Filter(param, column, operator.eq, parser)
+
+
+def created_range(model):
+    """``created_after`` (inclusive) / ``created_before`` (exclusive) filters"""
+    return (
+        Filter('created_after', model.created_at, operator.ge, parse_datetime),
+        Filter('created_before', model.created_at, operator.lt, parse_datetime),
+    )
+
+
+def parse_filters(filters, args=None):
+    """Return ``(clauses, applied)`` for the filters present in the request
+    
+    ``applied`` is a canonical string of the filter arguments, suitable as
+    part of a cache key. ``args`` defaults to the Flask request's query string.
+    """
+    args = request.args if args is None else args
+    clauses = []
+    applied = []
+    for spec in filters:
+        raw = args.get(spec.param)
+        if raw is None:
+            continue
+        try:
+            value = spec.parser(raw)
+        except ValueError:
+            raise QueryArgumentError(f'Invalid value for {spec.param}')
+        clauses.append(spec.op(spec.column, value))
+        applied.append(f'{spec.param}={raw}')
+    return clauses, '&'.join(applied)
+
+
+def parse_sort(model, allowed, default='-created_at', args=None):
+    """Return ``(columns, descending)`` for the ``sort`` parameter
+    
+    ``sort=created_at`` sorts ascending, ``sort=-created_at`` descending. The
+    primary key is always appended as a tie breaker for keyset pagination.
+    """
+    sort = (request.args if args is None else args).get('sort', default)
+    descending = sort.startswith('-')
+    key = sort.lstrip('-')
+    if key not in allowed:
+        raise QueryArgumentError(f'Cannot sort by {key}')
+    return (getattr(model, key), model.id), descending
+
+
+def parse_fields(allowed, args=None):
+    """Return the requested sparse fieldset as a tuple, or None for all fields"""
+    raw = (request.args if args is None else args).get('fields')
+    if not raw:
+        return None
+    fields = tuple(dict.fromkeys(field.strip() for field in raw.split(',') if field.strip()))
+    unknown = [field for field in fields if field not in allowed]
+    if unknown or not fields:
+        raise QueryArgumentError(f'Unknown fields: {", ".join(unknown)}')
+    return fields
+
@@ -0,0 +1,59 @@
+"""
+SQL statement counter built on SQLAlchemy engine events
+"""
+import time
+
+from sqlalchemy import event
+
+
+class QueryCounter:
+    """Record every SQL statement executed on ``engine`` while active
+    
+    Usage::
+    
+        with QueryCounter(db.engine) as counter:
+            client.get('/api/posts')
+        assert counter.count == 1
+    
+    ``durations`` holds the execution time of each statement in
+    milliseconds, in the same order as ``statements``.
+    """
+    
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+        self.parameters = []
+        self.durations = []
+        self._started = []
+    
+    @property
+    def count(self):
+        return len(self.statements)
+    
+    @property
+    def total_time(self):
+        """Milliseconds spent executing the recorded statements"""
+        return sum(self.durations)
+    
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+        self.parameters.append(parameters)
+        self._started.append(time.perf_counter())
+    
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self._started:
+            self.durations.append((time.perf_counter() - self._started.pop()) * 1000)
+    
+    def __enter__(self):
+        self.statements = []
+        self.parameters = []
+        self.durations = []
+        self._started = []
+        event.listen(self.engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(self.engine, 'after_cursor_execute', self._after_cursor_execute)
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        event.remove(self.engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.remove(self.engine, 'after_cursor_execute', self._after_cursor_execute)
+        return False
@@ -0,0 +1,119 @@
+"""
+Read replica routing
+
+``RoutingSession`` sends reads issued inside a read-only handler to a
+round-robin pool of replica engines, one replica per request. Everything else goes to the primary:
+flushes, INSERT/UPDATE/DELETE statements, and every statement after the
+first write of the request (so a handler always reads its own writes).
+"""
+import itertools
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import current_app
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine
+from sqlalchemy.sql.dml import UpdateBase
+
+from utils.pool import build_engine_options
+
+
+class ReplicaSet:
+    """Round-robin selection over replica engines"""
+    
+    def __init__(self, engines):
+        self.engines = list(engines)
+        self._cycle = itertools.cycle(self.engines)
+        self._lock = threading.Lock()
+    
+    def next(self):
+        with self._lock:
+            return next(self._cycle)
+    
+    def dispose(self, close=True):
+        for engine in self.engines:
+            engine.dispose(close=close)
+
+
+class RoutingSession(Session):
+    """Flask-SQLAlchemy session that can route reads to replicas"""
+    
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        primary = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        if bind is not None or primary is not self._db.engines.get(None):
+            return primary
+        
+        if self._flushing or isinstance(clause, UpdateBase):
+            self.info['wrote'] = True
+        if not self.info.get('use_replica') or self.info.get('wrote'):
+            return primary
+        
+        replicas = current_app.extensions.get('replicas')
+        if not replicas:
+            return primary
+        # Stick to one replica per request so related reads see one snapshot
+        if 'replica' not in self.info:
+            self.info['replica'] = replicas.next()
+        return self.info['replica']
+
+
+def read_from_replica(session):
+    """Whether ``session`` has read from a replica during this request
+    
+    Replicas lag the primary, so callers must not share what they read
+    there through the cache, where it would outlive the lag.
+    """
+    return 'replica' in session.info
+
+
+@contextmanager
+def replica_reads(session):
+    """Allow ``session`` to read from replicas inside the block"""
+    previous = session.info.get('use_replica', False)
+    session.info['use_replica'] = True
+    try:
+        yield session
+    finally:
+        session.info['use_replica'] = previous
+        session.info.pop('replica', None)
+
+
+def read_only(view):
+    """Mark a view as read-only so its queries may be served by a replica
+    
+    The flag stays set until the request is torn down, so streamed responses
+    that query after the view returns still read from the replica.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        current_app.extensions['sqlalchemy'].session.info['use_replica'] = True
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def init_replicas(app, db):
+    """Create replica engines from SQLALCHEMY_REPLICA_URIS"""
+    uris = app.config.get('SQLALCHEMY_REPLICA_URIS') or []
+    if not uris:
+        return
+    
+    engines = []
+    for uri in uris:
+        engine_options = build_engine_options(
+            uri,
+            pool_size=app.config.get('DB_POOL_SIZE', 5),
+            max_overflow=app.config.get('DB_MAX_OVERFLOW', 10),
+            pool_timeout=app.config.get('DB_POOL_TIMEOUT', 30),
+            pool_recycle=app.config.get('DB_POOL_RECYCLE', 1800),
+            pool_pre_ping=app.config.get('DB_POOL_PRE_PING', True),
+            statement_timeout_ms=app.config.get('DB_STATEMENT_TIMEOUT_MS')
+        )
+        engines.append(create_engine(uri, **engine_options))
+    app.extensions['replicas'] = ReplicaSet(engines)
+    
+    @app.teardown_request
+    def reset_routing(exc):
+        db.session.info.pop('use_replica', None)
+        db.session.info.pop('wrote', None)
+        db.session.info.pop('replica', None)
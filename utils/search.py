@@ -0,0 +1,121 @@
+"""
+Full-text search indexes maintained by the database
+
+On SQLite the indexed columns are mirrored into an FTS5 external-content
+table kept in sync by triggers; on PostgreSQL a weighted ``tsvector`` column
+is maintained by a trigger and covered by a GIN index. Either way matching
+is an inverted-index lookup instead of ``LIKE '%term%'`` over every row.
+"""
+import re
+
+from sqlalchemy import DDL, Float, column, event, func, literal_column, table
+
+from utils.query_args import QueryArgumentError
+
+_WORD = re.compile(r'\w+\*?', re.UNICODE)
+
+
+def fts5_query(terms):
+    """Quote each word of ``terms`` so user input cannot use FTS5 syntax
+
+    Words are ANDed; a trailing ``*`` keeps prefix matching.
+    """
+    words = _WORD.findall(terms or '')
+    if not words:
+        raise QueryArgumentError('q must contain at least one word')
+    return ' '.join(
+        f'"{word[:-1]}"*' if word.endswith('*') else f'"{word}"' for word in words
+    )
+
+
+class FullTextIndex:
+    """Full-text index over ``columns`` of ``table``, ranked with per-column ``weights``"""
+    
+    def __init__(self, table, columns, weights, language='english'):
+        self.table = table
+        self.columns = columns
+        self.weights = weights
+        self.language = language
+        self.fts_table = f'{table}_fts'
+    
+    def _tsvector(self, row):
+        labels = 'ABCD'
+        return ' || '.join(
+            f"setweight(to_tsvector('{self.language}', coalesce({row}.{column}, '')), '{labels[index]}')"
+            for index, column in enumerate(self.columns)
+        )
+    
+    def create_ddl(self, dialect):
+        """Statements creating the index, its triggers and storage"""
+        columns = ', '.join(self.columns)
+        if dialect == 'sqlite':
+            new = ', '.join(f'new.{column}' for column in self.columns)
+            old = ', '.join(f'old.{column}' for column in self.columns)
+            insert = f'INSERT INTO {self.fts_table}(rowid, {columns}) VALUES (new.id, {new});'
+            delete = (
+                f"INSERT INTO {self.fts_table}({self.fts_table}, rowid, {columns}) "
+                f"VALUES ('delete', old.id, {old});"
+            )
+            return [
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.fts_table} USING fts5("
+                f"{columns}, content='{self.table}', content_rowid='id', "
+                f"tokenize='unicode61 remove_diacritics 2')",
+                f'CREATE TRIGGER IF NOT EXISTS {self.fts_table}_ai AFTER INSERT ON {self.table} '
+                f'BEGIN {insert} END',
+                f'CREATE TRIGGER IF NOT EXISTS {self.fts_table}_ad AFTER DELETE ON {self.table} '
+                f'BEGIN {delete} END',
+                f'CREATE TRIGGER IF NOT EXISTS {self.fts_table}_au AFTER UPDATE OF {columns} ON {self.table} '
+                f'BEGIN {delete} {insert} END',
+            ]
+        if dialect == 'postgresql':
+            return [
+                f'ALTER TABLE {self.table} ADD COLUMN IF NOT EXISTS search_vector tsvector',
+                f'CREATE OR REPLACE FUNCTION {self.table}_search_vector_update() RETURNS trigger AS $$ '
+                f'BEGIN NEW.search_vector := {self._tsvector("NEW")}; RETURN NEW; END '
+                f'$$ LANGUAGE plpgsql',
+                f'DROP TRIGGER IF EXISTS {self.table}_search_vector_trigger ON {self.table}',
+                f'CREATE TRIGGER {self.table}_search_vector_trigger '
+                f'BEFORE INSERT OR UPDATE OF {columns} ON {self.table} '
+                f'FOR EACH ROW EXECUTE FUNCTION {self.table}_search_vector_update()',
+                f'CREATE INDEX IF NOT EXISTS ix_{self.table}_search_vector '
+                f'ON {self.table} USING gin (search_vector)',
+            ]
+        return []
+    
+    def drop_ddl(self, dialect):
+        """Statements removing what ``create_ddl`` created outside the table itself"""
+        if dialect == 'sqlite':
+            return [f'DROP TABLE IF EXISTS {self.fts_table}']
+        if dialect == 'postgresql':
+            return [f'DROP FUNCTION IF EXISTS {self.table}_search_vector_update() CASCADE']
+        return []
+    
+    def attach(self, table):
+        """Create and drop the index together with ``table`` (``create_all``/``drop_all``)"""
+        for dialect in ('sqlite', 'postgresql'):
+            for statement in self.create_ddl(dialect):
+                event.listen(table, 'after_create', DDL(statement).execute_if(dialect=dialect))
+            for statement in self.drop_ddl(dialect):
+                event.listen(table, 'after_drop', DDL(statement).execute_if(dialect=dialect))
+    
+    def search(self, query, model, terms, dialect):
+        """Restrict ``query`` to rows matching ``terms``
+        
+        Returns ``(query, score)`` where ``score`` is a relevance expression,
+        higher is better, usable in ORDER BY and keyset predicates.
+        """
+        if dialect == 'sqlite':
+            fts = table(self.fts_table, column('rowid'))
+            name = literal_column(self.fts_table)
+            # bm25() is lower for better matches
+            score = -func.bm25(name, *(float(weight) for weight in self.weights), type_=Float)
+            query = query.join(fts, fts.c.rowid == model.id).filter(name.op('MATCH')(fts5_query(terms)))
+            return query, score
+        if dialect == 'postgresql':
+            if not _WORD.search(terms or ''):
+                raise QueryArgumentError('q must contain at least one word')
+            vector = literal_column(f'{self.table}.search_vector')
+            tsquery = func.websearch_to_tsquery(self.language, terms)
+            score = func.ts_rank_cd(vector, tsquery, type_=Float)
+            return query.filter(vector.op('@@')(tsquery)), score
+        raise QueryArgumentError(f'Full-text search is not supported on {dialect}')
@@ -0,0 +1,66 @@
+"""
+Streaming JSON / NDJSON responses for large collections
+
+Rows are pulled from the database in ``yield_per`` batches (a server-side
+cursor where the driver supports one) and written to the client batch by
+batch, so memory stays flat no matter how many rows the query matches.
+"""
+from flask import Response, current_app, request, stream_with_context
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+
+def wants_ndjson(accept=None):
+    """Whether the client prefers newline-delimited JSON
+    
+    ``accept`` is an Accept header value; it defaults to the Flask request's.
+    """
+    accept_mimetypes = request.accept_mimetypes if accept is None else parse_accept_header(accept, MIMEAccept)
+    return accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+
+def streaming_requested():
+    """Whether the request asked for a streamed collection"""
+    if wants_ndjson():
+        return True
+    return request.args.get('stream', '').lower() in ('1', 'true', 'yes')
+
+
+def stream_query(query, serialize, batch_size=None):
+    """Stream ``serialize(row)`` for every row of ``query``
+    
+    Emits a JSON array by default, or one JSON document per line when the
+    client sent ``Accept: application/x-ndjson``.
+    """
+    if batch_size is None:
+        batch_size = current_app.config.get('API_STREAM_BATCH_SIZE', 500)
+    ndjson = wants_ndjson()
+    dumps = current_app.json.dumps
+    
+    def generate():
+        separator = '\n' if ndjson else ','
+        started = False
+        batch = []
+        
+        if not ndjson:
+            yield '['
+        for row in query.yield_per(batch_size):
+            batch.append(dumps(serialize(row)))
+            if len(batch) >= batch_size:
+                yield (separator if started else '') + separator.join(batch)
+                started = True
+                batch = []
+        if batch:
+            yield (separator if started else '') + separator.join(batch)
+            started = True
+        
+        if ndjson:
+            if started:
+                yield '\n'
+        else:
+            yield ']'
+    
+    mimetype = NDJSON_MIMETYPE if ndjson else 'application/json'
+    return Response(stream_with_context(generate()), mimetype=mimetype)